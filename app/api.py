@@ -0,0 +1,377 @@
+# app/api.py
+"""Versioned JSON API for integrations, under /api/v1.
+
+Clients authenticate with ``Authorization: Bearer <token>`` (tokens come from
+``flask api create-token``; app.auth resolves them) or with the session cookie.
+Non-admins see the tickets they created or are assigned, as on the HTML pages.
+
+* Lists are keyset-paginated like the HTML pages: pass ``next_cursor`` back as
+  ``?after=``, and ``?limit=`` up to API_MAX_PAGE_SIZE.
+* ``?fields=id,status`` picks the fields returned. Only those columns are
+  selected, and rows are serialized straight from the column tuples without
+  loading ORM objects.
+* POSTing a JSON list instead of an object creates up to API_MAX_BATCH records
+  in one transaction, all or nothing; ``/tickets/batch?ids=`` and
+  ``/comments/batch?ids=`` fetch up to as many in one query.
+
+Writes go through the same forms and flush hooks as the HTML views.
+"""
+from datetime import datetime
+from functools import wraps
+
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import HTTPException
+
+from app import assignment, db, realtime, tasks
+from app.enums import TicketEnum, TicketPriority, TicketStatus
+from app.forms import CommentForm, TicketForm
+from app.instrumentation import query_budget
+from app.models import Comment, Ticket, User
+from app.pagination import keyset_page
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+TICKET_FIELDS = {name: getattr(Ticket, name) for name in (
+    'id', 'title', 'description', 'status', 'priority', 'created_date', 'resolved_date', 'updated_at',
+    'version', 'user_id', 'assignee_id', 'queue_id', 'comment_count', 'last_activity_at')}
+COMMENT_FIELDS = {name: getattr(Comment, name) for name in ('id', 'ticket_id', 'user_id', 'content', 'timestamp')}
+USER_FIELDS = {name: getattr(User, name) for name in ('id', 'username', 'email', 'role')}
+
+# Fields a ticket create or update reads from the request body
+TICKET_INPUT = ('title', 'description', 'status', 'priority')
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+@bp.errorhandler(ApiError)
+def _api_error(exc):
+    body = {'error': exc.message}
+    if exc.details is not None:
+        body['details'] = exc.details
+    response = jsonify(body)
+    response.status_code = exc.status
+    if exc.status == 401:
+        response.headers['WWW-Authenticate'] = 'Bearer'
+    return response
+
+
+@bp.errorhandler(HTTPException)
+def _http_error(exc):
+    # abort() and bad routes inside the API answer in JSON too
+    response = _api_error(ApiError(exc.code, exc.description))
+    # Keeping the headers that tell the client what to do next (Allow, Retry-After)
+    for name, value in exc.get_headers():
+        if name in ('Allow', 'Retry-After'):
+            response.headers[name] = value
+    return response
+
+
+def api_login_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated:
+            raise ApiError(401, 'Authentication required')
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def _require_admin():
+    if not current_user.is_admin():
+        raise ApiError(403, 'Admins only')
+
+
+# --- Request parsing --------------------------------------------------------------------
+
+def _fields(available):
+    """The fields named by ``?fields=``, in order; every field when absent."""
+    raw = request.args.get('fields', '')
+    if not raw.strip():
+        return list(available)
+    names = list(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ApiError(400, f"Unknown field: {', '.join(unknown)}")
+    return names
+
+
+def _page_size():
+    config = current_app.config
+    return max(1, min(request.args.get('limit', config['API_PAGE_SIZE'], type=int), config['API_MAX_PAGE_SIZE']))
+
+
+def _ids():
+    try:
+        ids = list(dict.fromkeys(int(i) for i in request.args.get('ids', '').split(',') if i.strip()))
+    except ValueError:
+        raise ApiError(400, 'ids must be a comma-separated list of integers')
+    if not ids:
+        raise ApiError(400, 'ids is required')
+    if len(ids) > current_app.config['API_MAX_BATCH']:
+        raise ApiError(400, f"At most {current_app.config['API_MAX_BATCH']} ids per request")
+    return ids
+
+
+def _records():
+    """The JSON body as a list of objects, and whether it was sent as a list."""
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        return [payload], False
+    if isinstance(payload, list) and payload and all(isinstance(record, dict) for record in payload):
+        if len(payload) > current_app.config['API_MAX_BATCH']:
+            raise ApiError(400, f"At most {current_app.config['API_MAX_BATCH']} records per request")
+        return payload, True
+    raise ApiError(400, 'Send a JSON object, or a non-empty list of objects')
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _validate(form_class, records, names):
+    # Every record goes through the HTML form; one bad record fails the whole batch
+    forms, errors = [], []
+    for index, record in enumerate(records):
+        form = form_class(formdata=MultiDict({name: _text(record.get(name)) for name in names}),
+                          meta={'csrf': False})
+        if not form.validate():
+            errors.append({'index': index, 'errors': form.errors})
+        forms.append(form)
+    if errors:
+        raise ApiError(400, 'Validation failed', errors)
+    return forms
+
+
+# --- Serialization ----------------------------------------------------------------------
+
+def _value(value):
+    if isinstance(value, TicketEnum):
+        return value.key
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _columns(available, names, extra=()):
+    # The requested fields first, so each row's leading values line up with ``names``
+    columns = [available[name].label(name) for name in names]
+    return columns + [column for column in extra if column.key not in names]
+
+
+def _serialize(rows, names):
+    width = len(names)
+    return [dict(zip(names, map(_value, row[:width]))) for row in rows]
+
+
+# --- Tickets ----------------------------------------------------------------------------
+
+def _visible_tickets():
+    if current_user.is_admin():
+        return db.true()
+    return db.or_(Ticket.user_id == current_user.id, Ticket.assignee_id == current_user.id)
+
+
+def _enum_filter(column, enum_class, name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    try:
+        return column == enum_class.parse(value)
+    except ValueError:
+        raise ApiError(400, f'{name}: not a valid choice')
+
+
+def _ticket_filters():
+    filters = [_visible_tickets(),
+               _enum_filter(Ticket.status, TicketStatus, 'status'),
+               _enum_filter(Ticket.priority, TicketPriority, 'priority')]
+    for name in ('user_id', 'assignee_id'):
+        value = request.args.get(name, type=int)
+        if value is not None:
+            filters.append(getattr(Ticket, name) == value)
+    return [f for f in filters if f is not None]
+
+
+def _tickets_by_id(ids, names):
+    rows = (db.session.query(*_columns(TICKET_FIELDS, names, [Ticket.id]))
+            .filter(Ticket.id.in_(ids), _visible_tickets()).all())
+    found = {row.id: row for row in rows}
+    return [found[i] for i in ids if i in found]
+
+
+def _ticket_or_404(ticket_id, names):
+    rows = _tickets_by_id([ticket_id], names)
+    if not rows:
+        raise ApiError(404, 'Ticket not found')
+    return _serialize(rows, names)[0]
+
+
+@bp.route('/tickets')
+@api_login_required
+@query_budget(3)  # 1, plus the token and user lookups when neither is cached
+def list_tickets():
+    names = _fields(TICKET_FIELDS)
+    query = db.session.query(*_columns(TICKET_FIELDS, names, [Ticket.created_date, Ticket.id])).filter(
+        *_ticket_filters())
+    rows, next_cursor = keyset_page(query, [Ticket.created_date, Ticket.id], cursor=request.args.get('after'),
+                                    per_page=_page_size())
+    return jsonify({'data': _serialize(rows, names), 'next_cursor': next_cursor})
+
+
+@bp.route('/tickets/<int:ticket_id>')
+@api_login_required
+@query_budget(3)
+def get_ticket(ticket_id):
+    return jsonify({'data': _ticket_or_404(ticket_id, _fields(TICKET_FIELDS))})
+
+
+@bp.route('/tickets/batch')
+@api_login_required
+@query_budget(3)
+def batch_get_tickets():
+    ids, names = _ids(), _fields(TICKET_FIELDS)
+    rows = _tickets_by_id(ids, names)
+    found = {row.id for row in rows}
+    return jsonify({'data': _serialize(rows, names), 'missing': [i for i in ids if i not in found]})
+
+
+@bp.route('/tickets', methods=['POST'])
+@api_login_required
+def create_tickets():
+    records, many = _records()
+    forms = _validate(TicketForm, records, TICKET_INPUT)
+    tickets = []
+    for form in forms:
+        ticket = Ticket(title=form.title.data, description=form.description.data,
+                        status=form.status.data, priority=form.priority.data, user_id=current_user.id)
+        assignment.route_new_ticket(ticket)
+        db.session.add(ticket)
+        tickets.append(ticket)
+    for ticket in tickets:
+        tasks.index_ticket_later(ticket)
+        realtime.ticket_changed(ticket, created=True)
+    db.session.flush()
+    ids = [ticket.id for ticket in tickets]  # read before the commit expires them
+    db.session.commit()
+
+    names = _fields(TICKET_FIELDS)
+    data = _serialize(_tickets_by_id(ids, names), names)
+    return jsonify({'data': data if many else data[0]}), 201
+
+
+@bp.route('/tickets/<int:ticket_id>', methods=['PATCH'])
+@api_login_required
+def update_ticket(ticket_id):
+    ticket = db.session.execute(db.select(Ticket).where(Ticket.id == ticket_id, _visible_tickets())).scalar()
+    if ticket is None:
+        raise ApiError(404, 'Ticket not found')
+    records, many = _records()
+    if many:
+        raise ApiError(400, 'Send a single JSON object')
+    # Fields left out keep their current values
+    merged = {name: records[0].get(name, _value(getattr(ticket, name))) for name in TICKET_INPUT}
+    form = _validate(TicketForm, [merged], TICKET_INPUT)[0]
+    for name in TICKET_INPUT:
+        setattr(ticket, name, getattr(form, name).data)
+    tasks.index_ticket_later(ticket)
+    realtime.ticket_changed(ticket)
+    db.session.commit()
+    return jsonify({'data': _ticket_or_404(ticket_id, _fields(TICKET_FIELDS))})
+
+
+# --- Comments ---------------------------------------------------------------------------
+
+def _require_ticket(ticket_id):
+    exists = db.session.query(Ticket.id).filter(Ticket.id == ticket_id, _visible_tickets()).scalar()
+    if exists is None:
+        raise ApiError(404, 'Ticket not found')
+
+
+def _comments_by_id(ids, names):
+    rows = (db.session.query(*_columns(COMMENT_FIELDS, names, [Comment.id]))
+            .join(Ticket, Ticket.id == Comment.ticket_id)
+            .filter(Comment.id.in_(ids), _visible_tickets()).all())
+    found = {row.id: row for row in rows}
+    return [found[i] for i in ids if i in found]
+
+
+@bp.route('/tickets/<int:ticket_id>/comments')
+@api_login_required
+@query_budget(4)
+def list_comments(ticket_id):
+    # Oldest first, read through the (ticket_id, timestamp) index
+    _require_ticket(ticket_id)
+    names = _fields(COMMENT_FIELDS)
+    query = (db.session.query(*_columns(COMMENT_FIELDS, names, [Comment.timestamp, Comment.id]))
+             .filter(Comment.ticket_id == ticket_id))
+    rows, next_cursor = keyset_page(query, [Comment.timestamp, Comment.id], cursor=request.args.get('after'),
+                                    per_page=_page_size(), descending=False)
+    return jsonify({'data': _serialize(rows, names), 'next_cursor': next_cursor})
+
+
+@bp.route('/comments/batch')
+@api_login_required
+@query_budget(3)
+def batch_get_comments():
+    ids, names = _ids(), _fields(COMMENT_FIELDS)
+    rows = _comments_by_id(ids, names)
+    found = {row.id for row in rows}
+    return jsonify({'data': _serialize(rows, names), 'missing': [i for i in ids if i not in found]})
+
+
+@bp.route('/tickets/<int:ticket_id>/comments', methods=['POST'])
+@api_login_required
+def create_comments(ticket_id):
+    _require_ticket(ticket_id)
+    records, many = _records()
+    forms = _validate(CommentForm, records, ('content',))
+    comments = [Comment(content=form.content.data, ticket_id=ticket_id, user_id=current_user.id) for form in forms]
+    db.session.add_all(comments)
+    for comment in comments:
+        tasks.index_comment_later(comment)
+        realtime.comment_added(comment, author=current_user.username)
+    db.session.flush()
+    ids = [comment.id for comment in comments]
+    db.session.commit()
+
+    names = _fields(COMMENT_FIELDS)
+    data = _serialize(_comments_by_id(ids, names), names)
+    return jsonify({'data': data if many else data[0]}), 201
+
+
+# --- Users ------------------------------------------------------------------------------
+
+@bp.route('/users/me')
+@api_login_required
+@query_budget(3)
+def current_user_info():
+    return get_user(current_user.id)
+
+
+@bp.route('/users/<int:user_id>')
+@api_login_required
+@query_budget(3)
+def get_user(user_id):
+    if user_id != current_user.id:
+        _require_admin()
+    names = _fields(USER_FIELDS)
+    rows = db.session.query(*_columns(USER_FIELDS, names)).filter(User.id == user_id).all()
+    if not rows:
+        raise ApiError(404, 'User not found')
+    return jsonify({'data': _serialize(rows, names)[0]})
+
+
+@bp.route('/users')
+@api_login_required
+@query_budget(3)
+def list_users():
+    _require_admin()
+    names = _fields(USER_FIELDS)
+    rows, next_cursor = keyset_page(db.session.query(*_columns(USER_FIELDS, names, [User.id])), [User.id],
+                                    cursor=request.args.get('after'), per_page=_page_size(), descending=False)
+    return jsonify({'data': _serialize(rows, names), 'next_cursor': next_cursor})
@@ -0,0 +1,122 @@
+# app/archival.py
+"""Soft deletes and cold storage of old tickets.
+
+Admin deletes (app.bulk) only stamp ``deleted_at`` on tickets and comments. A
+``do_orm_execute`` hook adds ``deleted_at IS NULL`` for both models to every
+ORM SELECT, relationship loads included, so no view has to remember the
+filter; a query that needs the deleted rows passes
+``execution_options(include_deleted=True)``.
+
+``archive`` keeps the hot tables small: tickets resolved more than
+ARCHIVE_RESOLVED_AFTER_DAYS ago, and tickets deleted more than
+ARCHIVE_DELETED_AFTER_DAYS ago, move with their comments to
+``ticket_archive``/``comment_archive``, one chunk per transaction. Archived
+tickets are read-only; ``archived_ticket`` looks one up. Rollups are left
+alone (the tickets still happened) and ``rollups.backfill`` reads the archive too.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app import audit, caching, db, duplicates, search
+from app.models import Comment, CommentArchive, Ticket, TicketArchive, User
+from app.rollups import resolved_statuses
+
+# Columns copied to the archive tables
+TICKET_COLUMNS = ('id', 'title', 'description', 'status', 'priority', 'created_date', 'resolved_date',
+                  'user_id', 'assignee_id', 'queue_id', 'assigned_at', 'deleted_at')
+COMMENT_COLUMNS = ('id', 'content', 'timestamp', 'ticket_id', 'user_id', 'deleted_at')
+
+
+# --- Soft deletes -----------------------------------------------------------------------
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(execute_state):
+    # Relationship and column loads inherit the criteria from the query that loaded the parent
+    if (not execute_state.is_select or execute_state.is_column_load or execute_state.is_relationship_load
+            or execute_state.execution_options.get('include_deleted', False)):
+        return
+    if not has_app_context() or 'archival' not in current_app.extensions:
+        return
+    execute_state.statement = execute_state.statement.options(
+        with_loader_criteria(Ticket, Ticket.deleted_at.is_(None), include_aliases=True),
+        with_loader_criteria(Comment, Comment.deleted_at.is_(None), include_aliases=True),
+    )
+
+
+# --- Cold storage -----------------------------------------------------------------------
+
+def archivable(now=None):
+    """The clause matching tickets due for the archive."""
+    config = current_app.config
+    now = now or datetime.utcnow()
+    return db.or_(
+        db.and_(Ticket.status.in_(resolved_statuses()),
+                Ticket.resolved_date < now - timedelta(days=config['ARCHIVE_RESOLVED_AFTER_DAYS'])),
+        Ticket.deleted_at < now - timedelta(days=config['ARCHIVE_DELETED_AFTER_DAYS']),
+    )
+
+
+def _move(ids):
+    # Copy the tickets and their comments, then delete them, in the caller's transaction
+    connection = db.session.connection()
+    tickets, comments = Ticket.__table__, Comment.__table__
+    on_tickets = comments.c.ticket_id.in_(ids)
+
+    search.remove_matching(ticket_ids=db.select(tickets.c.id).where(tickets.c.id.in_(ids)),
+                           comment_ids=db.select(comments.c.id).where(on_tickets))
+    duplicates.remove_matching(ids)
+    audit.record_bulk_archive(Ticket.id.in_(ids))
+    connection.execute(TicketArchive.__table__.insert().from_select(
+        TICKET_COLUMNS + ('archived_at',),
+        db.select(*(tickets.c[name] for name in TICKET_COLUMNS), db.literal(datetime.utcnow(), db.DateTime))
+        .where(tickets.c.id.in_(ids))))
+    connection.execute(CommentArchive.__table__.insert().from_select(
+        COMMENT_COLUMNS, db.select(*(comments.c[name] for name in COMMENT_COLUMNS)).where(on_tickets)))
+    connection.execute(comments.delete().where(on_tickets))
+    connection.execute(tickets.delete().where(tickets.c.id.in_(ids)))
+    caching.bump_list(connection)
+
+
+def archive(batch_size=None, dry_run=False):
+    """Move every archivable ticket to the archive tables; returns how many moved (or would)."""
+    clause = archivable()
+    if dry_run:
+        return db.session.execute(db.select(db.func.count(Ticket.id)).where(clause)
+                                  .execution_options(include_deleted=True)).scalar()
+    batch_size = batch_size or current_app.config['ARCHIVE_BATCH_SIZE']
+    moved = 0
+    while True:
+        ids = db.session.execute(db.select(Ticket.id).where(clause).order_by(Ticket.id).limit(batch_size)
+                                 .execution_options(include_deleted=True)).scalars().all()
+        if not ids:
+            return moved
+        _move(ids)
+        db.session.commit()
+        moved += len(ids)
+
+
+def is_archived(ticket_id):
+    return db.session.query(TicketArchive.id).filter(TicketArchive.id == ticket_id).first() is not None
+
+
+def archived_ticket(ticket_id):
+    """``(ticket, creator_username, comments)`` from the archive, or None; comments carry ``username``."""
+    row = (db.session.query(TicketArchive, User.username)
+           .outerjoin(User, User.id == TicketArchive.user_id)
+           .filter(TicketArchive.id == ticket_id).first())
+    if row is None:
+        return None
+    comments = (db.session.query(CommentArchive.id, CommentArchive.content, CommentArchive.timestamp,
+                                 User.username)
+                .outerjoin(User, User.id == CommentArchive.user_id)
+                .filter(CommentArchive.ticket_id == ticket_id, CommentArchive.deleted_at.is_(None))
+                .order_by(CommentArchive.timestamp, CommentArchive.id).all())
+    return row.TicketArchive, row.username, comments
+
+
+def init_app(app):
+    # The soft-delete filter only applies to apps that opted in here
+    app.extensions['archival'] = True
@@ -0,0 +1,144 @@
+# app/assets.py
+"""Fingerprinted, precompressed static files.
+
+``flask assets build`` copies every file under app/static to
+``static/ASSETS_DIR/<name>.<hash>.<ext>``, where the hash is taken from the
+content, writes ``.gz`` (and ``.br``, when the brotli package is installed)
+variants next to it, and records the names in ``manifest.json``.
+
+At runtime, with STATIC_FINGERPRINT on and a manifest present,
+``url_for('static', filename='styles.css')`` returns the fingerprinted name,
+so templates stay as they are. Fingerprinted files never change under the
+same name, and are served with a year-long immutable Cache-Control and the
+precompressed variant the client accepts. Anything not in the
+manifest is served as before. Run the build again after changing a static
+file; without a manifest nothing is rewritten. A build adds to the output
+directory rather than replacing it, since pages already in browser caches
+still link to the previous names.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # optional: gzip alone when it is not installed
+    brotli = None
+
+logger = logging.getLogger('app.assets')
+
+MANIFEST = 'manifest.json'
+# Preferred first; each is (Content-Encoding, file suffix)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# Types worth compressing; images and fonts already are
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+
+
+def _output_dir(app):
+    return os.path.join(app.static_folder, app.config['ASSETS_DIR'])
+
+
+def _sources(app):
+    output = _output_dir(app)
+    for root, dirs, files in os.walk(app.static_folder):
+        if os.path.abspath(root) == os.path.abspath(output):
+            dirs[:] = []
+            continue
+        dirs.sort()
+        for name in sorted(files):
+            if not name.startswith('.'):
+                path = os.path.join(root, name)
+                yield os.path.relpath(path, app.static_folder).replace(os.sep, '/'), path
+
+
+def _write_compressed(path, data):
+    with open(path + '.gz', 'wb') as f:
+        # mtime=0 keeps the output identical between builds
+        with gzip.GzipFile(filename='', mode='wb', fileobj=f, compresslevel=9, mtime=0) as gz:
+            gz.write(data)
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(data, quality=11))
+
+
+def build(app):
+    """Fingerprint and compress every static file; returns the new manifest."""
+    output = _output_dir(app)
+    os.makedirs(output, exist_ok=True)
+    manifest = {}
+    for filename, path in _sources(app):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(filename)
+        digest = hashlib.sha256(data).hexdigest()[:app.config['ASSETS_HASH_LENGTH']]
+        fingerprinted = f"{app.config['ASSETS_DIR']}/{stem}.{digest}{ext}"
+        target = os.path.join(app.static_folder, fingerprinted)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as f:
+            f.write(data)
+        if ext.lower() in COMPRESSIBLE:
+            _write_compressed(target, data)
+        manifest[filename] = fingerprinted
+    with open(os.path.join(output, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    return manifest
+
+
+def load_manifest(app):
+    path = os.path.join(_output_dir(app), MANIFEST)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# --- Serving ----------------------------------------------------------------------------
+
+def _fingerprint_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values:
+        values['filename'] = current_app.extensions['assets'].get(values['filename'], values['filename'])
+
+
+def _serve_static(filename):
+    app = current_app
+    if filename not in app.extensions['assets_fingerprinted']:
+        return app.send_static_file(filename)
+    max_age = app.config['ASSETS_MAX_AGE']
+    mimetype = mimetypes.guess_type(filename)[0]
+    for encoding, suffix in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.isfile(
+                os.path.join(app.static_folder, filename + suffix)):
+            response = send_from_directory(app.static_folder, filename + suffix, mimetype=mimetype,
+                                           max_age=max_age)
+            response.content_encoding = encoding
+            break
+    else:
+        response = send_from_directory(app.static_folder, filename, max_age=max_age)
+    response.vary.add('Accept-Encoding')
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    if not app.config['STATIC_FINGERPRINT'] or not app.static_folder:
+        return
+    manifest = load_manifest(app)
+    if not manifest:
+        return
+    app.extensions['assets'] = manifest
+    app.extensions['assets_fingerprinted'] = frozenset(manifest.values())
+    if 'etag_salt' in app.extensions and not app.config.get('ETAG_SALT'):
+        # Pages link to these names, so a rebuild must change page ETags like a template edit
+        digest = hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:12]
+        app.extensions['etag_salt'] += digest
+    app.url_defaults(_fingerprint_url)
+    # Flask registered the static route in Flask(); swap in the view that knows the variants
+    app.view_functions['static'] = _serve_static
+    logger.debug('Serving %d fingerprinted static files', len(manifest))
@@ -0,0 +1,272 @@
+# app/assignment.py
+"""Ticket queues, per-agent load counters and auto-assignment.
+
+Every agent's open assigned tickets are counted in ``agent_load``, plainly and
+weighted by priority (ASSIGNMENT_PRIORITY_WEIGHTS). A ``before_flush`` hook
+keeps those counters in step with every ORM change to a ticket's assignee,
+status or priority, in the same transaction; set-based writers (app.bulk)
+call ``recount`` for the agents they touched. Routing a ticket therefore reads
+one counter row per queue member instead of counting anybody's tickets:
+
+* ``least_loaded`` gives the ticket to the active member with the lowest
+  weighted load;
+* ``round_robin`` gives it to the active member after the one picked last.
+
+Change a ticket's assignee through ``assign_to``/``auto_assign`` (or its
+``assignee_id`` column), not the ``assignee`` relationship: the hook reads the
+column's history.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import audit, caching, db
+from app.enums import TicketPriority
+from app.models import AgentLoad, Queue, QueueMember, Ticket, User
+from app.rollups import is_resolved, resolved_statuses
+
+STRATEGIES = ('least_loaded', 'round_robin')
+
+
+def priority_weight(priority):
+    return current_app.config['ASSIGNMENT_PRIORITY_WEIGHTS'].get(TicketPriority.key_of(priority), 1)
+
+
+def weight_expression():
+    """``priority_weight`` in SQL, for recounting."""
+    weights = current_app.config['ASSIGNMENT_PRIORITY_WEIGHTS']
+    return db.case({TicketPriority.parse(key): weight for key, weight in weights.items()},
+                   value=Ticket.priority, else_=1)
+
+
+# --- Load counters ----------------------------------------------------------------------
+
+def _contribution(assignee_id, status, priority):
+    # What one ticket adds to its assignee's counters: nothing once resolved
+    if assignee_id is None or is_resolved(status):
+        return None
+    return assignee_id, priority_weight(priority)
+
+
+def apply_loads(connection, deltas):
+    """Add ``{user_id: [open_tickets, weighted_load]}`` to the counters."""
+    table = AgentLoad.__table__
+    for user_id, (count, weight) in deltas.items():
+        if not count and not weight:
+            continue
+        result = connection.execute(table.update().where(table.c.user_id == user_id).values(
+            open_tickets=table.c.open_tickets + count, weighted_load=table.c.weighted_load + weight))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(user_id=user_id, open_tickets=count, weighted_load=weight))
+
+
+def _previous(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, name)
+
+
+@event.listens_for(Ticket.assignee_id, 'set', active_history=True)
+def _load_previous_assignee(target, value, oldvalue, initiator):
+    # As in app.rollups: have the old value at hand when the column was expired
+    pass
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_loads(session, flush_context, instances):
+    if not has_app_context() or 'assignment' not in current_app.extensions:
+        return
+    deltas = defaultdict(lambda: [0, 0])
+
+    def count(contribution, sign):
+        if contribution is not None:
+            user_id, weight = contribution
+            deltas[user_id][0] += sign
+            deltas[user_id][1] += sign * weight
+
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            count(_contribution(obj.assignee_id, obj.status, obj.priority), 1)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old = _contribution(_previous(state, 'assignee_id'), _previous(state, 'status'), _previous(state, 'priority'))
+        new = _contribution(obj.assignee_id, obj.status, obj.priority)
+        if old != new:
+            count(old, -1)
+            count(new, 1)
+
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            state = inspect(obj)
+            count(_contribution(_previous(state, 'assignee_id'), _previous(state, 'status'),
+                                _previous(state, 'priority')), -1)
+
+    if deltas:
+        apply_loads(session.connection(), deltas)
+
+
+def agents_of(clause):
+    """Assignees of the tickets matching ``clause``; take them before a set-based change, ``recount`` after."""
+    return {row[0] for row in db.session.query(Ticket.assignee_id)
+            .filter(clause, Ticket.assignee_id.isnot(None)).distinct()}
+
+
+def recount(user_ids=None):
+    """Recompute the counters of ``user_ids`` (of every agent when None) from their tickets."""
+    if user_ids is not None and not user_ids:
+        return
+    query = (db.session.query(Ticket.assignee_id, db.func.count(Ticket.id), db.func.sum(weight_expression()))
+             .filter(Ticket.assignee_id.isnot(None),
+                     Ticket.status.notin_(resolved_statuses())))
+    if user_ids is not None:
+        query = query.filter(Ticket.assignee_id.in_(user_ids))
+    totals = {user_id: (count, int(weight or 0)) for user_id, count, weight in query.group_by(Ticket.assignee_id)}
+
+    table = AgentLoad.__table__
+    connection = db.session.connection()
+    if user_ids is None:
+        connection.execute(table.update().values(open_tickets=0, weighted_load=0))
+        user_ids = set(totals)
+    for user_id in user_ids:
+        count, weight = totals.get(user_id, (0, 0))
+        result = connection.execute(table.update().where(table.c.user_id == user_id)
+                                    .values(open_tickets=count, weighted_load=weight))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(user_id=user_id, open_tickets=count, weighted_load=weight))
+
+
+def remove_agents(user_ids):
+    """Unassign every ticket of agents about to be deleted and drop them from every queue."""
+    audit.record_bulk_unassign(user_ids)
+    connection = db.session.connection()
+    connection.execute(db.update(Ticket).where(Ticket.assignee_id.in_(user_ids))
+                       .values(assignee_id=None, assigned_at=None, version=Ticket.version + 1,
+                               updated_at=datetime.utcnow())
+                       .execution_options(synchronize_session=False))
+    connection.execute(db.update(Queue).where(Queue.last_assignee_id.in_(user_ids)).values(last_assignee_id=None))
+    connection.execute(db.delete(QueueMember).where(QueueMember.user_id.in_(user_ids)))
+    connection.execute(db.delete(AgentLoad).where(AgentLoad.user_id.in_(user_ids)))
+    caching.bump_list(connection)
+
+
+# --- Routing ----------------------------------------------------------------------------
+
+def _active_members(queue_id):
+    return db.select(QueueMember.user_id).where(QueueMember.queue_id == queue_id, QueueMember.active)
+
+
+def _least_loaded(queue):
+    query = (_active_members(queue.id)
+             .outerjoin(AgentLoad, AgentLoad.user_id == QueueMember.user_id)
+             .order_by(db.func.coalesce(AgentLoad.weighted_load, 0),
+                       db.func.coalesce(AgentLoad.open_tickets, 0), QueueMember.user_id)
+             .limit(1))
+    return db.session.execute(query).scalar()
+
+
+def _round_robin(queue):
+    # Compare-and-set on the cursor, so concurrent requests hand out different members
+    last = queue.last_assignee_id
+    for _ in range(3):
+        picked = db.session.execute(
+            _active_members(queue.id)
+            .order_by(QueueMember.user_id <= (last or 0), QueueMember.user_id).limit(1)).scalar()
+        if picked is None:
+            return None
+        unchanged = Queue.last_assignee_id.is_(None) if last is None else Queue.last_assignee_id == last
+        moved = db.session.execute(db.update(Queue).where(Queue.id == queue.id, unchanged)
+                                   .values(last_assignee_id=picked)
+                                   .execution_options(synchronize_session=False)).rowcount
+        if moved:
+            break
+        # Somebody else moved the cursor since the queue was loaded
+        last = db.session.execute(db.select(Queue.last_assignee_id).where(Queue.id == queue.id)).scalar()
+    db.session.expire(queue, ['last_assignee_id'])
+    return picked
+
+
+def next_agent(queue):
+    """The member ``queue`` hands its next ticket to, or None when it has no active members."""
+    if queue.strategy == 'round_robin':
+        return _round_robin(queue)
+    return _least_loaded(queue)
+
+
+def assign_to(ticket, user_id):
+    """Give ``ticket`` to ``user_id``, or unassign it with None."""
+    if ticket.assignee_id != user_id:
+        ticket.assignee_id = user_id
+        ticket.assigned_at = datetime.utcnow() if user_id is not None else None
+
+
+def auto_assign(ticket, queue):
+    """Route ``ticket`` to ``queue`` and give it to the agent the queue's strategy picks."""
+    ticket.queue_id = queue.id
+    user_id = next_agent(queue)
+    assign_to(ticket, user_id)
+    return user_id
+
+
+def default_queue():
+    name = current_app.config.get('ASSIGNMENT_DEFAULT_QUEUE')
+    if not name:
+        return None
+    return Queue.query.filter_by(name=name).first()
+
+
+def route_new_ticket(ticket):
+    """Auto-assign a new ticket in the default queue, if one is configured."""
+    queue = default_queue()
+    if queue is not None:
+        auto_assign(ticket, queue)
+
+
+# --- Queues -----------------------------------------------------------------------------
+
+def create_queue(name, strategy='least_loaded'):
+    if strategy not in STRATEGIES:
+        raise ValueError(f'Unknown strategy {strategy!r}; expected one of {", ".join(STRATEGIES)}')
+    queue = Queue(name=name, strategy=strategy)
+    db.session.add(queue)
+    return queue
+
+
+def add_member(queue, user):
+    member = db.session.get(QueueMember, (queue.id, user.id))
+    if member is None:
+        member = QueueMember(queue_id=queue.id, user_id=user.id)
+        db.session.add(member)
+    member.active = True
+    # New agents start with the counters of whatever is already assigned to them
+    if db.session.get(AgentLoad, user.id) is None:
+        recount({user.id})
+    return member
+
+
+def overview():
+    """Every queue with its members' usernames, active flags and loads."""
+    rows = (db.session.query(Queue.id, Queue.name, Queue.strategy, QueueMember.user_id, User.username,
+                             QueueMember.active, AgentLoad.open_tickets, AgentLoad.weighted_load)
+            .outerjoin(QueueMember, QueueMember.queue_id == Queue.id)
+            .outerjoin(User, User.id == QueueMember.user_id)
+            .outerjoin(AgentLoad, AgentLoad.user_id == QueueMember.user_id)
+            .order_by(Queue.name, User.username).all())
+    queues = {}
+    for row in rows:
+        queue = queues.setdefault(row.id, {'id': row.id, 'name': row.name, 'strategy': row.strategy, 'members': []})
+        if row.user_id is not None:
+            queue['members'].append({'user_id': row.user_id, 'username': row.username, 'active': row.active,
+                                     'open_tickets': row.open_tickets or 0, 'weighted_load': row.weighted_load or 0})
+    return list(queues.values())
+
+
+def init_app(app):
+    # The before_flush hook only runs for apps that opted in here
+    app.extensions['assignment'] = True
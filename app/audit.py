@@ -0,0 +1,280 @@
+# app/audit.py
+"""Append-only ticket history and the ticket timeline.
+
+Every ORM change to a ticket is recorded as a ``TicketEvent`` row in the same
+transaction as the change, so the history can never disagree with the ticket:
+
+* ``created``: the new ticket's fields (without the description);
+* ``updated``: only the fields that changed, as ``{field: [old, new]}``;
+* ``deleted``: the fields the ticket had when it went;
+* ``comment_deleted``: the comment that was removed (comments themselves are
+  already a log and are read from their own table);
+* ``archived``: the ticket moved to cold storage (app.archival);
+* ``merged``: another ticket was merged into this one (app.duplicates); the
+  duplicate itself records ``merged_into_id`` as an update.
+
+``changes`` is compact JSON; statuses and priorities are stored by key. The
+actor is the logged-in user, or None for the CLI and background jobs.
+Set-based writers (app.bulk) call the ``record_bulk_*`` helpers before their
+UPDATE/DELETE. ``archive`` moves old events to ``ticket_event_archive`` in
+batches so the live table, and its index, stay small.
+"""
+import json
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, has_request_context
+from flask_login import current_user
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app import db
+from app.enums import TicketEnum, TicketStatus
+from app.models import Comment, Ticket, TicketEvent, TicketEventArchive, User
+from app.pagination import keyset_page
+
+# Ticket columns whose changes are recorded
+TRACKED = ('title', 'description', 'status', 'priority', 'assignee_id', 'queue_id', 'merged_into_id')
+# Recorded on creation; the description is the bulk of the row and the ticket still has it
+CREATED_FIELDS = ('title', 'status', 'priority', 'user_id', 'assignee_id', 'queue_id')
+DELETED_FIELDS = ('title', 'status', 'priority', 'user_id', 'assignee_id')
+
+# Events written per executemany by the bulk helpers
+BATCH_SIZE = 1000
+
+
+def _plain(value):
+    if isinstance(value, TicketEnum):
+        return value.key
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _dumps(changes):
+    return json.dumps(changes, separators=(',', ':'))
+
+
+def actor_id():
+    """The logged-in user's id, or None outside a request."""
+    if has_request_context() and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+def _event(ticket_id, action, changes, user_id, now):
+    return {'ticket_id': ticket_id, 'user_id': user_id, 'action': action,
+            'changes': _dumps(changes), 'created': now}
+
+
+def _insert(connection, events):
+    if events:
+        connection.execute(TicketEvent.__table__.insert(), events)
+
+
+def _enabled():
+    return has_app_context() and 'audit' in current_app.extensions
+
+
+# --- ORM changes ------------------------------------------------------------------------
+
+def _keep_previous(target, value, oldvalue, initiator):
+    # Registered with active_history so the old value is loaded even when the column was expired
+    pass
+
+
+for _name in TRACKED:
+    event.listen(getattr(Ticket, _name), 'set', _keep_previous, active_history=True)
+
+
+def _previous(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, name)
+
+
+def diff(ticket):
+    """``{field: [old, new]}`` for the tracked fields changed on ``ticket`` since it was loaded."""
+    state = inspect(ticket)
+    changes = {}
+    for name in TRACKED:
+        history = state.attrs[name].history
+        if not history.added:
+            continue
+        old = history.deleted[0] if history.deleted else None
+        new = history.added[0]
+        if old != new:
+            changes[name] = [_plain(old), _plain(new)]
+    return changes
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_changes(session, flush_context, instances):
+    # Updates and deletes; new tickets have no id yet and are recorded after the flush
+    if not _enabled():
+        return
+    now = datetime.utcnow()
+    user_id = actor_id()
+    events = []
+
+    deleted_tickets = set()
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            state = inspect(obj)
+            deleted_tickets.add(obj.id)
+            events.append(_event(obj.id, 'deleted', {name: _plain(_previous(state, name)) for name in DELETED_FIELDS},
+                                 user_id, now))
+    for obj in session.deleted:
+        # A deleted ticket's comments go with it; its 'deleted' event covers them
+        if isinstance(obj, Comment) and obj.ticket_id not in deleted_tickets:
+            events.append(_event(obj.ticket_id, 'comment_deleted',
+                                 {'comment_id': obj.id, 'user_id': obj.user_id, 'content': obj.content}, user_id, now))
+
+    for obj in session.dirty:
+        if isinstance(obj, Ticket) and session.is_modified(obj, include_collections=False):
+            changes = diff(obj)
+            if changes:
+                events.append(_event(obj.id, 'updated', changes, user_id, now))
+
+    _insert(session.connection(), events)
+
+
+@event.listens_for(Session, 'after_flush')
+def _record_created(session, flush_context):
+    # session.new still lists the tickets just inserted, now with their ids
+    if not _enabled():
+        return
+    now = datetime.utcnow()
+    user_id = actor_id()
+    _insert(session.connection(), [
+        _event(obj.id, 'created', {name: _plain(getattr(obj, name)) for name in CREATED_FIELDS}, user_id, now)
+        for obj in session.new if isinstance(obj, Ticket)
+    ])
+
+
+# --- Set-based changes ------------------------------------------------------------------
+
+def _record_rows(query, action, changes_of):
+    # One event per row of ``query``, written in batches with one executemany each
+    if not _enabled():
+        return
+    connection = db.session.connection()
+    now = datetime.utcnow()
+    user_id = actor_id()
+    batch = []
+    for row in db.session.execute(query):
+        batch.append(_event(row[0], action, changes_of(row), user_id, now))
+        if len(batch) >= BATCH_SIZE:
+            _insert(connection, batch)
+            batch = []
+    _insert(connection, batch)
+
+
+def record_bulk_status_change(clause, status):
+    """Record ``UPDATE ticket SET status`` for the tickets matching ``clause``; call it before the UPDATE."""
+    status = TicketStatus.parse(status)
+    _record_rows(db.select(Ticket.id, Ticket.status).where(clause, Ticket.status != status),
+                 'updated', lambda row: {'status': [row.status.key, status.key]})
+
+
+def record_bulk_delete(clause):
+    """Record ``DELETE FROM ticket WHERE clause``; call it before the DELETE."""
+    columns = [getattr(Ticket, name) for name in DELETED_FIELDS]
+    _record_rows(db.select(Ticket.id, *columns).where(clause), 'deleted',
+                 lambda row: {name: _plain(getattr(row, name)) for name in DELETED_FIELDS})
+
+
+def record_bulk_archive(clause):
+    """Record the tickets matching ``clause`` moving to cold storage (app.archival)."""
+    _record_rows(db.select(Ticket.id).where(clause).execution_options(include_deleted=True), 'archived',
+                 lambda row: {})
+
+
+def record_bulk_comment_delete(clause):
+    """Record ``DELETE FROM comment WHERE clause``; call it before the DELETE."""
+    _record_rows(db.select(Comment.ticket_id, Comment.id, Comment.user_id, Comment.content).where(clause),
+                 'comment_deleted',
+                 lambda row: {'comment_id': row.id, 'user_id': row.user_id, 'content': row.content})
+
+
+def record_merge(ticket_id, duplicate_id, comments_moved):
+    """Record ``duplicate_id`` being merged into ``ticket_id``."""
+    if _enabled():
+        changes = {'ticket_id': duplicate_id, 'comments': comments_moved}
+        _insert(db.session.connection(), [_event(ticket_id, 'merged', changes, actor_id(), datetime.utcnow())])
+
+
+def record_bulk_unassign(user_ids):
+    """Record every ticket of ``user_ids`` losing its assignee; call it before the UPDATE."""
+    _record_rows(db.select(Ticket.id, Ticket.assignee_id).where(Ticket.assignee_id.in_(user_ids)),
+                 'updated', lambda row: {'assignee_id': [row.assignee_id, None]})
+
+
+# --- Timeline ---------------------------------------------------------------------------
+
+def _events_of(model, ticket_id):
+    return (db.select(db.literal('event', db.String).label('source'), model.id, model.created.label('at'),
+                      model.action.label('action'), model.changes.label('body'), model.user_id, User.username)
+            .outerjoin(User, User.id == model.user_id)
+            .where(model.ticket_id == ticket_id))
+
+
+def timeline_query(ticket_id, include_archived=False):
+    """Events and comments of one ticket as a single UNION ALL, each half read through its (ticket_id, time) index."""
+    comments = (db.select(db.literal('comment', db.String), Comment.id, Comment.timestamp,
+                          db.literal('commented', db.String), Comment.content, Comment.user_id, User.username)
+                .outerjoin(User, User.id == Comment.user_id)
+                .where(Comment.ticket_id == ticket_id))
+    parts = [_events_of(TicketEvent, ticket_id), comments]
+    if include_archived:
+        parts.append(_events_of(TicketEventArchive, ticket_id))
+    return db.union_all(*parts).subquery('timeline')
+
+
+def _entry(row):
+    entry = {'type': row.source, 'id': row.id, 'at': _plain(row.at), 'user_id': row.user_id, 'user': row.username}
+    if row.source == 'event':
+        entry['action'] = row.action
+        entry['changes'] = json.loads(row.body)
+    else:
+        entry['content'] = row.body
+    return entry
+
+
+def timeline(ticket_id, cursor=None, per_page=50, include_archived=False):
+    """One page of a ticket's history, oldest first; returns ``(entries, next_cursor)``."""
+    entries = timeline_query(ticket_id, include_archived)
+    rows, next_cursor = keyset_page(db.session.query(entries), [entries.c.at, entries.c.source, entries.c.id],
+                                    cursor=cursor, per_page=per_page, descending=False)
+    return [_entry(row) for row in rows], next_cursor
+
+
+# --- Archival ---------------------------------------------------------------------------
+
+def archive(before=None, batch_size=None):
+    """Move events created before ``before`` to the archive table; returns how many moved.
+
+    Each batch is copied and deleted in its own transaction, so a large backlog
+    never holds long locks on the live table.
+    """
+    config = current_app.config
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=config['AUDIT_ARCHIVE_AFTER_DAYS'])
+    batch_size = batch_size or config['AUDIT_ARCHIVE_BATCH_SIZE']
+    live, archived = TicketEvent.__table__, TicketEventArchive.__table__
+    columns = [column.name for column in live.columns]
+
+    moved = 0
+    while True:
+        ids = db.session.execute(db.select(live.c.id).where(live.c.created < before)
+                                 .order_by(live.c.id).limit(batch_size)).scalars().all()
+        if not ids:
+            return moved
+        connection = db.session.connection()
+        connection.execute(archived.insert().from_select(columns, db.select(*live.columns).where(live.c.id.in_(ids))))
+        connection.execute(live.delete().where(live.c.id.in_(ids)))
+        db.session.commit()
+        moved += len(ids)
+
+
+def init_app(app):
+    # The flush hooks only record for apps that opted in here
+    app.extensions['audit'] = True
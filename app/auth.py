@@ -0,0 +1,130 @@
+# app/auth.py
+"""Cached user loading, API tokens and password hashing for Flask-Login."""
+import hashlib
+import logging
+import secrets
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, make_transient_to_detached
+from werkzeug.security import check_password_hash
+
+from app import db
+from app.cache import TTLCache
+from app.models import ApiToken, User
+
+# Columns copied into the cached identity. The password hash is left out so it
+# never sits in the cache; it lazy-loads if something does ask for it.
+_IDENTITY_COLUMNS = ('id', 'username', 'email', 'role')
+
+logger = logging.getLogger('app.auth')
+
+
+def init_app(app):
+    app.extensions['user_cache'] = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+    app.extensions['token_cache'] = TTLCache(app.config['API_TOKEN_CACHE_SIZE'], app.config['API_TOKEN_CACHE_TTL'])
+    workers = app.config['PASSWORD_HASH_WORKERS']
+    app.extensions['password_hash_pool'] = (
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash') if workers > 0 else None
+    )
+
+
+def load_user(user_id):
+    """Return the user for a session id, hitting the database at most once per TTL.
+
+    Invalidation only reaches this process's cache, so other workers can serve
+    a stale identity for up to USER_CACHE_TTL. Admins are therefore never
+    cached: a demoted or deleted admin loses access on their next request
+    whichever worker serves it.
+    """
+    cache = current_app.extensions['user_cache']
+    snapshot = cache.get(user_id)
+    if snapshot is not None:
+        # Attach the cached copy to this request's session without a SELECT
+        return db.session.merge(snapshot, load=False)
+
+    user = db.session.get(User, user_id)
+    if user is not None and not user.is_admin():
+        snapshot = User(**{name: getattr(user, name) for name in _IDENTITY_COLUMNS})
+        make_transient_to_detached(snapshot)
+        cache.set(user_id, snapshot)
+    return user
+
+
+def invalidate_user(user_id):
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.pop(user_id)
+
+
+# --- API tokens -------------------------------------------------------------------------
+
+def hash_token(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def create_token(user, name):
+    """Add a token for ``user`` to the session and return it; it cannot be recovered later."""
+    token = secrets.token_urlsafe(32)
+    db.session.add(ApiToken(user_id=user.id, name=name, token_hash=hash_token(token)))
+    return token
+
+
+def revoke_token(token):
+    """Revoke an ApiToken row; other workers stop accepting it within API_TOKEN_CACHE_TTL."""
+    token.revoked_at = datetime.utcnow()
+    current_app.extensions['token_cache'].pop(token.token_hash)
+
+
+def load_token_user(request):
+    """Flask-Login's request loader: the user of an ``Authorization: Bearer`` token on API requests."""
+    if request.blueprint != 'api':
+        return None
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    key = hash_token(token.strip())
+    cache = current_app.extensions['token_cache']
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = (db.session.query(ApiToken.user_id)
+                   .filter(ApiToken.token_hash == key, ApiToken.revoked_at.is_(None)).scalar())
+        if user_id is None:
+            return None
+        cache.set(key, user_id)
+    return load_user(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _invalidate_changed_users(session, flush_context):
+    # Role changes, renames and deletes all go through a flush; dirty/deleted
+    # still describe the pre-flush state here
+    if not has_app_context() or 'user_cache' not in current_app.extensions:
+        return
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User) and obj.id is not None:
+            invalidate_user(obj.id)
+
+
+def verify_password(user, password):
+    """Check ``password`` on the bounded hashing pool.
+
+    scrypt holds ~32 MiB and a core for the length of each check (and releases
+    the GIL while it does), so capping concurrent checks keeps a login storm
+    from exhausting worker memory and CPU while other threads keep serving.
+    """
+    if not user.password_hash:
+        return False
+    pool = current_app.extensions.get('password_hash_pool')
+    if pool is None:
+        return user.check_password(password)
+    future = pool.submit(check_password_hash, user.password_hash, password)
+    try:
+        return future.result(timeout=current_app.config['PASSWORD_HASH_TIMEOUT'])
+    except TimeoutError:
+        # The pool is backed up; fail this login rather than the request
+        future.cancel()
+        logger.warning('Password check for user %s timed out', user.id)
+        return False
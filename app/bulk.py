@@ -0,0 +1,533 @@
+# app/bulk.py
+"""Streaming bulk import and export of tickets and comments (CSV or JSONL).
+
+Rows are read and written one at a time and inserted in batches with a
+single executemany per batch, so memory stays flat however large the file is.
+Imported rows go through the same validation as TicketForm and CommentForm,
+and each batch queues one job that adds its rows to the search and duplicate
+indexes.
+
+The second half holds the set-based admin operations: status changes and
+deletes expressed as single UPDATE/DELETE statements over an id list or filter.
+"""
+import csv
+import io
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from werkzeug.datastructures import MultiDict
+
+from app import db
+from app import assignment, audit, caching, comments, duplicates, rollups, search, tasks
+from app.auth import invalidate_user
+from app.enums import TicketEnum, TicketPriority, TicketStatus
+from app.forms import CommentForm, TicketForm
+from app.models import ApiToken, Comment, Ticket, User
+
+FORMATS = ('csv', 'jsonl')
+KINDS = ('tickets', 'comments')
+
+# Columns written on export, and accepted on import (plus 'username' instead of 'user_id')
+TICKET_COLUMNS = ('id', 'title', 'description', 'status', 'priority', 'created_date', 'resolved_date', 'user_id')
+COMMENT_COLUMNS = ('id', 'ticket_id', 'user_id', 'content', 'timestamp')
+
+# Rejected rows reported back in detail; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.rejected = 0
+        self.errors = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def reject(self, line, messages):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': messages})
+
+    @property
+    def rows_per_second(self):
+        return (self.inserted + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+    def to_dict(self):
+        return {
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+            'errors': self.errors,
+        }
+
+
+def format_for_filename(filename, default='csv'):
+    if filename and filename.lower().endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    return default
+
+
+# --- Reading and validating ------------------------------------------------------------
+
+def iter_records(stream, fmt):
+    """Yield ``(line_number, dict)`` from a text stream without reading it all."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as exc:
+                yield line_number, {'__error__': f'Invalid JSON: {exc}'}
+                continue
+            yield line_number, record if isinstance(record, dict) else {'__error__': 'Expected a JSON object'}
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+def _parse_datetime(value, field, errors):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        errors.append(f'{field}: not an ISO 8601 date')
+        return None
+
+
+def _parse_id(value, field, errors, required=False):
+    if value in (None, ''):
+        if required:
+            errors.append(f'{field}: This field is required.')
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        errors.append(f'{field}: not an integer')
+        return None
+
+
+def _form_errors(form):
+    return [f'{name}: {message}' for name, messages in form.errors.items() for message in messages]
+
+
+def validate_ticket(record, usernames):
+    """Return ``(row, errors)`` for one ticket record."""
+    if '__error__' in record:
+        return None, [record['__error__']]
+    form = TicketForm(formdata=MultiDict({k: _text(record.get(k)) for k in ('title', 'description', 'status', 'priority')}),
+                      meta={'csrf': False})
+    form.validate()
+    errors = _form_errors(form)
+
+    row = {
+        'title': form.title.data,
+        'description': form.description.data,
+        'status': form.status.data,
+        'priority': form.priority.data,
+        'created_date': _parse_datetime(record.get('created_date'), 'created_date', errors),
+        'resolved_date': _parse_datetime(record.get('resolved_date'), 'resolved_date', errors),
+    }
+    ticket_id = _parse_id(record.get('id'), 'id', errors)
+    if ticket_id is not None:
+        row['id'] = ticket_id
+    if row['created_date'] is None:
+        del row['created_date']  # let the column default fill it in
+
+    if record.get('username') and not record.get('user_id'):
+        row['user_id'] = usernames.get(record['username'])
+        if row['user_id'] is None:
+            errors.append(f"username: unknown user {record['username']!r}")
+    else:
+        row['user_id'] = _parse_id(record.get('user_id'), 'user_id', errors, required=True)
+    return row, errors
+
+
+def validate_comment(record, usernames):
+    """Return ``(row, errors)`` for one comment record."""
+    if '__error__' in record:
+        return None, [record['__error__']]
+    form = CommentForm(formdata=MultiDict({'content': _text(record.get('content'))}), meta={'csrf': False})
+    form.validate()
+    errors = _form_errors(form)
+
+    row = {
+        'content': form.content.data,
+        'ticket_id': _parse_id(record.get('ticket_id'), 'ticket_id', errors, required=True),
+        'timestamp': _parse_datetime(record.get('timestamp'), 'timestamp', errors) or datetime.utcnow(),
+    }
+    comment_id = _parse_id(record.get('id'), 'id', errors)
+    if comment_id is not None:
+        row['id'] = comment_id
+
+    if record.get('username') and not record.get('user_id'):
+        row['user_id'] = usernames.get(record['username'])
+        if row['user_id'] is None:
+            errors.append(f"username: unknown user {record['username']!r}")
+    else:
+        row['user_id'] = _parse_id(record.get('user_id'), 'user_id', errors, required=True)
+    return row, errors
+
+
+class _UsernameLookup:
+    # Caches username -> id so a file with many rows per user costs one query per user
+    def __init__(self):
+        self._ids = {}
+
+    def get(self, username):
+        if username not in self._ids:
+            self._ids[username] = db.session.query(User.id).filter_by(username=username).scalar()
+        return self._ids[username]
+
+
+# --- Importing ---------------------------------------------------------------------------
+
+def _existing_ids(column, ids, include_deleted=False):
+    ids = {i for i in ids if i is not None}
+    if not ids:
+        return set()
+    query = db.session.query(column).filter(column.in_(ids)).execution_options(include_deleted=include_deleted)
+    return {row[0] for row in query}
+
+
+def _flush_batch(table, batch, report, references):
+    # Foreign keys are checked for the whole batch with one IN query per referenced table
+    known = {field: _existing_ids(column, (row[field] for _, row in batch))
+             for field, column in references.items()}
+    # Soft-deleted rows still hold their ids
+    taken = _existing_ids(table.c.id, (row.get('id') for _, row in batch), include_deleted=True)
+    accepted = []
+    for line, row in batch:
+        problems = [f'{field}: {row[field]} does not exist' for field in references if row[field] not in known[field]]
+        if row.get('id') in taken:
+            problems.append(f"id: {row['id']} already exists")
+        if problems:
+            report.reject(line, problems)
+        else:
+            accepted.append(row)
+
+    # executemany needs the same keys in every row; rows with and without an explicit id are split
+    groups = defaultdict(list)
+    for row in accepted:
+        groups[tuple(sorted(row))].append(row)
+    inserted = []
+    for rows in groups.values():
+        inserted += db.session.execute(table.insert().returning(table.c.id), rows).scalars()
+    if inserted:
+        # Same transaction as the rows, so the worker indexes them once they are committed
+        tasks.index_imported_later(table, inserted)
+    if table is Ticket.__table__:
+        rollups.record_existing_tickets((row['status'], row['priority'], row.get('created_date'), row['resolved_date'])
+                                        for row in accepted)
+        caching.bump_list(db.session.connection())
+    elif accepted:
+        commented = Ticket.id.in_({row['ticket_id'] for row in accepted})
+        caching.bump_tickets(db.session.connection(), commented)
+        comments.recount(db.session.connection(), commented)
+    db.session.commit()
+    report.inserted += len(accepted)
+
+
+def import_records(kind, records, batch_size=1000):
+    """Validate and insert ``(line, record)`` pairs; returns an ImportReport."""
+    report = ImportReport()
+    usernames = _UsernameLookup()
+    if kind == 'tickets':
+        validate, table = validate_ticket, Ticket.__table__
+        references = {'user_id': User.id}
+    else:
+        validate, table = validate_comment, Comment.__table__
+        references = {'user_id': User.id, 'ticket_id': Ticket.id}
+
+    batch = []
+    for line, record in records:
+        row, errors = validate(record, usernames)
+        if errors:
+            report.reject(line, errors)
+            continue
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            _flush_batch(table, batch, report, references)
+            batch = []
+    if batch:
+        _flush_batch(table, batch, report, references)
+
+    report.elapsed = time.perf_counter() - report.started
+    return report
+
+
+def import_stream(kind, stream, fmt, batch_size=1000):
+    return import_records(kind, iter_records(stream, fmt), batch_size=batch_size)
+
+
+# --- Exporting ---------------------------------------------------------------------------
+
+def _iter_export_rows(kind, batch_size):
+    # Keyset batches over the primary key: plain column tuples, no ORM objects,
+    # and no long-lived cursor held open while the client reads
+    model, columns = (Ticket, TICKET_COLUMNS) if kind == 'tickets' else (Comment, COMMENT_COLUMNS)
+    selected = [getattr(model, name) for name in columns]
+    last_id = 0
+    while True:
+        rows = (db.session.query(*selected).filter(model.id > last_id)
+                .order_by(model.id).limit(batch_size).all())
+        if not rows:
+            return
+        yield from rows
+        last_id = rows[-1].id
+
+
+def _serialize(value):
+    if isinstance(value, TicketEnum):
+        return value.key
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def export_chunks(kind, fmt, batch_size=1000):
+    """Yield the export as text chunks of roughly ``batch_size`` rows each."""
+    columns = TICKET_COLUMNS if kind == 'tickets' else COMMENT_COLUMNS
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+
+    for count, row in enumerate(_iter_export_rows(kind, batch_size), start=1):
+        values = [_serialize(value) for value in row]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(json.dumps(dict(zip(columns, values))) + '\n')
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+# --- Set-based admin operations -------------------------------------------------------
+
+# Id lists are split into IN clauses of this size to stay under bind-parameter limits
+ID_CHUNK_SIZE = 500
+
+
+class BulkRequestError(ValueError):
+    pass
+
+
+def _parse_datetime_filter(value, name):
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise BulkRequestError(f'{name}: not an ISO 8601 date')
+
+
+TICKET_FILTERS = {
+    'status': lambda v: Ticket.status == TicketStatus.parse(v),
+    'priority': lambda v: Ticket.priority == TicketPriority.parse(v),
+    'user_id': lambda v: Ticket.user_id == int(v),
+    'created_before': lambda v: Ticket.created_date < _parse_datetime_filter(v, 'created_before'),
+    'created_after': lambda v: Ticket.created_date >= _parse_datetime_filter(v, 'created_after'),
+}
+COMMENT_FILTERS = {
+    'ticket_id': lambda v: Comment.ticket_id == int(v),
+    'user_id': lambda v: Comment.user_id == int(v),
+    'before': lambda v: Comment.timestamp < _parse_datetime_filter(v, 'before'),
+}
+USER_FILTERS = {
+    'role': lambda v: User.role == v,
+}
+
+
+def selection_clauses(model, payload, filters):
+    """Turn ``{"ids": [...]}`` or ``{"filter": {...}}`` into WHERE clauses.
+
+    Returns one clause per chunk of ids (or a single clause for a filter). An
+    empty selection is refused so a bad request can never match every row.
+    """
+    ids = payload.get('ids')
+    criteria = payload.get('filter') or {}
+    if ids is not None and criteria:
+        raise BulkRequestError('Send either ids or filter, not both')
+
+    if ids is not None:
+        if not isinstance(ids, list) or not ids:
+            raise BulkRequestError('ids must be a non-empty list')
+        try:
+            ids = sorted({int(i) for i in ids})
+        except (TypeError, ValueError):
+            raise BulkRequestError('ids must be integers')
+        return [model.id.in_(ids[i:i + ID_CHUNK_SIZE]) for i in range(0, len(ids), ID_CHUNK_SIZE)]
+
+    if not isinstance(criteria, dict) or not criteria:
+        raise BulkRequestError('Send ids or a non-empty filter')
+    unknown = set(criteria) - set(filters)
+    if unknown:
+        raise BulkRequestError(f"Unknown filter: {', '.join(sorted(unknown))}")
+    try:
+        return [db.and_(*(filters[name](value) for name, value in criteria.items()))]
+    except (TypeError, ValueError) as exc:
+        raise BulkRequestError(str(exc))
+
+
+def _count(column, clause):
+    return db.session.query(db.func.count(column)).filter(clause).scalar()
+
+
+def _run(operation, dry_run):
+    # Every chunk runs in one transaction; a dry run rolls it all back
+    try:
+        result = operation()
+        if dry_run:
+            db.session.rollback()
+        else:
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    result['dry_run'] = dry_run
+    return result
+
+
+def update_ticket_status(clauses, status, dry_run=False):
+    def operation():
+        updated = 0
+        for clause in clauses:
+            if dry_run:
+                updated += _count(Ticket.id, clause)
+            else:
+                agents = assignment.agents_of(clause)
+                audit.record_bulk_status_change(clause, status)
+                tasks.queue_bulk_status_notifications(clause, status)
+                now = rollups.record_bulk_status_change(clause, status)
+                if rollups.is_resolved(status):
+                    resolved_date = db.case((Ticket.status.in_(rollups.resolved_statuses()),
+                                             Ticket.resolved_date), else_=now)
+                else:
+                    resolved_date = None
+                # Soft-deleted tickets stay as they are; the selects above already skip them
+                updated += db.session.execute(
+                    db.update(Ticket).where(clause, Ticket.deleted_at.is_(None))
+                    .values(status=status, resolved_date=resolved_date,
+                            version=Ticket.version + 1, updated_at=datetime.utcnow())
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                assignment.recount(agents)
+        if updated and not dry_run:
+            caching.bump_list(db.session.connection())
+        return {'tickets': updated}
+    return _run(operation, dry_run)
+
+
+def _delete_tickets_where(clause, counts, dry_run, purge=False):
+    # Soft delete (app.archival) unless ``purge``; either way the tickets leave the
+    # search index, rollups, list and agent loads now
+    ticket_ids = db.select(Ticket.id).where(clause)
+    comment_clause = Comment.ticket_id.in_(ticket_ids)
+    if dry_run:
+        counts['tickets'] += _count(Ticket.id, clause)
+        counts['comments'] += _count(Comment.id, comment_clause)
+        return
+    search.remove_matching(ticket_ids=ticket_ids, comment_ids=db.select(Comment.id).where(comment_clause))
+    duplicates.remove_matching(ticket_ids)
+    rollups.record_bulk_delete(clause)
+    audit.record_bulk_delete(clause)
+    caching.bump_list(db.session.connection())
+    agents = assignment.agents_of(clause)
+    if purge:
+        counts['comments'] += db.session.execute(
+            db.delete(Comment).where(comment_clause).execution_options(synchronize_session=False)).rowcount
+        counts['tickets'] += db.session.execute(
+            db.delete(Ticket).where(clause).execution_options(synchronize_session=False)).rowcount
+    else:
+        now = datetime.utcnow()
+        counts['comments'] += db.session.execute(
+            db.update(Comment).where(comment_clause, Comment.deleted_at.is_(None)).values(deleted_at=now)
+            .execution_options(synchronize_session=False)).rowcount
+        counts['tickets'] += db.session.execute(
+            db.update(Ticket).where(clause, Ticket.deleted_at.is_(None))
+            .values(deleted_at=now, version=Ticket.version + 1, updated_at=now)
+            .execution_options(synchronize_session=False)).rowcount
+    assignment.recount(agents)
+
+
+def delete_tickets(clauses, dry_run=False):
+    """Soft-delete matching tickets and every comment on them."""
+    def operation():
+        counts = {'tickets': 0, 'comments': 0}
+        for clause in clauses:
+            _delete_tickets_where(clause, counts, dry_run)
+        return counts
+    return _run(operation, dry_run)
+
+
+def delete_comments(clauses, dry_run=False):
+    def operation():
+        counts = {'comments': 0}
+        for clause in clauses:
+            if dry_run:
+                counts['comments'] += _count(Comment.id, clause)
+                continue
+            search.remove_matching(comment_ids=db.select(Comment.id).where(clause))
+            audit.record_bulk_comment_delete(clause)
+            caching.bump_tickets(db.session.connection(), Ticket.id.in_(db.select(Comment.ticket_id).where(clause)))
+            counts['comments'] += db.session.execute(
+                db.update(Comment).where(clause, Comment.deleted_at.is_(None)).values(deleted_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)).rowcount
+            comments.recount(db.session.connection(), Ticket.id.in_(db.select(Comment.ticket_id).where(clause)))
+        return counts
+    return _run(operation, dry_run)
+
+
+def delete_users(clauses, dry_run=False):
+    """Delete matching users, the tickets they created and every comment they wrote or received.
+
+    Unlike ticket and comment deletes this one is for good: the rows go, soft-deleted ones included.
+    """
+    def operation():
+        counts = {'users': 0, 'tickets': 0, 'comments': 0}
+        for clause in clauses:
+            user_ids = db.select(User.id).where(clause)
+            # Comments they wrote on other people's tickets, then their tickets (with those tickets' comments)
+            authored = Comment.user_id.in_(user_ids)
+            if dry_run:
+                counts['comments'] += _count(Comment.id, db.and_(authored, Comment.ticket_id.notin_(
+                    db.select(Ticket.id).where(Ticket.user_id.in_(user_ids)))))
+            else:
+                search.remove_matching(comment_ids=db.select(Comment.id).where(authored))
+                # Only those on other people's tickets; the rest go with the tickets below
+                audit.record_bulk_comment_delete(db.and_(authored, Comment.ticket_id.notin_(
+                    db.select(Ticket.id).where(Ticket.user_id.in_(user_ids)))))
+                commented = Ticket.id.in_([row[0] for row in db.session.execute(
+                    db.select(Comment.ticket_id).where(authored).distinct())])
+                caching.bump_tickets(db.session.connection(), commented)
+                counts['comments'] += db.session.execute(
+                    db.delete(Comment).where(authored).execution_options(synchronize_session=False)).rowcount
+                comments.recount(db.session.connection(), commented)
+            _delete_tickets_where(Ticket.user_id.in_(user_ids), counts, dry_run, purge=True)
+
+            deleted_ids = [row[0] for row in db.session.execute(user_ids)]
+            if not dry_run:
+                if deleted_ids:
+                    assignment.remove_agents(deleted_ids)
+                    db.session.execute(db.delete(ApiToken).where(ApiToken.user_id.in_(deleted_ids))
+                                       .execution_options(synchronize_session=False))
+                db.session.execute(db.delete(User).where(clause).execution_options(synchronize_session=False))
+                for user_id in deleted_ids:
+                    invalidate_user(user_id)
+            counts['users'] += len(deleted_ids)
+        return counts
+    return _run(operation, dry_run)
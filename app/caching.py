@@ -0,0 +1,200 @@
+# app/caching.py
+"""HTTP validators for the ticket views and the rendered ticket card cache.
+
+Every ticket carries a ``version`` that is bumped, in the same transaction,
+whenever the ticket or one of its comments changes; the ``tickets`` cache
+generation is bumped whenever any ticket is added, edited or deleted. The
+ticket page's ETag is derived from the ticket version and the list page's from
+the generation, so both can answer 304 after one primary-key lookup and before
+the real queries run. Set-based writers (app.bulk) call ``bump_tickets`` and
+``bump_list`` themselves.
+"""
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request, session
+from flask_login import current_user
+from markupsafe import Markup
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.cache import TTLCache
+from app.models import CacheGeneration, Comment, Ticket
+
+TICKET_LIST = 'tickets'
+
+# Ticket columns whose change shows on the list page (the card and its order)
+LIST_COLUMNS = ('title', 'description', 'status', 'priority', 'created_date', 'user_id', 'assignee_id')
+
+
+# --- Versions ---------------------------------------------------------------------------
+
+def bump_tickets(connection, clause):
+    """Bump the version of every ticket matching ``clause``."""
+    connection.execute(db.update(Ticket).where(clause)
+                       .values(version=Ticket.version + 1, updated_at=datetime.utcnow())
+                       .execution_options(synchronize_session=False))
+
+
+def bump_list(connection, name=TICKET_LIST):
+    table = CacheGeneration.__table__
+    now = datetime.utcnow()
+    result = connection.execute(table.update().where(table.c.name == name)
+                                .values(value=table.c.value + 1, updated_at=now))
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(name=name, value=1, updated_at=now))
+
+
+def _list_changed(obj):
+    state = db.inspect(obj)
+    return any(state.attrs[name].history.has_changes() for name in LIST_COLUMNS)
+
+
+@event.listens_for(Session, 'before_flush')
+def _bump_versions(session, flush_context, instances):
+    if not has_app_context() or 'fragment_cache' not in current_app.extensions:
+        return
+    now = datetime.utcnow()
+    list_changed = False
+    commented = set()
+
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            obj.updated_at = now
+            list_changed = True
+        elif isinstance(obj, Comment):
+            # Comments appended through ticket.comments only get ticket_id during the flush
+            ticket_id = obj.ticket_id if obj.ticket_id is not None else getattr(obj.ticket, 'id', None)
+            if ticket_id is not None:
+                commented.add(ticket_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Ticket) and session.is_modified(obj, include_collections=False):
+            obj.version = Ticket.version + 1
+            obj.updated_at = now
+            list_changed = list_changed or _list_changed(obj)
+        elif isinstance(obj, Comment) and session.is_modified(obj, include_collections=False):
+            commented.add(obj.ticket_id)
+
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            list_changed = True
+        elif isinstance(obj, Comment):
+            commented.add(obj.ticket_id)
+
+    connection = session.connection()
+    if commented:
+        bump_tickets(connection, Ticket.id.in_(commented))
+        # Loaded copies of those tickets now carry an old version
+        for obj in session.identity_map.values():
+            if isinstance(obj, Ticket) and obj.id in commented and obj not in session.dirty:
+                session.expire(obj, ['version', 'updated_at'])
+    if list_changed:
+        bump_list(connection)
+
+
+# --- Conditional responses --------------------------------------------------------------
+
+def _template_fingerprint(app):
+    # A deploy that changes a template changes every ETag, without a version bump
+    digest = hashlib.sha1()
+    root = os.path.join(app.root_path, app.template_folder)
+    for directory, _, files in sorted(os.walk(root)):
+        for name in sorted(files):
+            with open(os.path.join(directory, name), 'rb') as f:
+                digest.update(name.encode() + f.read())
+    return digest.hexdigest()[:12]
+
+
+def _csrf_period():
+    # Pages embed a CSRF token that expires WTF_CSRF_TIME_LIMIT after it was
+    # rendered; rolling the ETag every half limit means a revalidated page's
+    # token is never older than that
+    config = current_app.config
+    limit = config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    if not config.get('WTF_CSRF_ENABLED', True) or not limit:
+        return 0
+    return int(time.time() // (limit / 2))
+
+
+def make_etag(*parts):
+    """An ETag for ``parts`` as seen by the current user (pages show who is logged in)."""
+    viewer = (current_user.get_id(), getattr(current_user, 'role', None)) if current_user.is_authenticated else None
+    key = repr((current_app.extensions['etag_salt'], viewer, _csrf_period()) + parts)
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+def not_modified(etag, last_modified=None):
+    """A 304 response if the client already holds this version, else None.
+
+    Pages carrying flashed messages are never answered from the client's copy,
+    nor given validators; rendering consumes the flashes, so that is decided here.
+    """
+    g.has_flashes = '_flashes' in session
+    if g.has_flashes:
+        return None
+    if etag in request.if_none_match or (
+            not request.if_none_match and last_modified and request.if_modified_since
+            and last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)):
+        response = current_app.response_class(status=304)
+        set_validators(response, etag, last_modified)
+        return response
+    return None
+
+
+def set_validators(response, etag, last_modified=None):
+    if g.get('has_flashes'):
+        return response
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # The browser may keep the page but must check back every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
+def ticket_validators(ticket_id):
+    """``(etag, last_modified)`` for the ticket page, or None when the ticket does not exist."""
+    row = (db.session.query(Ticket.version, Ticket.updated_at, Ticket.created_date)
+           .filter(Ticket.id == ticket_id).first())
+    if row is None:
+        return None
+    return make_etag('ticket', ticket_id, row.version), row.updated_at or row.created_date
+
+
+def list_validators():
+    """``(etag, last_modified)`` for the ticket list as requested."""
+    row = (db.session.query(CacheGeneration.value, CacheGeneration.updated_at)
+           .filter(CacheGeneration.name == TICKET_LIST).first())
+    value, updated_at = row if row else (0, None)
+    query = tuple(sorted(request.args.items(multi=True)))
+    return make_etag('list', value, query, current_app.config['TICKETS_PER_PAGE']), updated_at
+
+
+# --- Fragment cache ---------------------------------------------------------------------
+
+def ticket_card(ticket, is_admin):
+    """The rendered card for one ticket-list row, cached by ticket version."""
+    cache = current_app.extensions['fragment_cache']
+    key = (ticket.id, ticket.version, is_admin)
+    html = cache.get(key)
+    if html is None:
+        template = current_app.jinja_env.get_template('_ticket_card.html')
+        html = Markup(template.render(ticket=ticket, is_admin=is_admin))
+        cache.set(key, html)
+    return html
+
+
+def cache_stats():
+    """Size and hit/miss counts of every cache the app keeps."""
+    return {name: current_app.extensions[name].stats() for name in ('fragment_cache', 'user_cache')
+            if name in current_app.extensions}
+
+
+def init_app(app):
+    app.extensions['fragment_cache'] = TTLCache(app.config['FRAGMENT_CACHE_SIZE'])
+    app.extensions['etag_salt'] = app.config.get('ETAG_SALT') or _template_fingerprint(app)
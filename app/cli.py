@@ -0,0 +1,297 @@
+# app/cli.py
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+tickets_cli = AppGroup('tickets', help='Bulk import and export tickets and comments.')
+rollups_cli = AppGroup('rollups', help='Maintain the dashboard rollups.')
+jobs_cli = AppGroup('jobs', help='Inspect and feed the background job queue.')
+queues_cli = AppGroup('queues', help='Manage ticket queues and agent loads.')
+audit_cli = AppGroup('audit', help='Maintain the ticket history.')
+api_cli = AppGroup('api', help='Manage API tokens.')
+duplicates_cli = AppGroup('duplicates', help='Maintain the near-duplicate ticket index.')
+assets_cli = AppGroup('assets', help='Build the fingerprinted static files.')
+templates_cli = AppGroup('templates', help='Manage the compiled template cache.')
+
+
+@search_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True, help='Rows indexed per commit.')
+def rebuild_search(batch_size):
+    """Re-index every ticket and comment from scratch."""
+    from app import search
+    count = search.rebuild(batch_size=batch_size)
+    click.echo(f'Indexed {count} tickets and comments ({search.backend_name()} backend).')
+
+
+@duplicates_cli.command('rebuild')
+@click.option('--batch-size', default=1000, show_default=True, help='Tickets indexed per commit.')
+def rebuild_duplicates(batch_size):
+    """Recompute every ticket's MinHash signature and LSH buckets."""
+    from app import duplicates
+    count = duplicates.rebuild(batch_size=batch_size)
+    click.echo(f'Indexed {count} tickets.')
+
+
+@assets_cli.command('build')
+def build_assets():
+    """Copy static files to content-hashed names with gzip/brotli variants."""
+    from app import assets
+    manifest = assets.build(current_app)
+    click.echo(f"Fingerprinted {len(manifest)} files into static/{current_app.config['ASSETS_DIR']}"
+               f"{'' if assets.brotli else ' (gzip only: brotli is not installed)'}.")
+
+
+class MigrationsGroup(click.Group):
+    """`flask db`, importing Flask-Migrate, and with it Alembic, only when it runs.
+
+    Alembic is the slowest import at boot, and nothing outside this command needs it.
+    """
+
+    def _commands(self):
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_commands
+        from app import db
+        if 'migrate' not in current_app.extensions:
+            Migrate(current_app, db)
+        return db_commands
+
+    def list_commands(self, ctx):
+        return self._commands().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._commands().get_command(ctx, name)
+
+
+def init_migrations(app):
+    if app.config['MIGRATE_EAGER']:
+        from flask_migrate import Migrate
+        from app import db
+        Migrate(app, db)
+    else:
+        app.cli.add_command(MigrationsGroup('db', help='Perform database migrations.'))
+
+
+@templates_cli.command('compile')
+def compile_templates():
+    """Compile every template into the Jinja bytecode cache."""
+    import time
+    from app import startup
+    if not current_app.config['JINJA_BYTECODE_CACHE']:
+        raise click.ClickException('JINJA_BYTECODE_CACHE is off; there is no cache to fill.')
+    started = time.perf_counter()
+    count = startup.compile_templates(current_app)
+    click.echo(f'Compiled {count} templates in {time.perf_counter() - started:.2f}s.')
+
+
+def _open_text(path, mode):
+    # newline='' lets the csv module handle quoted multi-line fields itself
+    if path == '-':
+        return click.open_file(path, mode)
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+@tickets_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--kind', type=click.Choice(['tickets', 'comments']), default='tickets', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', type=int, help='Rows per insert batch (default: BULK_BATCH_SIZE).')
+def import_tickets(path, kind, fmt, batch_size):
+    """Load tickets or comments from a CSV or JSONL file ('-' for stdin)."""
+    from app import bulk
+    fmt = fmt or bulk.format_for_filename(path)
+    batch_size = batch_size or current_app.config['BULK_BATCH_SIZE']
+    with _open_text(path, 'r') as stream:
+        report = bulk.import_stream(kind, stream, fmt, batch_size=batch_size)
+
+    click.echo(f'Inserted {report.inserted} {kind}, rejected {report.rejected} '
+               f'in {report.elapsed:.1f}s ({report.rows_per_second:.0f} rows/s).')
+    for error in report.errors:
+        click.echo(f"  line {error['line']}: {'; '.join(error['errors'])}", err=True)
+    if report.inserted:
+        click.echo('The new rows are searchable once the job worker has indexed them.')
+
+
+@tickets_cli.command('export')
+@click.argument('path', default='-')
+@click.option('--kind', type=click.Choice(['tickets', 'comments']), default='tickets', show_default=True)
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+def export_tickets(path, kind, fmt):
+    """Write every ticket or comment to PATH ('-' for stdout)."""
+    from app import bulk
+    fmt = fmt or bulk.format_for_filename(path)
+    with _open_text(path, 'w') as stream:
+        for chunk in bulk.export_chunks(kind, fmt, batch_size=current_app.config['BULK_BATCH_SIZE']):
+            stream.write(chunk)
+
+
+@tickets_cli.command('archive')
+@click.option('--batch-size', type=int, help='Tickets moved per transaction (default: ARCHIVE_BATCH_SIZE).')
+@click.option('--dry-run', is_flag=True, help='Only count the tickets that would move.')
+def archive_tickets(batch_size, dry_run):
+    """Move long-resolved and long-deleted tickets and their comments to the archive tables."""
+    from app import archival
+    count = archival.archive(batch_size=batch_size, dry_run=dry_run)
+    click.echo(f'{"Would archive" if dry_run else "Archived"} {count} tickets.')
+
+
+@tickets_cli.command('recount-comments')
+def recount_comments():
+    """Rebuild every ticket's comment count and last-activity time from its comments."""
+    from app import comments, db
+    comments.recount(db.session.connection(), db.true())
+    db.session.commit()
+    click.echo('Comment counts recounted.')
+
+
+@rollups_cli.command('backfill')
+@click.option('--chunk-size', default=1000, show_default=True, help='Tickets read per query.')
+def backfill_rollups(chunk_size):
+    """Rebuild the dashboard rollups from the existing tickets; ticket changes wait until it is done."""
+    from app import rollups
+    count = rollups.backfill(chunk_size=chunk_size)
+    click.echo(f'Rolled up {count} tickets.')
+
+
+@click.command('worker')
+@click.option('--batch-size', type=int, help='Jobs claimed per batch (default: JOB_BATCH_SIZE).')
+@click.option('--poll-interval', type=float, help='Seconds to sleep when the queue is empty (default: JOB_POLL_INTERVAL).')
+@click.option('--burst', is_flag=True, help='Exit once the queue is empty.')
+def worker(batch_size, poll_interval, burst):
+    """Run background jobs until stopped with SIGTERM or Ctrl-C."""
+    from app.jobs import Worker
+    job_worker = Worker(current_app._get_current_object(), batch_size=batch_size, poll_interval=poll_interval)
+    job_worker.install_signal_handlers()
+    click.echo(f'Worker {job_worker.name} started.')
+    count = job_worker.run(burst=burst)
+    click.echo(f'Worker {job_worker.name} stopped after {count} jobs.')
+
+
+@jobs_cli.command('stats')
+def job_stats():
+    """Count jobs by status."""
+    from app import jobs
+    for status, count in sorted(jobs.stats().items()):
+        click.echo(f'{status}: {count}')
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name')
+@click.option('--payload', default='{}', help='JSON object of keyword arguments.')
+@click.option('--priority', type=int, default=0, show_default=True)
+def enqueue_job(name, payload, priority):
+    """Queue a job by task name, e.g. `flask jobs enqueue rollups.backfill`."""
+    import json
+    from app import db, jobs
+    try:
+        jobs.enqueue(name, json.loads(payload), priority=priority)
+    except (LookupError, ValueError) as exc:
+        raise click.UsageError(str(exc))
+    db.session.commit()
+    click.echo(f'Queued {name}.')
+
+
+@queues_cli.command('create')
+@click.argument('name')
+@click.option('--strategy', type=click.Choice(['least_loaded', 'round_robin']), default='least_loaded',
+              show_default=True)
+def create_queue(name, strategy):
+    """Create a queue; set ASSIGNMENT_DEFAULT_QUEUE to route new tickets to it."""
+    from app import assignment, db
+    assignment.create_queue(name, strategy)
+    db.session.commit()
+    click.echo(f'Created queue {name} ({strategy}).')
+
+
+@queues_cli.command('add-agent')
+@click.argument('queue')
+@click.argument('usernames', nargs=-1, required=True)
+def add_agents(queue, usernames):
+    """Add agents to a queue by username."""
+    from app import assignment, db
+    from app.models import Queue, User
+    target = Queue.query.filter_by(name=queue).first()
+    if target is None:
+        raise click.UsageError(f'No queue named {queue!r}')
+    for username in usernames:
+        user = User.query.filter_by(username=username).first()
+        if user is None:
+            raise click.UsageError(f'No user named {username!r}')
+        assignment.add_member(target, user)
+    db.session.commit()
+    click.echo(f'Added {len(usernames)} agents to {queue}.')
+
+
+@queues_cli.command('recount')
+def recount_loads():
+    """Rebuild every agent's load counters from the tickets."""
+    from app import assignment, db
+    assignment.recount()
+    db.session.commit()
+    click.echo('Agent loads recounted.')
+
+
+@audit_cli.command('archive')
+@click.option('--days', type=int, help='Archive events older than this (default: AUDIT_ARCHIVE_AFTER_DAYS).')
+@click.option('--batch-size', type=int, help='Events moved per transaction (default: AUDIT_ARCHIVE_BATCH_SIZE).')
+def archive_events(days, batch_size):
+    """Move old ticket events to the archive table."""
+    from datetime import datetime, timedelta
+    from app import audit
+    before = datetime.utcnow() - timedelta(days=days) if days is not None else None
+    count = audit.archive(before=before, batch_size=batch_size)
+    click.echo(f'Archived {count} ticket events.')
+
+
+@api_cli.command('create-token')
+@click.argument('username')
+@click.option('--name', default='default', show_default=True, help='What the token is for.')
+def create_api_token(username, name):
+    """Create an API token for USERNAME and print it; it is not shown again."""
+    from app import auth, db
+    from app.models import User
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        raise click.UsageError(f'No user named {username!r}')
+    token = auth.create_token(user, name)
+    db.session.commit()
+    click.echo(token)
+
+
+@api_cli.command('revoke-token')
+@click.argument('token_id', type=int)
+def revoke_api_token(token_id):
+    """Revoke a token by id (see `flask api tokens`)."""
+    from app import auth, db
+    from app.models import ApiToken
+    token = db.session.get(ApiToken, token_id)
+    if token is None:
+        raise click.UsageError(f'No token with id {token_id}')
+    auth.revoke_token(token)
+    db.session.commit()
+    click.echo(f'Revoked token {token_id}; other workers stop accepting it within '
+               f"{current_app.config['API_TOKEN_CACHE_TTL']}s.")
+
+
+@api_cli.command('tokens')
+def list_api_tokens():
+    """List API tokens and their owners."""
+    from app.models import ApiToken
+    for token in ApiToken.query.order_by(ApiToken.id):
+        state = f'revoked {token.revoked_at:%Y-%m-%d}' if token.revoked_at else 'active'
+        click.echo(f'{token.id}\t{token.user.username}\t{token.name}\t{token.created:%Y-%m-%d}\t{state}')
+
+
+def register_cli(app):
+    init_migrations(app)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(tickets_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(jobs_cli)
+    app.cli.add_command(queues_cli)
+    app.cli.add_command(audit_cli)
+    app.cli.add_command(api_cli)
+    app.cli.add_command(duplicates_cli)
+    app.cli.add_command(assets_cli)
+    app.cli.add_command(templates_cli)
+    app.cli.add_command(worker)
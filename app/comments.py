@@ -0,0 +1,93 @@
+# app/comments.py
+"""Comment threads on the ticket page.
+
+A ticket page shows its newest COMMENTS_PER_PAGE comments, keyset-paginated on
+``(timestamp, id)`` through the ``(ticket_id, timestamp)`` index; older ones
+are fetched a page at a time as fragments. Each ticket keeps a count of its
+visible comments and the time of the latest one, so nothing has to count a
+thread to show its size. An ``after_flush`` hook keeps both in step with ORM
+changes, in the same transaction: inserts add to them, deletes and soft
+deletes recount the tickets they touched. Set-based writers (app.bulk) call
+``recount`` themselves.
+"""
+from collections import defaultdict
+
+from flask import current_app, has_app_context
+from sqlalchemy import bindparam, event
+from sqlalchemy.orm import Session, joinedload
+
+from app import db
+from app.models import Comment, Ticket
+from app.pagination import keyset_page
+
+# Set-based, so the ORM's soft-delete filter does not apply: exclude deleted comments here
+_comments = Comment.__table__
+_visible = db.and_(_comments.c.ticket_id == Ticket.__table__.c.id, _comments.c.deleted_at.is_(None))
+
+
+def page(ticket_id, cursor=None, per_page=None):
+    """One page of a ticket's comments, oldest first, and the cursor of the page before it (or None)."""
+    query = Comment.query.options(joinedload(Comment.author)).filter(Comment.ticket_id == ticket_id)
+    rows, older = keyset_page(query, [Comment.timestamp, Comment.id], cursor=cursor,
+                              per_page=per_page or current_app.config['COMMENTS_PER_PAGE'])
+    return rows[::-1], older
+
+
+def recount(connection, clause):
+    """Recompute ``comment_count`` and ``last_activity_at`` of the tickets matching ``clause``."""
+    tickets = Ticket.__table__
+    connection.execute(tickets.update().where(clause).values(
+        comment_count=db.select(db.func.count(_comments.c.id)).where(_visible).scalar_subquery(),
+        last_activity_at=db.select(db.func.max(_comments.c.timestamp)).where(_visible).scalar_subquery(),
+    ))
+
+
+def _add(connection, added):
+    tickets = Ticket.__table__
+    latest = bindparam('latest')
+    connection.execute(
+        tickets.update().where(tickets.c.id == bindparam('ticket_id')).values(
+            comment_count=tickets.c.comment_count + bindparam('added'),
+            last_activity_at=db.case((tickets.c.last_activity_at > latest, tickets.c.last_activity_at),
+                                     else_=latest)),
+        [{'ticket_id': ticket_id, 'added': count, 'latest': latest_at}
+         for ticket_id, (count, latest_at) in added.items()])
+
+
+@event.listens_for(Session, 'after_flush')
+def _maintain_counts(session, flush_context):
+    # After the flush, so new comments have their ticket_id and timestamp
+    if not has_app_context() or 'comment_counts' not in current_app.extensions:
+        return
+    added = defaultdict(lambda: [0, None])
+    changed = set()
+
+    for obj in session.new:
+        if isinstance(obj, Comment) and obj.deleted_at is None:
+            entry = added[obj.ticket_id]
+            entry[0] += 1
+            entry[1] = obj.timestamp if entry[1] is None else max(entry[1], obj.timestamp)
+    for obj in session.dirty:
+        if isinstance(obj, Comment) and db.inspect(obj).attrs.deleted_at.history.has_changes():
+            changed.add(obj.ticket_id)
+    for obj in session.deleted:
+        if isinstance(obj, Comment):
+            changed.add(obj.ticket_id)
+
+    if not added and not changed:
+        return
+    connection = session.connection()
+    if added:
+        _add(connection, added)
+    if changed:
+        recount(connection, Ticket.id.in_(changed))
+    # Loaded copies of those tickets now carry old counts
+    touched = changed.union(added)
+    for obj in session.identity_map.values():
+        if isinstance(obj, Ticket) and obj.id in touched:
+            session.expire(obj, ['comment_count', 'last_activity_at'])
+
+
+def init_app(app):
+    # The after_flush hook only runs for apps that opted in here
+    app.extensions['comment_counts'] = True
@@ -0,0 +1,63 @@
+# app/database.py
+"""Engine options and per-connection setup derived from the DB_* and SQLITE_* settings."""
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from app import db, replicas
+
+
+def _is_memory_sqlite(url):
+    return url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:')
+
+
+def engine_options(config, url=None):
+    """Pool settings for SQLALCHEMY_ENGINE_OPTIONS; explicit options in the config win."""
+    url = make_url(url or config['SQLALCHEMY_DATABASE_URI'])
+    options = {'pool_pre_ping': config['DB_POOL_PRE_PING']}
+    if not _is_memory_sqlite(url):
+        # In-memory SQLite runs on one shared StaticPool connection, which takes no sizing
+        options.update(
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT'],
+            pool_recycle=config['DB_POOL_RECYCLE'],
+        )
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragmas(config):
+    pragmas = [
+        f"busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"synchronous = {config['SQLITE_SYNCHRONOUS']}",
+    ]
+    if config['SQLITE_WAL']:
+        # Persistent in the database file; a no-op for in-memory databases
+        pragmas.insert(0, 'journal_mode = WAL')
+    return pragmas
+
+
+def _set_pragmas(pragmas):
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(f'PRAGMA {pragma}')
+        finally:
+            cursor.close()
+    return on_connect
+
+
+def init_app(app):
+    """Initialise Flask-SQLAlchemy with the pool options and SQLite pragmas applied."""
+    # Replicas get engines of their own rather than binds: nothing should create tables or migrate there
+    replica_engines = [create_engine(url, **engine_options(app.config, url)) for url in app.config['DB_REPLICA_URLS']]
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+    db.init_app(app)
+
+    pragmas = sqlite_pragmas(app.config)
+    with app.app_context():
+        for engine in list(db.engines.values()) + replica_engines:
+            if engine.dialect.name == 'sqlite':
+                event.listen(engine, 'connect', _set_pragmas(pragmas))
+    replicas.init_app(app, replica_engines)
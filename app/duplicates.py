@@ -0,0 +1,226 @@
+# app/duplicates.py
+"""Near-duplicate ticket detection with MinHash and locality-sensitive hashing.
+
+A ticket's title and description are cut into word shingles (DUPLICATE_SHINGLE_SIZE
+consecutive words). Its MinHash signature keeps, for each of
+DUPLICATE_BANDS * DUPLICATE_ROWS hash functions, the smallest hash of any
+shingle; two signatures agree in about the fraction of positions that the
+shingle sets' Jaccard similarity predicts. Signatures are stored packed, four
+bytes a position, in ``ticket_signature``.
+
+For lookups each signature is split into DUPLICATE_BANDS bands of
+DUPLICATE_ROWS positions, and every band is hashed into ``duplicate_bucket``.
+Tickets sharing at least one bucket with the text are the only candidates, so
+a lookup reads a few index ranges instead of comparing against every ticket;
+the candidates' signatures then give the similarity estimate.
+
+The index is maintained with the search index (the ``search.index_ticket``
+job) and rebuilt with ``flask duplicates rebuild``, which is also needed after
+changing any of the settings above.
+"""
+import random
+import struct
+import zlib
+from collections import namedtuple
+
+from flask import current_app
+
+from app import audit, caching, comments, db, realtime, search
+from app.enums import TicketStatus
+from app.jobs import enqueue
+from app.models import Comment, DuplicateBucket, Ticket, TicketSignature
+from app.rollups import is_resolved
+
+# Hash functions are (a * x + b) mod a Mersenne prime, cut to 32 bits
+_PRIME = (1 << 61) - 1
+_MASK = 0xFFFFFFFF
+
+# Candidates ranked by shared buckets before their signatures are compared
+MAX_CANDIDATES = 50
+
+Suggestion = namedtuple('Suggestion', 'id title status created_date similarity')
+
+
+def _permutations(count):
+    # Fixed seed: signatures must be comparable across processes and restarts
+    rng = random.Random(0x5EED)
+    return [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(count)]
+
+
+_cache = {}
+
+
+def _settings():
+    config = current_app.config
+    key = (config['DUPLICATE_BANDS'], config['DUPLICATE_ROWS'], config['DUPLICATE_SHINGLE_SIZE'])
+    if key not in _cache:
+        _cache[key] = _permutations(key[0] * key[1])
+    return key, _cache[key]
+
+
+def shingles(title, description):
+    """The set of word n-grams of a ticket's text, as 32-bit hashes."""
+    words = search.tokenize(f'{title or ""} {description or ""}')
+    size = current_app.config['DUPLICATE_SHINGLE_SIZE']
+    if len(words) <= size:
+        grams = [' '.join(words)] if words else []
+    else:
+        grams = (' '.join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return {zlib.crc32(gram.encode()) for gram in grams}
+
+
+def signature(title, description):
+    """The MinHash signature of a ticket's text, or None when it has no words."""
+    hashed = shingles(title, description)
+    if not hashed:
+        return None
+    _, permutations = _settings()
+    return [min((a * x + b) % _PRIME for x in hashed) & _MASK for a, b in permutations]
+
+
+def pack(values):
+    return struct.pack(f'<{len(values)}I', *values)
+
+
+def unpack(data):
+    return struct.unpack(f'<{len(data) // 4}I', data)
+
+
+def bands(values):
+    """``(band, bucket)`` pairs of a signature; buckets fit a signed 32-bit column."""
+    (band_count, rows, _), _ = _settings()
+    return [(band, zlib.crc32(pack(values[band * rows:(band + 1) * rows])) & 0x7FFFFFFF)
+            for band in range(band_count)]
+
+
+def similarity(first, second):
+    """The estimated Jaccard similarity of two signatures."""
+    if len(first) != len(second):
+        return 0.0
+    return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+
+# --- Index maintenance ------------------------------------------------------------------
+
+def _store(connection, ticket_id, values):
+    connection.execute(TicketSignature.__table__.insert(), {'ticket_id': ticket_id, 'signature': pack(values)})
+    connection.execute(DuplicateBucket.__table__.insert(), [
+        {'band': band, 'bucket': bucket, 'ticket_id': ticket_id} for band, bucket in bands(values)])
+
+
+def index_ticket(ticket):
+    """Add or refresh a ticket in the duplicate index; call before the session commits."""
+    if ticket.id is None:
+        db.session.flush()
+    remove_matching([ticket.id])
+    values = signature(ticket.title, ticket.description)
+    if values is not None:
+        _store(db.session.connection(), ticket.id, values)
+
+
+def remove_matching(ticket_ids):
+    """Drop the tickets whose ids are in ``ticket_ids`` (a list or a SELECT) from the index."""
+    connection = db.session.connection()
+    connection.execute(DuplicateBucket.__table__.delete().where(DuplicateBucket.ticket_id.in_(ticket_ids)))
+    connection.execute(TicketSignature.__table__.delete().where(TicketSignature.ticket_id.in_(ticket_ids)))
+
+
+def rebuild(batch_size=1000):
+    """Re-index every ticket, committing every ``batch_size`` tickets."""
+    db.session.execute(DuplicateBucket.__table__.delete())
+    db.session.execute(TicketSignature.__table__.delete())
+    db.session.commit()
+
+    count, last_id = 0, 0
+    while True:
+        rows = (db.session.query(Ticket.id, Ticket.title, Ticket.description)
+                .filter(Ticket.id > last_id).order_by(Ticket.id).limit(batch_size).all())
+        if not rows:
+            return count
+        connection = db.session.connection()
+        for row in rows:
+            values = signature(row.title, row.description)
+            if values is not None:
+                _store(connection, row.id, values)
+        db.session.commit()
+        count += len(rows)
+        last_id = rows[-1].id
+
+
+# --- Lookups ----------------------------------------------------------------------------
+
+def similar(title, description, user=None, exclude=None, limit=None):
+    """Tickets whose text is at least DUPLICATE_THRESHOLD similar, most similar first.
+
+    Returns rows with ``id``, ``title``, ``status``, ``created_date`` and
+    ``similarity``. Non-admin users only see their own tickets, as in search.
+    """
+    values = signature(title, description)
+    if values is None:
+        return []
+    config = current_app.config
+    # Visibility is applied before the candidates are cut to MAX_CANDIDATES
+    visible = [Ticket.merged_into_id.is_(None)]
+    if exclude is not None:
+        visible.append(Ticket.id != exclude)
+    if user is not None and not user.is_admin():
+        visible.append(Ticket.user_id == user.id)
+    hits = (db.select(DuplicateBucket.ticket_id)
+            .join(Ticket, Ticket.id == DuplicateBucket.ticket_id)
+            .where(db.tuple_(DuplicateBucket.band, DuplicateBucket.bucket).in_(bands(values)), *visible)
+            .group_by(DuplicateBucket.ticket_id)
+            .order_by(db.func.count().desc())
+            .limit(MAX_CANDIDATES)
+            .subquery())
+    query = (db.session.query(Ticket.id, Ticket.title, Ticket.status, Ticket.created_date,
+                              TicketSignature.signature)
+             .join(hits, hits.c.ticket_id == Ticket.id)
+             .join(TicketSignature, TicketSignature.ticket_id == Ticket.id))
+
+    scored = []
+    for row in query:
+        score = similarity(values, unpack(row.signature))
+        if score >= config['DUPLICATE_THRESHOLD']:
+            scored.append((score, row))
+    scored.sort(key=lambda item: (-item[0], -item[1].id))
+    return [Suggestion(row.id, row.title, row.status, row.created_date, score)
+            for score, row in scored[:limit or config['DUPLICATE_SUGGESTIONS']]]
+
+
+# --- Merging ----------------------------------------------------------------------------
+
+def merge(duplicate, canonical):
+    """Move ``duplicate``'s comments to ``canonical`` and close it as merged; returns how many moved.
+
+    Runs in the caller's transaction.
+    """
+    if duplicate.id == canonical.id:
+        raise ValueError('A ticket cannot be merged into itself')
+    if duplicate.merged_into_id is not None:
+        raise ValueError(f'Ticket #{duplicate.id} was already merged into #{duplicate.merged_into_id}')
+    if canonical.merged_into_id is not None:
+        raise ValueError(f'Ticket #{canonical.id} was itself merged into #{canonical.merged_into_id}')
+
+    connection = db.session.connection()
+    moved_ids = [row[0] for row in db.session.execute(
+        db.select(Comment.id).where(Comment.ticket_id == duplicate.id).execution_options(include_deleted=True))]
+    if moved_ids:
+        # Through the ORM so loaded comments follow, and the search jobs below see the new ticket
+        db.session.execute(db.update(Comment).where(Comment.id.in_(moved_ids)).values(ticket_id=canonical.id))
+        # Search documents carry the comment's ticket
+        for comment_id in moved_ids:
+            enqueue('search.index_comment', {'comment_id': comment_id}, key=f'search.index_comment:{comment_id}')
+    both = Ticket.id.in_([duplicate.id, canonical.id])
+    comments.recount(connection, both)
+    caching.bump_tickets(connection, both)
+    audit.record_merge(canonical.id, duplicate.id, len(moved_ids))
+    remove_matching([duplicate.id])
+    for ticket in (duplicate, canonical):
+        db.session.expire(ticket, ['comment_count', 'last_activity_at', 'version', 'updated_at'])
+
+    duplicate.merged_into_id = canonical.id
+    if not is_resolved(duplicate.status):
+        duplicate.status = TicketStatus.CLOSED
+    realtime.ticket_changed(duplicate)
+    realtime.ticket_changed(canonical)
+    return len(moved_ids)
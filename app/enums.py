@@ -0,0 +1,101 @@
+# app/enums.py
+"""Ticket status and priority, stored as small integers.
+
+The same members serve the models, the forms and the templates. Forms, query
+strings and the bulk/export formats use each member's lowercase ``key``,
+templates show its ``label``, and the database stores its number. ``parse``
+accepts any of the three (case-insensitively, so 'Open' and 'open' are the
+same) and raises ValueError for anything else.
+"""
+import enum
+
+from sqlalchemy import SmallInteger
+from sqlalchemy.types import TypeDecorator
+
+
+class TicketEnum(enum.IntEnum):
+    def __new__(cls, value, key, label):
+        member = int.__new__(cls, value)
+        member._value_ = value
+        member.key = key
+        member.label = label
+        return member
+
+    def __str__(self):
+        return self.label
+
+    def __format__(self, spec):
+        return format(self.label, spec)
+
+    @classmethod
+    def parse(cls, value):
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, int) and not isinstance(value, bool):
+            return cls(value)
+        if isinstance(value, str):
+            text = value.strip().lower().replace(' ', '_').replace('-', '_')
+            for member in cls:
+                if text == member.key:
+                    return member
+            if text.isdigit():
+                return cls(int(text))
+        raise ValueError(f'{value!r} is not a valid {cls.__name__}')
+
+    @classmethod
+    def key_of(cls, value):
+        return cls.parse(value).key
+
+    @classmethod
+    def form_value(cls, value):
+        """The forms' ``coerce``: the key, or ``value`` unchanged so the form reports it as not a valid choice."""
+        try:
+            return cls.key_of(value)
+        except ValueError:
+            return value
+
+    @classmethod
+    def choices(cls):
+        return [(member.key, member.label) for member in cls]
+
+
+class TicketStatus(TicketEnum):
+    OPEN = (1, 'open', 'Open')
+    IN_PROGRESS = (2, 'in_progress', 'In Progress')
+    RESOLVED = (3, 'resolved', 'Resolved')
+    CLOSED = (4, 'closed', 'Closed')
+
+
+# Ordered by urgency, so sorting on the column sorts by priority
+class TicketPriority(TicketEnum):
+    LOW = (1, 'low', 'Low')
+    MEDIUM = (2, 'medium', 'Medium')
+    HIGH = (3, 'high', 'High')
+    CRITICAL = (4, 'critical', 'Critical')
+
+
+class IntEnumType(TypeDecorator):
+    """A SMALLINT column holding a TicketEnum; binds accept anything ``parse`` does."""
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, enum_class):
+        super().__init__()
+        self.enum_class = enum_class
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(self.enum_class.parse(value))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.enum_class(value)
+
+    def process_literal_param(self, value, dialect):
+        return str(self.process_bind_param(value, dialect))
+
+    @property
+    def python_type(self):
+        return self.enum_class
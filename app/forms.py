@@ -1,11 +1,15 @@
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField
+from wtforms import StringField, PasswordField, BooleanField, SubmitField, TextAreaField, IntegerField
 from wtforms.fields.choices import SelectField
 
 from wtforms.validators import DataRequired, ValidationError, Email, EqualTo, Length
+from app.enums import TicketPriority, TicketStatus
 from app.models import User
 
+STATUS_CHOICES = TicketStatus.choices()
+PRIORITY_CHOICES = TicketPriority.choices()
+
 class LoginForm(FlaskForm):
     username = StringField('Username', validators=[DataRequired()])
     password = PasswordField('Password', validators=[DataRequired()])
@@ -36,13 +40,43 @@ class TicketForm(FlaskForm):
     title = StringField('Title', validators=[DataRequired(), Length(min=5, max=100)])
     description = TextAreaField('Description', validators=[DataRequired(), Length(min=10, max=5000)])
 
-    status = SelectField('Status', choices=[('open', 'Open'), ('in_progress', 'In Progress'), ('resolved', 'Resolved'), ('closed', 'Closed')],
-                         validators=[DataRequired()])
-    priority = SelectField('Priority', choices=[('low', 'Low'), ('medium', 'Medium'), ('high', 'High'), ('critical', 'Critical')],
+    # Coerced to the key, so 'Open' from an import or a ticket's TicketStatus both select 'open'
+    status = SelectField('Status', choices=STATUS_CHOICES, coerce=TicketStatus.form_value, validators=[DataRequired()])
+    priority = SelectField('Priority', choices=PRIORITY_CHOICES, coerce=TicketPriority.form_value,
                            validators=[DataRequired()])
 
     submit = SubmitField('Submit')
 
 class CommentForm(FlaskForm):
     content = TextAreaField('Comment', validators=[DataRequired(), Length(min=1, max=1000)])
-    submit = SubmitField('Add Comment')
\ No newline at end of file
+    submit = SubmitField('Add Comment')
+
+
+class AssignTicketForm(FlaskForm):
+    # Choices are filled in by the view from the queues and their members
+    queue_id = SelectField('Queue', coerce=int)
+    assignee = SelectField('Assignee')
+    submit = SubmitField('Assign')
+
+
+class MergeTicketForm(FlaskForm):
+    into = IntegerField('Merge into ticket #', validators=[DataRequired()])
+    submit = SubmitField('Merge')
+
+
+class SimilarTicketsForm(FlaskForm):
+    # Posted by similar_tickets.js from the create-ticket page; only the CSRF token is checked
+    title = StringField('Title')
+    description = TextAreaField('Description')
+
+
+class QueueForm(FlaskForm):
+    name = StringField('Name', validators=[DataRequired(), Length(max=64)])
+    strategy = SelectField('Strategy', choices=[('least_loaded', 'Least loaded'), ('round_robin', 'Round robin')])
+    submit = SubmitField('Create Queue')
+
+
+class QueueMemberForm(FlaskForm):
+    username = StringField('Agent', validators=[DataRequired(), Length(max=64)])
+    active = BooleanField('Taking tickets', default=True)
+    submit = SubmitField('Add Agent')
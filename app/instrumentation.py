@@ -0,0 +1,270 @@
+# app/instrumentation.py
+"""Per-request database and template instrumentation.
+
+Query counting (and the @query_budget check built on it) is always on.
+Setting PROFILING_ENABLED additionally times every statement and template,
+adds a Server-Timing header and a structured log line to each request, and
+serves Prometheus metrics at METRICS_PATH.
+"""
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, current_app, g, has_request_context, request
+from flask.signals import before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+profiling_logger = logging.getLogger('app.profiling')
+
+# Latency buckets in seconds, and statements-per-request buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+# Longest statement text kept in the slow-statement list
+MAX_STATEMENT_LENGTH = 300
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(limit):
+    """Declare the most SQL statements a view may run per request.
+
+    Put it directly above the view function (below the route and auth
+    decorators); functools.wraps carries the attribute out to the endpoint.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            return f(*args, **kwargs)
+        decorated_function.query_budget = limit
+        return decorated_function
+    return decorator
+
+
+def _profiling():
+    return has_request_context() and current_app.config.get('PROFILING_ENABLED')
+
+
+def parameter_shape(parameters, executemany=False):
+    """Describe bound parameters by type only, so logs never carry user data."""
+    if executemany:
+        rows = list(parameters or [])
+        return f'{len(rows)} x {parameter_shape(rows[0]) if rows else "()"}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(type(v).__name__ for v in parameters) + ')'
+    return type(parameters).__name__
+
+
+# --- Engine and template hooks ------------------------------------------------------
+
+def _reset_request_stats():
+    # g can outlive a request when a test keeps an app context pushed, so start from zero
+    g.query_count = 0
+    g.db_time = 0.0
+    g.template_time = 0.0
+    g.statements = []
+    g.status_code = None
+    g.request_started = time.perf_counter()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+        if _profiling():
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not _profiling() or not conn.info.get('query_start'):
+        return
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    g.db_time = g.get('db_time', 0.0) + elapsed
+    g.setdefault('statements', []).append(
+        (elapsed, statement[:MAX_STATEMENT_LENGTH], parameter_shape(parameters, executemany))
+    )
+
+
+def _before_render(app, template, context, **extra):
+    if _profiling():
+        g.setdefault('template_starts', []).append(time.perf_counter())
+
+
+def _after_render(app, template, context, **extra):
+    if _profiling() and g.get('template_starts'):
+        g.template_time = g.get('template_time', 0.0) + time.perf_counter() - g.template_starts.pop()
+
+
+# --- Prometheus metrics ---------------------------------------------------------------
+
+class Histogram:
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label, value):
+        with self._lock:
+            counts, total = self._series.get(label, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[label] = (counts, total + value)
+
+    def render(self, label_name):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted(self._series.items())
+        for label, (counts, total) in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_name}="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{label_name}="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{{label_name}="{label}"}} {cumulative}')
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.request_latency = Histogram('http_request_duration_seconds',
+                                         'Request latency by endpoint.', LATENCY_BUCKETS)
+        self.db_latency = Histogram('db_time_per_request_seconds',
+                                    'Time spent in SQL per request by endpoint.', LATENCY_BUCKETS)
+        self.query_count = Histogram('db_queries_per_request',
+                                     'SQL statements per request by endpoint.', QUERY_COUNT_BUCKETS)
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_latency, self.db_latency, self.query_count):
+            lines.extend(histogram.render('endpoint'))
+        return '\n'.join(lines) + '\n'
+
+
+def metrics_view():
+    return Response(current_app.extensions['metrics'].render(),
+                    mimetype='text/plain; version=0.0.4')
+
+
+# --- Request lifecycle -------------------------------------------------------------
+
+def _add_server_timing(response):
+    if not current_app.config.get('PROFILING_ENABLED'):
+        return response
+    total = (time.perf_counter() - g.request_started) * 1000
+    # Streamed responses leave here before their template has finished, so
+    # their header only covers the work done up to this point
+    response.headers['Server-Timing'] = ', '.join([
+        f'db;dur={g.get("db_time", 0.0) * 1000:.1f};desc="{g.get("query_count", 0)} queries"',
+        f'tpl;dur={g.get("template_time", 0.0) * 1000:.1f}',
+        f'total;dur={total:.1f}',
+    ])
+    g.status_code = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    if 'request_started' not in g:
+        return
+    _check_query_budget(exc)
+    if current_app.config.get('PROFILING_ENABLED'):
+        _record_request(exc)
+
+
+def _check_query_budget(exc):
+    view = current_app.view_functions.get(request.endpoint)
+    budget = getattr(view, 'query_budget', None)
+    count = g.get('query_count', 0)
+    if budget is None or count <= budget:
+        return
+    message = f'{request.endpoint} ran {count} queries (budget {budget})'
+    if current_app.config.get('QUERY_BUDGET_STRICT') and exc is None:
+        raise QueryBudgetExceeded(message)
+    current_app.logger.warning(message)
+
+
+def _record_request(exc):
+    endpoint = request.endpoint or 'unmatched'
+    duration = time.perf_counter() - g.request_started
+    db_time = g.get('db_time', 0.0)
+    query_count = g.get('query_count', 0)
+
+    metrics = current_app.extensions['metrics']
+    metrics.request_latency.observe(endpoint, duration)
+    metrics.db_latency.observe(endpoint, db_time)
+    metrics.query_count.observe(endpoint, query_count)
+
+    threshold = current_app.config['SLOW_QUERY_THRESHOLD_MS'] / 1000
+    slowest = sorted(g.get('statements', []), key=lambda s: s[0], reverse=True)
+    slowest = slowest[:current_app.config['PROFILING_TOP_STATEMENTS']]
+    profiling_logger.info(json.dumps({
+        'endpoint': endpoint,
+        'method': request.method,
+        'path': request.path,
+        'status': g.get('status_code', 500 if exc else None),
+        'duration_ms': round(duration * 1000, 2),
+        'queries': query_count,
+        'db_ms': round(db_time * 1000, 2),
+        'template_ms': round(g.get('template_time', 0.0) * 1000, 2),
+        'slow_queries': [
+            {'ms': round(elapsed * 1000, 2), 'statement': statement, 'params': shape}
+            for elapsed, statement, shape in slowest if elapsed >= threshold
+        ],
+    }))
+
+
+def init_app(app):
+    # One listener on the Engine class covers every engine, including ones
+    # Flask-SQLAlchemy creates lazily after this point
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render)
+        template_rendered.connect(_after_render)
+
+    app.before_request(_reset_request_stats)
+    app.after_request(_add_server_timing)
+    # Teardown rather than after_request so streamed templates are counted too
+    app.teardown_request(_finish_request)
+
+    if app.config.get('PROFILING_ENABLED'):
+        if not profiling_logger.handlers:
+            # One JSON object per line on stderr unless logging is configured elsewhere
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            profiling_logger.addHandler(handler)
+            profiling_logger.setLevel(logging.INFO)
+        app.extensions['metrics'] = Metrics()
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', metrics_view)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect every statement ``engine`` runs inside the block."""
+    counter = QueryCounter()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        counter.statements.append(statement)
+
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
@@ -0,0 +1,238 @@
+# app/jobs.py
+"""A database-backed job queue for work that should not hold up a request.
+
+``enqueue`` writes a row in the caller's transaction, so a job exists exactly
+when the change that asked for it was committed. ``flask worker`` claims due
+jobs in batches (highest priority first), runs each in its own transaction and
+retries failures with exponential backoff until ``max_attempts``. Delivery is
+at-least-once: a worker that dies mid-job has its jobs requeued after
+JOB_LOCK_TIMEOUT, so tasks must be safe to run twice.
+
+An idempotency key keeps one queued job per key; it is released when a worker
+claims the job, so a change made while the job runs queues a fresh one.
+
+With JOBS_RUN_INLINE set (development, tests) ``enqueue`` runs the task
+straight away inside the caller's transaction instead.
+"""
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import Job
+
+logger = logging.getLogger('app.jobs')
+
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+TASKS = {}
+
+
+def task(name):
+    """Register a function as the handler for jobs called ``name``; the payload is its kwargs."""
+    def decorator(f):
+        TASKS[name] = f
+        return f
+    return decorator
+
+
+def _insert_ignore(connection, row):
+    # Insert unless a queued job already holds the idempotency key
+    table = Job.__table__
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = _dialect_insert(dialect)
+        connection.execute(insert(table).values(row).on_conflict_do_nothing(index_elements=['idempotency_key']))
+        return
+    exists = connection.execute(db.select(table.c.id).where(table.c.idempotency_key == row['idempotency_key'])).first()
+    if exists is None:
+        connection.execute(table.insert().values(row))
+
+
+def _dialect_insert(dialect):
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
+def enqueue(name, payload=None, priority=PRIORITY_NORMAL, delay=0, key=None, max_attempts=None):
+    """Queue ``name(**payload)`` to run after the current transaction commits."""
+    payload = payload or {}
+    if name not in TASKS:
+        raise LookupError(f'No task named {name!r}')
+    if current_app.config['JOBS_RUN_INLINE']:
+        TASKS[name](**payload)
+        return
+
+    now = datetime.utcnow()
+    row = {
+        'name': name,
+        'payload': json.dumps(payload),
+        'priority': priority,
+        'status': 'queued',
+        'attempts': 0,
+        'max_attempts': max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+        'run_at': now + timedelta(seconds=delay),
+        'idempotency_key': key,
+        'created': now,
+    }
+    connection = db.session.connection()
+    if key is None:
+        connection.execute(Job.__table__.insert().values(row))
+    else:
+        _insert_ignore(connection, row)
+
+
+def backoff(attempts, config):
+    """Seconds to wait before retry number ``attempts``: doubling, capped, with jitter."""
+    delay = min(config['JOB_RETRY_BASE_SECONDS'] * 2 ** (attempts - 1), config['JOB_RETRY_MAX_SECONDS'])
+    return delay * random.uniform(0.5, 1.0)
+
+
+class Worker:
+    def __init__(self, app, batch_size=None, poll_interval=None, name=None):
+        self.app = app
+        self.batch_size = batch_size or app.config['JOB_BATCH_SIZE']
+        self.poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+        self.name = name or f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        self._last_maintenance = 0.0
+
+    def stop(self, *args):
+        # Finish the batch in hand, then exit
+        self.stopping = True
+
+    def claim(self):
+        """Mark up to ``batch_size`` due jobs as running for this worker and return them."""
+        now = datetime.utcnow()
+        due = (db.select(Job.id).where(Job.status == 'queued', Job.run_at <= now)
+               .order_by(Job.priority.desc(), Job.run_at, Job.id).limit(self.batch_size))
+        if db.session.get_bind().dialect.name == 'postgresql':
+            due = due.with_for_update(skip_locked=True)
+        ids = db.session.execute(due).scalars().all()
+        if not ids:
+            db.session.commit()
+            return []
+        # The status check keeps two workers that picked the same ids from both claiming them
+        token = f'{self.name}:{uuid.uuid4().hex[:8]}'
+        db.session.execute(
+            db.update(Job).where(Job.id.in_(ids), Job.status == 'queued')
+            .values(status='running', locked_by=token, locked_at=now,
+                    attempts=Job.attempts + 1, idempotency_key=None)
+            .execution_options(synchronize_session=False))
+        db.session.commit()
+        return (Job.query.filter_by(locked_by=token)
+                .order_by(Job.priority.desc(), Job.run_at, Job.id).all())
+
+    def execute(self, job):
+        job_id, name, attempts, max_attempts = job.id, job.name, job.attempts, job.max_attempts
+        started = time.perf_counter()
+        try:
+            handler = TASKS.get(name)
+            if handler is None:
+                raise LookupError(f'No task named {name!r}')
+            handler(**json.loads(job.payload))
+            db.session.commit()
+        except Exception as exc:
+            db.session.rollback()
+            self._failed(job_id, name, attempts, max_attempts, exc)
+            return False
+        self._finish(job_id, status='done', finished_at=datetime.utcnow(), last_error=None)
+        logger.info('job %s %s done in %.1fms', job_id, name, (time.perf_counter() - started) * 1000)
+        return True
+
+    def _finish(self, job_id, **values):
+        db.session.execute(db.update(Job).where(Job.id == job_id).values(locked_by=None, locked_at=None, **values)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def _failed(self, job_id, name, attempts, max_attempts, exc):
+        error = ''.join(traceback.format_exception_only(type(exc), exc)).strip()
+        if attempts >= max_attempts:
+            logger.error('job %s %s failed for good after %d attempts: %s', job_id, name, attempts, error)
+            self._finish(job_id, status='failed', finished_at=datetime.utcnow(), last_error=error)
+            return
+        delay = backoff(attempts, self.app.config)
+        logger.warning('job %s %s failed (attempt %d), retrying in %.0fs: %s', job_id, name, attempts, delay, error)
+        self._finish(job_id, status='queued', last_error=error,
+                     run_at=datetime.utcnow() + timedelta(seconds=delay))
+
+    def maintenance(self):
+        """Requeue jobs whose worker died and drop old finished jobs, at most once a minute."""
+        if time.monotonic() - self._last_maintenance < 60:
+            return
+        self._last_maintenance = time.monotonic()
+        now = datetime.utcnow()
+        stale = now - timedelta(seconds=self.app.config['JOB_LOCK_TIMEOUT'])
+        requeued = db.session.execute(
+            db.update(Job).where(Job.status == 'running', Job.locked_at < stale)
+            .values(status='queued', locked_by=None, locked_at=None, run_at=now)
+            .execution_options(synchronize_session=False)).rowcount
+        if requeued:
+            logger.warning('requeued %d jobs from workers that stopped responding', requeued)
+        cutoff = now - timedelta(days=self.app.config['JOB_RETENTION_DAYS'])
+        db.session.execute(db.delete(Job).where(Job.status.in_(('done', 'failed')), Job.finished_at < cutoff)
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def work_batch(self):
+        """Claim and run one batch; returns how many jobs ran."""
+        jobs = self.claim()
+        for job in jobs:
+            self.execute(job)
+        return len(jobs)
+
+    def run(self, burst=False):
+        """Work until stopped (SIGTERM/SIGINT), or until the queue is empty when ``burst``."""
+        processed = 0
+        with self.app.app_context():
+            while not self.stopping:
+                self.maintenance()
+                count = self.work_batch()
+                processed += count
+                # Each batch starts from a clean session so nothing loaded by a task lingers
+                db.session.remove()
+                if count == 0:
+                    if burst:
+                        break
+                    time.sleep(self.poll_interval)
+        return processed
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+
+def run_pending(app=None, limit=None):
+    """Run every due job in this process; returns how many ran. For tests and cron-style use."""
+    app = app or current_app._get_current_object()
+    worker = Worker(app, batch_size=limit)
+    processed = 0
+    while True:
+        count = worker.work_batch()
+        processed += count
+        if count == 0 or (limit and processed >= limit):
+            return processed
+
+
+def stats():
+    rows = db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all()
+    return dict(rows)
+
+
+def init_app(app):
+    # Registers the built-in tasks
+    from app import tasks  # noqa: F401
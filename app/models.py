@@ -1,7 +1,19 @@
 from datetime import datetime
+from flask import current_app, has_app_context
 from flask_login import UserMixin
+from sqlalchemy.orm import validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db, login
+from app.enums import IntEnumType, TicketPriority, TicketStatus
+
+
+DEFAULT_PASSWORD_HASH_METHOD = 'scrypt:32768:8:1'
+
+
+def password_hash_method():
+    if has_app_context():
+        return current_app.config.get('PASSWORD_HASH_METHOD', DEFAULT_PASSWORD_HASH_METHOD)
+    return DEFAULT_PASSWORD_HASH_METHOD
 
 
 class User(UserMixin, db.Model):
@@ -11,15 +23,20 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(128))
     role = db.Column(db.String(64), index=True)
 
-    # Relationship to access tickets created by the user
-    tickets = db.relationship('Ticket', backref='creator', lazy=True)
+    # Relationship to access tickets created by the user; views pick their own
+    # loader strategy, so the default stays a plain lazy select
+    tickets = db.relationship('Ticket', back_populates='creator', foreign_keys='Ticket.user_id', lazy='select')
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = generate_password_hash(password, method=password_hash_method())
 
     def check_password(self, password):
         return check_password_hash(self.password_hash, password)
 
+    def password_needs_rehash(self):
+        # Werkzeug stores the method and its cost parameters before the first '$'
+        return (self.password_hash or '').split('$', 1)[0] != password_hash_method()
+
     def is_admin(self):
         return self.role == 'admin'
 
@@ -31,23 +48,307 @@ class Ticket(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    status = db.Column(db.String(20), nullable=False)  # e.g., 'Open', 'In Progress', 'Resolved'
-    priority = db.Column(db.String(20), nullable=False)  # e.g., 'Low', 'Medium', 'High'
-    created_date = db.Column(db.DateTime, default=db.func.current_timestamp())
+    status = db.Column(IntEnumType(TicketStatus), nullable=False)  # a TicketStatus; assign a member, key or label
+    priority = db.Column(IntEnumType(TicketPriority), nullable=False)  # a TicketPriority, likewise
+    created_date = db.Column(db.DateTime, default=datetime.utcnow)
     resolved_date = db.Column(db.DateTime, nullable=True)
 
+    # Bumped by app.caching whenever the ticket or one of its comments changes;
+    # the ticket page's ETag and the cached list card are keyed on it
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=True)
+
     # Foreign Key to associate the ticket with a user
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
-    # Relationship to access the user from a ticket (no backref needed here)
-    user = db.relationship('User')
+    # Who works the ticket and the queue it was routed through (app.assignment)
+    assignee_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    queue_id = db.Column(db.Integer, db.ForeignKey('queue.id'), nullable=True, index=True)
+    assigned_at = db.Column(db.DateTime, nullable=True)
+
+    # Set by admin deletes; app.archival hides such rows from every ORM query
+    deleted_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    # Set when the ticket is merged into another as its duplicate (app.duplicates); no FK, so
+    # purging the other ticket leaves this one alone
+    merged_into_id = db.Column(db.Integer, nullable=True)
+
+    # Visible comments and when the latest was posted (None before the first), kept by app.comments
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime, nullable=True)
+
+    # Relationships to the creator and to the ticket's comments (deleted along with the ticket)
+    creator = db.relationship('User', back_populates='tickets', foreign_keys=[user_id])
+    assignee = db.relationship('User', foreign_keys=[assignee_id])
+    queue = db.relationship('Queue')
+    comments = db.relationship('Comment', back_populates='ticket', cascade='all, delete-orphan',
+                               order_by='Comment.timestamp', lazy='select')
+
+    # Composite indexes backing the keyset-paginated ticket list: newest first,
+    # optionally narrowed to one creator, status or priority
+    __table_args__ = (
+        db.Index('ix_ticket_created_id', 'created_date', 'id'),
+        db.Index('ix_ticket_user_created_id', 'user_id', 'created_date', 'id'),
+        db.Index('ix_ticket_status_created_id', 'status', 'created_date', 'id'),
+        db.Index('ix_ticket_priority_created_id', 'priority', 'created_date', 'id'),
+        # An agent's work queue: their open tickets by priority, oldest first
+        db.Index('ix_ticket_assignee_status_priority_created', 'assignee_id', 'status', 'priority', 'created_date'),
+    )
+
+    @validates('status', 'priority')
+    def _coerce_enum(self, key, value):
+        # Every ORM write path ends up here; unknown values raise ValueError
+        return (TicketStatus if key == 'status' else TicketPriority).parse(value)
 
     def __repr__(self):
         return f'<Ticket {self.title}>'
 
+
+# Bearer tokens for the JSON API (app.api). Only a SHA-256 of the token is
+# stored; the token itself is shown once, when `flask api create-token` makes it.
+class ApiToken(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    name = db.Column(db.String(64), nullable=False)
+    token_hash = db.Column(db.String(64), unique=True, nullable=False)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    revoked_at = db.Column(db.DateTime, nullable=True)
+
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<ApiToken {self.id} {self.name}>'
+
+
+# A pool of agents tickets are routed to, round-robin or to the least loaded
+class Queue(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), unique=True, nullable=False)
+    strategy = db.Column(db.String(20), nullable=False, default='least_loaded')  # or 'round_robin'
+    # Round-robin cursor: the member picked last
+    last_assignee_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
+
+    members = db.relationship('QueueMember', back_populates='queue', cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<Queue {self.name}>'
+
+
+class QueueMember(db.Model):
+    queue_id = db.Column(db.Integer, db.ForeignKey('queue.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, index=True)
+    active = db.Column(db.Boolean, nullable=False, default=True)  # inactive members get no new tickets
+
+    queue = db.relationship('Queue', back_populates='members')
+    user = db.relationship('User')
+
+    def __repr__(self):
+        return f'<QueueMember {self.user_id} in {self.queue_id}>'
+
+
+# Per-agent counters of open assigned tickets, maintained by app.assignment in
+# the same transaction as the ticket change, so routing never counts tickets
+class AgentLoad(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    open_tickets = db.Column(db.Integer, nullable=False, default=0)
+    weighted_load = db.Column(db.Integer, nullable=False, default=0)  # open tickets weighted by priority
+
+    def __repr__(self):
+        return f'<AgentLoad {self.user_id} {self.open_tickets}/{self.weighted_load}>'
+
+
 class Comment(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     content = db.Column(db.Text)
     timestamp = db.Column(db.DateTime, index=True, default=datetime.utcnow)
     ticket_id = db.Column(db.Integer, db.ForeignKey('ticket.id'))
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    deleted_at = db.Column(db.DateTime, nullable=True)  # soft delete, as on Ticket
+
+    ticket = db.relationship('Ticket', back_populates='comments')
+    author = db.relationship('User')
+
+    # A ticket's comments in order; also one half of the ticket timeline (app.audit)
+    __table_args__ = (
+        db.Index('ix_comment_ticket_timestamp', 'ticket_id', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f'<Comment {self.id} on ticket {self.ticket_id}>'
+
+
+# Cold storage for tickets resolved (or deleted) long ago, filled by app.archival.
+# Read-only copies with their original ids; no foreign keys, so they outlive
+# their users and queues.
+class TicketArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    title = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text, nullable=False)
+    status = db.Column(IntEnumType(TicketStatus), nullable=False)
+    priority = db.Column(IntEnumType(TicketPriority), nullable=False)
+    created_date = db.Column(db.DateTime)
+    resolved_date = db.Column(db.DateTime, nullable=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    assignee_id = db.Column(db.Integer, nullable=True)
+    queue_id = db.Column(db.Integer, nullable=True)
+    assigned_at = db.Column(db.DateTime, nullable=True)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<TicketArchive {self.title}>'
+
+
+class CommentArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    content = db.Column(db.Text)
+    timestamp = db.Column(db.DateTime)
+    ticket_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_comment_archive_ticket_timestamp', 'ticket_id', 'timestamp'),
+    )
+
+    def __repr__(self):
+        return f'<CommentArchive {self.id} on ticket {self.ticket_id}>'
+
+
+# Append-only history of ticket changes, written by app.audit in the same
+# transaction as the change. ticket_id and user_id are deliberately not foreign
+# keys: the history of a ticket outlives the ticket and whoever changed it.
+class TicketEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)  # None for the CLI and background jobs
+    action = db.Column(db.String(20), nullable=False)  # created/updated/deleted/comment_deleted/archived
+    changes = db.Column(db.Text, nullable=False, default='{}')  # compact JSON, see app.audit
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_ticket_event_ticket_created', 'ticket_id', 'created', 'id'),
+        db.Index('ix_ticket_event_created', 'created'),
+    )
+
+    def __repr__(self):
+        return f'<TicketEvent {self.id} {self.action} ticket {self.ticket_id}>'
+
+
+# Events older than AUDIT_ARCHIVE_AFTER_DAYS, moved here by ``flask audit archive``
+# so the live table stays small; same columns, ids kept
+class TicketEventArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    ticket_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=True)
+    action = db.Column(db.String(20), nullable=False)
+    changes = db.Column(db.Text, nullable=False)
+    created = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_ticket_event_archive_ticket_created', 'ticket_id', 'created', 'id'),
+    )
+
+
+# Inverted index used by app.search when SQLite FTS5 is not available
+class SearchDocument(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(10), nullable=False)  # 'ticket' or 'comment'
+    ref_id = db.Column(db.Integer, nullable=False)
+    ticket_id = db.Column(db.Integer, index=True, nullable=False)
+    length = db.Column(db.Integer, nullable=False, default=0)  # token count, for BM25 length normalisation
+
+    __table_args__ = (
+        db.Index('ix_search_document_kind_ref', 'kind', 'ref_id', unique=True),
+    )
+
+
+class SearchPosting(db.Model):
+    term = db.Column(db.String(64), primary_key=True)
+    document_id = db.Column(db.Integer, db.ForeignKey('search_document.id'), primary_key=True, index=True)
+    title_tf = db.Column(db.Integer, nullable=False, default=0)
+    body_tf = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Near-duplicate index maintained by app.duplicates: a packed MinHash signature
+# per ticket, and one LSH bucket per signature band for candidate lookups
+class TicketSignature(db.Model):
+    ticket_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+
+class DuplicateBucket(db.Model):
+    band = db.Column(db.SmallInteger, primary_key=True)
+    bucket = db.Column(db.Integer, primary_key=True)
+    ticket_id = db.Column(db.Integer, primary_key=True, index=True)
+
+
+# Pre-aggregated ticket counters maintained by app.rollups. One row per
+# (granularity, bucket, status, priority); the dashboard reads only these.
+class TicketRollup(db.Model):
+    granularity = db.Column(db.String(5), primary_key=True)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    status = db.Column(IntEnumType(TicketStatus), primary_key=True)
+    priority = db.Column(IntEnumType(TicketPriority), primary_key=True)
+
+    created = db.Column(db.Integer, nullable=False, default=0)
+    entered = db.Column(db.Integer, nullable=False, default=0)  # tickets that moved into this status
+    exited = db.Column(db.Integer, nullable=False, default=0)  # ...and out of it (including deletes)
+    resolved = db.Column(db.Integer, nullable=False, default=0)
+    resolution_seconds = db.Column(db.BigInteger, nullable=False, default=0)
+    sla_breached = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<TicketRollup {self.granularity} {self.bucket_start} {self.status}/{self.priority}>'
+
+
+# Outbox for the 'database' realtime backend: written in the same transaction
+# as the change it announces and polled by every worker's SSE streams
+class RealtimeMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(40), nullable=False)
+    event = db.Column(db.String(20), nullable=False)
+    data = db.Column(db.Text, nullable=False)  # JSON
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<RealtimeMessage {self.id} {self.channel} {self.event}>'
+
+
+# Named counters bumped in the same transaction as the change they track;
+# 'tickets' changes whenever any ticket is added, edited or deleted and backs
+# the ticket list's ETag
+class CacheGeneration(db.Model):
+    name = db.Column(db.String(40), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<CacheGeneration {self.name}={self.value}>'
+
+
+# Background work for app.jobs; see that module for the life cycle
+class Job(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')  # JSON keyword arguments
+    priority = db.Column(db.Integer, nullable=False, default=0)  # higher runs first
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued/running/done/failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Unique while queued; cleared when a worker claims the job
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=True)
+    locked_by = db.Column(db.String(64), nullable=True, index=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Backs the claim query: next due jobs by priority
+    __table_args__ = (
+        db.Index('ix_job_status_priority_run_at', 'status', 'priority', 'run_at'),
+    )
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
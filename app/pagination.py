@@ -0,0 +1,82 @@
+# app/pagination.py
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    # Datetimes are stored as ISO strings so the cursor survives a round trip through JSON
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token, columns):
+    """Turn a cursor token back into values for ``columns``; returns None if the token is bad."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        return None
+
+    values = []
+    for column, value in zip(columns, payload):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            if python_type is datetime:
+                value = datetime.fromisoformat(value)
+            elif python_type is int:
+                value = int(value)
+        except (TypeError, ValueError):
+            return None
+        values.append(value)
+    return values
+
+
+def _directions(columns, descending):
+    # One flag for every column, or a flag per column
+    if isinstance(descending, bool):
+        return [descending] * len(columns)
+    return list(descending)
+
+
+def keyset_filter(columns, values, descending=True):
+    # Expands (a, b, c) < (x, y, z) into an OR of prefixes so it works on every backend
+    clauses = []
+    for i, (column, desc) in enumerate(zip(columns, _directions(columns, descending))):
+        prefix = [columns[j] == values[j] for j in range(i)]
+        step = column < values[i] if desc else column > values[i]
+        clauses.append(and_(*prefix, step))
+    return or_(*clauses)
+
+
+def keyset_page(query, columns, cursor=None, per_page=20, descending=True):
+    """Fetch one page of ``query`` ordered by ``columns``.
+
+    ``descending`` applies to every column, or is a sequence with one flag per column.
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    Rows must expose every ordering column by its key so the cursor can be built.
+    """
+    values = decode_cursor(cursor, columns)
+    if values is not None:
+        query = query.filter(keyset_filter(columns, values, descending))
+
+    order = [c.desc() if desc else c.asc() for c, desc in zip(columns, _directions(columns, descending))]
+    rows = query.order_by(*order).limit(per_page + 1).all()
+
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
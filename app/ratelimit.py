@@ -0,0 +1,210 @@
+# app/ratelimit.py
+"""Token-bucket rate limits for the endpoints that are expensive to abuse.
+
+RATELIMITS maps an endpoint to ``(scope, requests, seconds)`` rules. Each rule
+is a bucket holding up to ``requests`` tokens, refilled at ``requests /
+seconds`` a second, and every form submission (any method but GET/HEAD/OPTIONS)
+takes one token from each of its buckets. Scopes:
+
+* ``ip``: the client address;
+* ``user``: the logged-in user, or on the login form the username being
+  tried, so one account cannot be stuffed from many addresses; falls back to
+  the address when there is neither.
+
+The check runs in ``before_request``, ahead of the view and so ahead of any
+password hashing or insert. A request over any of its limits takes no tokens
+and gets 429 with Retry-After. Buckets live in a store chosen by
+RATELIMIT_BACKEND:
+
+* ``memory``: a dict in this process; each gunicorn worker counts on its own.
+* ``sqlite``: a small SQLite file (RATELIMIT_SQLITE_PATH) on local disk,
+  shared by every worker on the host. It is separate from the main database
+  so throttling never waits on application writes.
+* ``package.module:Class``: any other Store subclass.
+"""
+import importlib
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+
+from flask import current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import TooManyRequests
+
+logger = logging.getLogger('app.ratelimit')
+
+# Methods that only show a form or page and are never limited
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class Store:
+    """Bucket storage. ``take`` must check and update all ``buckets`` atomically."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def take(self, buckets, now):
+        """Take a token from every ``(key, capacity, rate)`` bucket, or from none.
+
+        Returns 0 when allowed, else the seconds until all of them could pay.
+        """
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+def _refill(state, capacity, rate, now):
+    # ``state`` is (tokens, updated) or None for a bucket never used (or idle long enough to be full)
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + max(0.0, now - updated) * rate)
+
+
+def _settle(levels, buckets):
+    # Seconds until every bucket holds a whole token; 0 when they all do
+    return max([(1 - tokens) / rate for tokens, (_, _, rate) in zip(levels, buckets) if tokens < 1], default=0)
+
+
+class MemoryStore(Store):
+    # Full buckets are forgotten now and then; a missing bucket is a full one
+    PRUNE_EVERY = 1000
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def take(self, buckets, now):
+        with self._lock:
+            levels = [_refill(self._buckets.get(key), capacity, rate, now) for key, capacity, rate in buckets]
+            wait = _settle(levels, buckets)
+            if not wait:
+                for (key, _, _), tokens in zip(buckets, levels):
+                    self._buckets[key] = (tokens - 1, now)
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            return wait
+
+    def _prune(self, now):
+        horizon = _longest_window(self.app)
+        self._buckets = {key: state for key, state in self._buckets.items() if now - state[1] < horizon}
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteStore(Store):
+    PRUNE_EVERY = 1000
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.path = app.config['RATELIMIT_SQLITE_PATH'] or os.path.join(app.instance_path, 'ratelimit.db')
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._local = threading.local()
+        self._calls = 0
+        self._connect().execute('CREATE TABLE IF NOT EXISTS rate_bucket '
+                                '(key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL) WITHOUT ROWID')
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork (gunicorn preloads the app)
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=self.app.config['RATELIMIT_SQLITE_TIMEOUT'],
+                                         isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')  # losing the last few takes in a crash is fine
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def take(self, buckets, now):
+        connection = self._connect()
+        keys = [key for key, _, _ in buckets]
+        # BEGIN IMMEDIATE takes the write lock up front, so the read-check-write cannot interleave
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            rows = dict((row[0], (row[1], row[2])) for row in connection.execute(
+                f"SELECT key, tokens, updated FROM rate_bucket WHERE key IN ({','.join('?' * len(keys))})", keys))
+            levels = [_refill(rows.get(key), capacity, rate, now) for key, capacity, rate in buckets]
+            wait = _settle(levels, buckets)
+            if not wait:
+                connection.executemany('INSERT OR REPLACE INTO rate_bucket (key, tokens, updated) VALUES (?, ?, ?)',
+                                       [(key, tokens - 1, now) for key, tokens in zip(keys, levels)])
+            self._calls += 1
+            if self._calls % self.PRUNE_EVERY == 0:
+                connection.execute('DELETE FROM rate_bucket WHERE updated < ?', (now - _longest_window(self.app),))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return wait
+
+    def clear(self):
+        self._connect().execute('DELETE FROM rate_bucket')
+
+
+BACKENDS = {'memory': MemoryStore, 'sqlite': SQLiteStore}
+
+
+def _store_class(name):
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, _, attribute = name.replace(':', '.').rpartition('.')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def get_store():
+    return current_app.extensions['ratelimit']
+
+
+def _longest_window(app):
+    # After this long untouched, any bucket is full again
+    return max((seconds for rules in app.config['RATELIMITS'].values() for _, _, seconds in rules), default=0)
+
+
+# --- Checking requests ------------------------------------------------------------------
+
+def _subject(scope):
+    if scope == 'user':
+        if current_user.is_authenticated:
+            return f'user:{current_user.id}'
+        username = request.form.get('username', '').strip().lower()
+        if username:
+            return f'username:{username}'
+    # The client's address once PROXY_COUNT lets ProxyFix read it from X-Forwarded-For
+    return f'ip:{request.remote_addr}'
+
+
+def buckets_for(endpoint):
+    """``(key, capacity, rate)`` for every rule on ``endpoint`` as it applies to this request."""
+    return [(f'{endpoint}:{index}:{_subject(scope)}', requests, requests / seconds)
+            for index, (scope, requests, seconds) in enumerate(current_app.config['RATELIMITS'].get(endpoint, ()))]
+
+
+def _check_request():
+    if request.method in SAFE_METHODS or request.endpoint not in current_app.config['RATELIMITS']:
+        return
+    buckets = buckets_for(request.endpoint)
+    try:
+        wait = get_store().take(buckets, time.time())
+    except sqlite3.Error:
+        # A broken or locked store must not take the site down with it
+        logger.warning('Rate limit store unavailable; letting %s through', request.endpoint, exc_info=True)
+        return
+    if wait:
+        raise TooManyRequests('Too many attempts. Please wait a moment and try again.',
+                              retry_after=max(1, math.ceil(wait)))
+
+
+def init_app(app):
+    if not app.config['RATELIMIT_ENABLED']:
+        return
+    app.extensions['ratelimit'] = _store_class(app.config['RATELIMIT_BACKEND'])(app)
+    app.before_request(_check_request)
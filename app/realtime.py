@@ -0,0 +1,277 @@
+# app/realtime.py
+"""Server-Sent Events for ticket and comment changes.
+
+Views call ``ticket_changed``/``comment_added`` before committing. The
+messages are built when the session commits and dropped if it rolls back, so
+a stream never announces a change that did not happen. Delivery goes through
+a broker chosen by REALTIME_BACKEND:
+
+* ``memory``: a ring buffer in this process. Fine for the dev server and a
+  single worker, but streams only see changes made by their own worker.
+* ``database``: an outbox table written in the same transaction and polled
+  by every stream, so it works across gunicorn workers and hosts.
+* ``package.module:Class``: any other Broker subclass.
+
+Streams are long polls: a response ends as soon as it has sent a batch of
+messages, or after REALTIME_STREAM_SECONDS without any, and EventSource
+reconnects after REALTIME_RETRY_MS with the Last-Event-ID of what it got, so
+nothing is missed. Each waiting stream holds a worker thread, so at most
+REALTIME_MAX_STREAMS wait at once per process; a stream over the limit ends
+straight away and its browser tries again later.
+"""
+import importlib
+import itertools
+import json
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from flask import Response, current_app, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.models import RealtimeMessage
+
+ALL_TICKETS = 'tickets'
+
+Message = namedtuple('Message', 'id channel event data')
+
+
+def ticket_channel(ticket_id):
+    return f'ticket:{ticket_id}'
+
+
+def user_channel(user_id):
+    return f'user:{user_id}'
+
+
+class Broker:
+    """Delivery backend. ``stage`` runs inside the committing transaction,
+    ``deliver`` after it committed, ``listen`` on the streaming side."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def stage(self, session, messages):
+        pass
+
+    def deliver(self, messages):
+        pass
+
+    def latest_id(self):
+        raise NotImplementedError
+
+    def listen(self, channels, after_id, timeout):
+        """Return messages on ``channels`` newer than ``after_id``, waiting up to ``timeout`` seconds."""
+        raise NotImplementedError
+
+
+class MemoryBroker(Broker):
+    def __init__(self, app):
+        super().__init__(app)
+        self._messages = deque(maxlen=app.config['REALTIME_BUFFER_SIZE'])
+        self._ids = itertools.count(1)
+        self._changed = threading.Condition()
+
+    def deliver(self, messages):
+        with self._changed:
+            for channel, event_name, data in messages:
+                self._messages.append(Message(next(self._ids), channel, event_name, data))
+            self._changed.notify_all()
+
+    def latest_id(self):
+        with self._changed:
+            return self._messages[-1].id if self._messages else 0
+
+    def _matching(self, channels, after_id):
+        return [m for m in self._messages if m.id > after_id and m.channel in channels]
+
+    def listen(self, channels, after_id, timeout):
+        with self._changed:
+            self._changed.wait_for(lambda: self._matching(channels, after_id), timeout=timeout)
+            return self._matching(channels, after_id)
+
+
+class DatabaseBroker(Broker):
+    # Streams follow the id sequence. SQLite serialises writers so ids commit in
+    # order; on a database with concurrent writers a message whose transaction
+    # commits after a higher id was already read is skipped by open streams.
+    def __init__(self, app):
+        super().__init__(app)
+        with app.app_context():
+            self.engine = db.engine
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def stage(self, session, messages):
+        session.execute(RealtimeMessage.__table__.insert(), [
+            {'channel': channel, 'event': event_name, 'data': data, 'created': datetime.utcnow()}
+            for channel, event_name, data in messages
+        ])
+
+    def latest_id(self):
+        with self.engine.connect() as connection:
+            return connection.execute(db.select(db.func.max(RealtimeMessage.id))).scalar() or 0
+
+    def _fetch(self, connection, channels, after_id):
+        table = RealtimeMessage.__table__
+        rows = connection.execute(
+            db.select(table.c.id, table.c.channel, table.c.event, table.c.data)
+            .where(table.c.id > after_id, table.c.channel.in_(channels))
+            .order_by(table.c.id).limit(100))
+        return [Message(*row) for row in rows]
+
+    def _prune(self, connection):
+        # At most one delete per retention half-period per process, from the streaming side
+        retention = self.app.config['REALTIME_RETENTION_SECONDS']
+        with self._prune_lock:
+            if time.monotonic() - self._last_prune < retention / 2:
+                return
+            self._last_prune = time.monotonic()
+        cutoff = datetime.utcnow() - timedelta(seconds=retention)
+        connection.execute(RealtimeMessage.__table__.delete().where(RealtimeMessage.created < cutoff))
+        connection.commit()
+
+    def listen(self, channels, after_id, timeout):
+        # A short-lived connection per poll, so idle streams hold no pool slot or read snapshot
+        interval = self.app.config['REALTIME_POLL_INTERVAL']
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.engine.connect() as connection:
+                messages = self._fetch(connection, channels, after_id)
+                self._prune(connection)
+            remaining = deadline - time.monotonic()
+            if messages or remaining <= 0:
+                return messages
+            time.sleep(min(interval, remaining))
+
+
+BACKENDS = {'memory': MemoryBroker, 'database': DatabaseBroker}
+
+
+def _broker_class(name):
+    if name in BACKENDS:
+        return BACKENDS[name]
+    module, _, attribute = name.replace(':', '.').rpartition('.')
+    return getattr(importlib.import_module(module), attribute)
+
+
+def get_broker():
+    return current_app.extensions['realtime']
+
+
+# --- Publishing -----------------------------------------------------------------------
+
+def _pending(session):
+    return session.info.setdefault('realtime_pending', [])
+
+
+def _publish(event_name, obj, **extra):
+    if has_app_context() and 'realtime' in current_app.extensions:
+        _pending(db.session()).append((event_name, obj, extra))
+
+
+def ticket_changed(ticket, created=False):
+    """Announce a new or edited ticket on its own, its creator's, its assignee's and the all-tickets channel."""
+    _publish('ticket', ticket, created=created)
+
+
+def comment_added(comment, author):
+    _publish('comment', comment, author=author)
+
+
+def _ticket_payload(ticket, created):
+    # Keys for scripts, labels for display
+    return {'id': ticket.id, 'title': ticket.title, 'status': ticket.status.key, 'status_label': ticket.status.label,
+            'priority': ticket.priority.key, 'priority_label': ticket.priority.label,
+            'user_id': ticket.user_id, 'assignee_id': ticket.assignee_id, 'created': created}
+
+
+def _comment_payload(comment, author):
+    return {'id': comment.id, 'ticket_id': comment.ticket_id, 'content': comment.content,
+            'author': author, 'timestamp': comment.timestamp.isoformat(sep=' ', timespec='seconds')}
+
+
+def _serialize(event_name, obj, extra):
+    if event_name == 'ticket':
+        payload = json.dumps(_ticket_payload(obj, **extra))
+        channels = [ticket_channel(obj.id), user_channel(obj.user_id), ALL_TICKETS]
+        if obj.assignee_id is not None and obj.assignee_id != obj.user_id:
+            channels.append(user_channel(obj.assignee_id))
+        return [(channel, event_name, payload) for channel in channels]
+    payload = json.dumps(_comment_payload(obj, **extra))
+    return [(ticket_channel(obj.ticket_id), event_name, payload)]
+
+
+@event.listens_for(Session, 'before_commit')
+def _stage_messages(session):
+    pending = session.info.get('realtime_pending')
+    if not pending:
+        return
+    # Ids and defaults (timestamps) are only there once the new rows are flushed
+    session.flush()
+    messages = [message for event_name, obj, extra in pending for message in _serialize(event_name, obj, extra)]
+    session.info['realtime_pending'] = []
+    session.info['realtime_staged'] = messages
+    get_broker().stage(session, messages)
+
+
+@event.listens_for(Session, 'after_commit')
+def _deliver_messages(session):
+    messages = session.info.pop('realtime_staged', None)
+    if messages:
+        get_broker().deliver(messages)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_messages(session):
+    session.info.pop('realtime_pending', None)
+    session.info.pop('realtime_staged', None)
+
+
+# --- Streaming ------------------------------------------------------------------------
+
+def _format(message):
+    return f'id: {message.id}\nevent: {message.event}\ndata: {message.data}\n\n'
+
+
+def stream(channels):
+    """An event-stream response for ``channels``, resuming after Last-Event-ID if given."""
+    broker = get_broker()
+    config = current_app.config
+    last_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id', ''), type=str)
+    last_id = int(last_id) if last_id.isdigit() else broker.latest_id()
+    keepalive = config['REALTIME_KEEPALIVE_SECONDS']
+    deadline = time.monotonic() + config['REALTIME_STREAM_SECONDS']
+    retry = config['REALTIME_RETRY_MS']
+    slots = current_app.extensions['realtime_slots']
+    # Give the request's connection back now rather than when the stream ends
+    db.session.close()
+
+    def generate():
+        yield f'retry: {retry}\n\n'
+        if slots is not None and not slots.acquire(blocking=False):
+            return
+        try:
+            while time.monotonic() < deadline:
+                messages = broker.listen(channels, last_id,
+                                         timeout=min(keepalive, max(deadline - time.monotonic(), 0)))
+                if messages:
+                    # Hand the thread back; the browser reconnects from the last id
+                    yield ''.join(_format(message) for message in messages)
+                    return
+                yield ': keepalive\n\n'
+        finally:
+            if slots is not None:
+                slots.release()
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def init_app(app):
+    app.extensions['realtime'] = _broker_class(app.config['REALTIME_BACKEND'])(app)
+    limit = app.config['REALTIME_MAX_STREAMS']
+    app.extensions['realtime_slots'] = threading.BoundedSemaphore(limit) if limit else None
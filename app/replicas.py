@@ -0,0 +1,141 @@
+# app/replicas.py
+"""Sending the reads of read-heavy pages to replicas.
+
+app/database.py creates an engine for each of DB_REPLICA_URLS, with the same
+pool settings as the primary. They are not Flask-SQLAlchemy binds, so
+create_all and migrations leave them alone. A GET or HEAD request to an endpoint in
+DB_REPLICA_ENDPOINTS picks one healthy replica for its duration, and the
+session's get_bind sends that request's SELECTs there. Everything else, and
+any statement after the request's first write, goes to the primary.
+
+* Read-your-writes: a request that writes marks the visitor's session, and
+  their next DB_REPLICA_STICKY_SECONDS of requests read from the primary, so
+  a new ticket or comment is on the page they are redirected to.
+* Health and lag: each replica is probed at most every
+  DB_REPLICA_CHECK_SECONDS. One that fails the probe, or lags the primary by
+  more than DB_REPLICA_MAX_LAG_SECONDS, is left out until the next probe; with
+  none left, requests read from the primary.
+
+Lag comes from DB_REPLICA_LAG_QUERY, or for PostgreSQL from
+``pg_last_xact_replay_timestamp()``. Other databases report no lag and are
+only checked for being up. A second SQLite file copied from the primary stands
+in for a replica locally.
+
+app/__init__.py imports this module before ``db`` exists, so nothing here
+imports from the app package at module level.
+"""
+import logging
+import random
+import threading
+import time
+
+from flask import current_app, g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.sql import Select
+
+logger = logging.getLogger('app.replicas')
+
+SAFE_METHODS = ('GET', 'HEAD')
+# Key in the visitor's session holding the time until which they read from the primary
+STICKY_KEY = '_db_primary_until'
+
+LAG_QUERIES = {
+    'postgresql': 'SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)',
+}
+
+
+class Replica:
+    def __init__(self, key, engine):
+        self.key = key
+        self.engine = engine
+        self.checked = None
+        self.healthy = False
+        self.lag = None
+        self._lock = threading.Lock()
+
+    def _probe(self, config):
+        query = config['DB_REPLICA_LAG_QUERY'] or LAG_QUERIES.get(self.engine.dialect.name, 'SELECT 0')
+        try:
+            with self.engine.connect() as connection:
+                self.lag = float(connection.execute(text(query)).scalar() or 0)
+        except Exception:
+            logger.warning('Replica %s is unreachable; reading from the primary', self.key, exc_info=True)
+            self.healthy, self.lag = False, None
+            return
+        self.healthy = self.lag <= config['DB_REPLICA_MAX_LAG_SECONDS']
+        if not self.healthy:
+            logger.warning('Replica %s is %.1fs behind; reading from the primary', self.key, self.lag)
+
+    def available(self, config, now):
+        if self.checked is None or now - self.checked >= config['DB_REPLICA_CHECK_SECONDS']:
+            # One thread probes; the others go on with the last result
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._probe(config)
+                    self.checked = now
+                finally:
+                    self._lock.release()
+        return self.healthy
+
+
+class RoutingSession(Session):
+    """Sends SELECTs to the request's replica, if it has one and has not written yet."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and isinstance(clause, Select) and not self.info.get('wrote') and has_request_context():
+            replica = g.get('db_replica')
+            if replica is not None:
+                return replica.engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_written(db_session, *args):
+    db_session.info['wrote'] = True
+
+
+def _on_execute(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        state.session.info['wrote'] = True
+
+
+def _after_commit(db_session):
+    if db_session.info.pop('wrote', False) and has_request_context() and 'replicas' in current_app.extensions:
+        # The next pages this visitor loads must show what they just wrote
+        session[STICKY_KEY] = time.time() + current_app.config['DB_REPLICA_STICKY_SECONDS']
+
+
+def _after_transaction_end(db_session, transaction):
+    # Rolled back or closed: nothing was written after all
+    if transaction.parent is None:
+        db_session.info.pop('wrote', None)
+
+
+event.listen(RoutingSession, 'after_flush', _mark_written)
+event.listen(RoutingSession, 'do_orm_execute', _on_execute)
+event.listen(RoutingSession, 'after_commit', _after_commit)
+event.listen(RoutingSession, 'after_transaction_end', _after_transaction_end)
+
+
+def choose():
+    """A healthy replica for this request, or None to read from the primary."""
+    config = current_app.config
+    if request.method not in SAFE_METHODS or request.endpoint not in config['DB_REPLICA_ENDPOINTS']:
+        return None
+    now = time.time()
+    if session.get(STICKY_KEY, 0) > now:
+        return None
+    healthy = [replica for replica in current_app.extensions['replicas'] if replica.available(config, now)]
+    return random.choice(healthy) if healthy else None
+
+
+def _route_request():
+    # Set on every request: tests and streamed responses can share one app context, and so g
+    g.db_replica = choose()
+
+
+def init_app(app, engines):
+    if not engines:
+        return
+    app.extensions['replicas'] = [Replica(f'replica_{index}', engine) for index, engine in enumerate(engines)]
+    app.before_request(_route_request)
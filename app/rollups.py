@@ -0,0 +1,290 @@
+# app/rollups.py
+"""Hourly and daily ticket counters for the dashboard.
+
+Every ticket insert, status or priority change and delete that goes through
+the ORM is turned into counter deltas in a ``before_flush`` hook and written
+in the same transaction, so the rollups never drift from the tickets. Set-based
+changes (app.bulk) call ``record_bulk_status_change``/``record_bulk_delete``.
+
+Backlog for a status is the running total of ``entered - exited``; resolution
+time and SLA breaches are recorded in the bucket where the ticket was resolved.
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect, text
+from sqlalchemy.orm import Session
+
+from app import db
+from app.enums import TicketPriority, TicketStatus
+from app.models import Ticket, TicketArchive, TicketRollup
+
+GRANULARITIES = ('hour', 'day')
+COUNTERS = ('created', 'entered', 'exited', 'resolved', 'resolution_seconds', 'sla_breached')
+
+
+def bucket_start(moment, granularity):
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+# RESOLVED_STATUSES and SLA_TARGET_HOURS are configured by key
+def resolved_statuses():
+    return tuple(TicketStatus.parse(key) for key in current_app.config['RESOLVED_STATUSES'])
+
+
+def is_resolved(status):
+    return status is not None and TicketStatus.parse(status) in resolved_statuses()
+
+
+def sla_limit(priority):
+    hours = current_app.config['SLA_TARGET_HOURS'].get(TicketPriority.key_of(priority))
+    return timedelta(hours=hours) if hours is not None else None
+
+
+class Deltas:
+    """Counter changes keyed by (granularity, bucket, status, priority)."""
+
+    def __init__(self):
+        self.rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def add(self, moment, status, priority, **counters):
+        # Imported rows arrive as keys, ORM objects as members; both land on the same row
+        status, priority = TicketStatus.parse(status), TicketPriority.parse(priority)
+        for granularity in GRANULARITIES:
+            row = self.rows[(granularity, bucket_start(moment, granularity), status, priority)]
+            for name, value in counters.items():
+                row[name] += value
+
+    def resolve(self, moment, status, priority, created_date):
+        elapsed = moment - (created_date or moment)
+        limit = sla_limit(priority)
+        self.add(moment, status, priority, resolved=1,
+                 resolution_seconds=int(elapsed.total_seconds()),
+                 sla_breached=int(limit is not None and elapsed > limit))
+
+    def __bool__(self):
+        return bool(self.rows)
+
+
+def _upsert_statement(connection, rows):
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    elif dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    table = TicketRollup.__table__
+    statement = insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[c.name for c in table.primary_key],
+        set_={name: table.c[name] + statement.excluded[name] for name in COUNTERS},
+    )
+
+
+def apply(deltas, connection):
+    """Add ``deltas`` to the rollup table on ``connection``."""
+    if not deltas:
+        return
+    rows = [dict(zip(('granularity', 'bucket_start', 'status', 'priority'), key), **counters)
+            for key, counters in deltas.rows.items()]
+    statement = _upsert_statement(connection, rows)
+    if statement is not None:
+        connection.execute(statement)
+        return
+
+    # Databases without ON CONFLICT: update, and insert where nothing was there yet
+    table = TicketRollup.__table__
+    for row in rows:
+        key = {name: row[name] for name in ('granularity', 'bucket_start', 'status', 'priority')}
+        where = db.and_(*(table.c[name] == value for name, value in key.items()))
+        result = connection.execute(table.update().where(where).values(
+            {name: table.c[name] + row[name] for name in COUNTERS}))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(row))
+
+
+# --- ORM hook -------------------------------------------------------------------------
+
+def _history_value(state, name):
+    history = state.attrs[name].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.object, name)
+
+
+@event.listens_for(Ticket.status, 'set', active_history=True)
+@event.listens_for(Ticket.priority, 'set', active_history=True)
+def _load_previous_value(target, value, oldvalue, initiator):
+    # active_history loads an expired old value before it is replaced, so
+    # the flush hook can tell which bucket the ticket is leaving
+    pass
+
+
+@event.listens_for(Session, 'before_flush')
+def _collect_ticket_changes(session, flush_context, instances):
+    if not has_app_context() or 'rollups' not in current_app.extensions:
+        return
+    now = datetime.utcnow()
+    deltas = Deltas()
+
+    for obj in session.new:
+        if isinstance(obj, Ticket):
+            if is_resolved(obj.status) and obj.resolved_date is None:
+                obj.resolved_date = now
+            deltas.add(now, obj.status, obj.priority, created=1, entered=1)
+            if is_resolved(obj.status):
+                deltas.resolve(now, obj.status, obj.priority, obj.created_date)
+
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old_status, old_priority = _history_value(state, 'status'), _history_value(state, 'priority')
+        if (old_status, old_priority) == (obj.status, obj.priority):
+            continue
+        deltas.add(now, old_status, old_priority, exited=1)
+        deltas.add(now, obj.status, obj.priority, entered=1)
+        if is_resolved(obj.status) and not is_resolved(old_status):
+            obj.resolved_date = now
+            deltas.resolve(now, obj.status, obj.priority, obj.created_date)
+        elif not is_resolved(obj.status) and is_resolved(old_status):
+            obj.resolved_date = None  # reopened
+
+    for obj in session.deleted:
+        if isinstance(obj, Ticket):
+            state = inspect(obj)
+            deltas.add(now, _history_value(state, 'status'), _history_value(state, 'priority'), exited=1)
+
+    apply(deltas, session.connection())
+
+
+# --- Set-based changes ------------------------------------------------------------------
+
+def record_bulk_status_change(clause, status):
+    """Account for ``UPDATE ticket SET status=:status WHERE clause``; call it before the UPDATE."""
+    now = datetime.utcnow()
+    deltas = Deltas()
+    groups = (db.session.query(Ticket.status, Ticket.priority, db.func.count(Ticket.id))
+              .filter(clause, Ticket.status != status).group_by(Ticket.status, Ticket.priority))
+    for old_status, priority, count in groups:
+        deltas.add(now, old_status, priority, exited=count)
+        deltas.add(now, status, priority, entered=count)
+
+    if is_resolved(status):
+        # Newly resolved tickets: resolution time and SLA breaches in one pass over their created dates
+        newly_resolved = (db.session.query(Ticket.priority, Ticket.created_date)
+                          .filter(clause, Ticket.status.notin_(resolved_statuses())))
+        for priority, created_date in newly_resolved.yield_per(1000):
+            deltas.resolve(now, status, priority, created_date)
+    apply(deltas, db.session.connection())
+    return now
+
+
+def record_bulk_delete(clause):
+    """Account for ``DELETE FROM ticket WHERE clause``; call it before the DELETE."""
+    now = datetime.utcnow()
+    deltas = Deltas()
+    groups = (db.session.query(Ticket.status, Ticket.priority, db.func.count(Ticket.id))
+              .filter(clause).group_by(Ticket.status, Ticket.priority))
+    for status, priority, count in groups:
+        deltas.add(now, status, priority, exited=count)
+    apply(deltas, db.session.connection())
+
+
+def record_existing_tickets(tickets):
+    """Count ``(status, priority, created_date, resolved_date)`` tuples as they stand.
+
+    Used for imported rows and the backfill, where the history is unknown: each
+    ticket entered its current status when it was created and, if resolved,
+    was resolved at ``resolved_date``.
+    """
+    deltas = Deltas()
+    for status, priority, created_date, resolved_date in tickets:
+        created_date = created_date or datetime.utcnow()
+        deltas.add(created_date, status, priority, created=1, entered=1)
+        if is_resolved(status):
+            deltas.resolve(resolved_date or created_date, status, priority, created_date)
+    apply(deltas, db.session.connection())
+
+
+# --- Reading ----------------------------------------------------------------------------
+
+def dashboard(days=14):
+    """Everything the dashboard shows, read from the daily rollups only."""
+    day = TicketRollup.granularity == 'day'
+    backlog = (db.session.query(TicketRollup.status, TicketRollup.priority,
+                                db.func.sum(TicketRollup.entered - TicketRollup.exited))
+               .filter(day).group_by(TicketRollup.status, TicketRollup.priority).all())
+
+    since = bucket_start(datetime.utcnow(), 'day') - timedelta(days=days - 1)
+    per_day = (db.session.query(TicketRollup.bucket_start,
+                                db.func.sum(TicketRollup.created), db.func.sum(TicketRollup.resolved))
+               .filter(day, TicketRollup.bucket_start >= since)
+               .group_by(TicketRollup.bucket_start).order_by(TicketRollup.bucket_start).all())
+
+    per_priority = (db.session.query(TicketRollup.priority, db.func.sum(TicketRollup.resolved),
+                                     db.func.sum(TicketRollup.resolution_seconds),
+                                     db.func.sum(TicketRollup.sla_breached))
+                    .filter(day, TicketRollup.bucket_start >= since)
+                    .group_by(TicketRollup.priority).order_by(TicketRollup.priority).all())
+
+    return {
+        'open_backlog': sum(int(n) for status, _, n in backlog if not is_resolved(status)),
+        'backlog': [{'status': s.key, 'priority': p.key, 'count': int(n)} for s, p, n in backlog if n],
+        'daily': [{'day': d.date().isoformat(), 'created': int(c), 'resolved': int(r)} for d, c, r in per_day],
+        'resolution': [{
+            'priority': priority.key,
+            'resolved': int(count),
+            'avg_hours': round(int(seconds) / int(count) / 3600, 2) if count else None,
+            'sla_breached': int(breached),
+            'sla_breach_rate': round(int(breached) / int(count), 3) if count else None,
+        } for priority, count, seconds, breached in per_priority],
+    }
+
+
+# --- Backfill ---------------------------------------------------------------------------
+
+def _lock_rollups(connection):
+    # Rollup writers must wait for the rebuild: a delta applied while it runs
+    # would be counted again from the ticket's new state. Every writer touches
+    # the rollups before the ticket (before_flush, record_bulk_*), so a blocked
+    # one has not changed its ticket yet either. SQLite gets the same from the
+    # DELETE that follows, which takes the database's write lock.
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(f'LOCK TABLE {TicketRollup.__tablename__} IN EXCLUSIVE MODE'))
+
+
+def backfill(chunk_size=1000):
+    """Rebuild every rollup from the tickets and the ticket archive in one transaction.
+
+    Tickets are read ``chunk_size`` at a time. Ticket changes wait until the
+    rebuild commits, so run it when few are being made; the dashboard keeps
+    showing the old rollups until then.
+    """
+    connection = db.session.connection()
+    _lock_rollups(connection)
+    db.session.query(TicketRollup).delete(synchronize_session=False)
+
+    count = 0
+    # Deleted tickets left the rollups when they were deleted; archived ones still count
+    for model in (Ticket, TicketArchive):
+        last_id = 0
+        while True:
+            rows = (db.session.query(model.id, model.status, model.priority, model.created_date, model.resolved_date)
+                    .filter(model.id > last_id, model.deleted_at.is_(None)).order_by(model.id).limit(chunk_size).all())
+            if not rows:
+                break
+            record_existing_tickets((row.status, row.priority, row.created_date, row.resolved_date) for row in rows)
+            count += len(rows)
+            last_id = rows[-1].id
+    db.session.commit()
+    return count
+
+
+def init_app(app):
+    # The before_flush hook only runs for apps that opted in here
+    app.extensions['rollups'] = True
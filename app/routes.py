@@ -1,25 +1,105 @@
-from flask import render_template, flash, redirect, url_for, request
+import io
+from flask import render_template, make_response, stream_template, flash, redirect, url_for, request, current_app, jsonify, abort, stream_with_context
 from flask_login import current_user, login_user, logout_user, login_required
 from urllib.parse import urlparse
 from app import db
-from app.models import User, Ticket, Comment
-from app.forms import LoginForm, RegistrationForm, TicketForm, CommentForm
+from app.enums import TicketPriority, TicketStatus
+from app.models import User, Ticket, Comment, Queue, QueueMember, AgentLoad
+from app.forms import (LoginForm, RegistrationForm, TicketForm, CommentForm, AssignTicketForm, MergeTicketForm,
+                       QueueForm, QueueMemberForm, SimilarTicketsForm, STATUS_CHOICES, PRIORITY_CHOICES)
+from app.pagination import keyset_page
+from app import search as search_index
+from app import bulk
+from app import rollups
+from app import realtime
+from app import caching
+from app import tasks
+from app import assignment
+from app import audit
+from app import archival
+from app import comments as comment_threads
+from app import duplicates
 from flask import Blueprint
 from app.decorators import admin_required
+from app.instrumentation import query_budget
+from app.auth import verify_password
+from sqlalchemy.orm import aliased, joinedload
 
 bp = Blueprint('routes', __name__)
 
+def ticket_list_query():
+    # Only the columns a ticket card shows; the description is cut down in SQL
+    summary_length = current_app.config['TICKET_SUMMARY_LENGTH']
+    assignee = aliased(User)
+    return db.session.query(
+        Ticket.id,
+        Ticket.title,
+        Ticket.status,
+        Ticket.priority,
+        Ticket.created_date,
+        Ticket.user_id,
+        Ticket.version,
+        db.func.substr(Ticket.description, 1, summary_length).label('summary'),
+        (db.func.length(Ticket.description) > summary_length).label('truncated'),
+        assignee.username.label('assignee_name'),
+    ).outerjoin(assignee, assignee.id == Ticket.assignee_id)
+
+
+def _enum_key(enum_class, value):
+    # Unknown filter values are dropped rather than failing the page
+    try:
+        return enum_class.key_of(value) if value else ''
+    except ValueError:
+        return ''
+
+
 @bp.route('/')
 @login_required
+@query_budget(3)
 def index():
+    # Answer from the browser's copy when no ticket changed since it was rendered
+    validators = caching.list_validators()
+    cached = caching.not_modified(*validators)
+    if cached is not None:
+        return cached
+
+    query = ticket_list_query()
+    filters = {
+        'status': _enum_key(TicketStatus, request.args.get('status', '')),
+        'priority': _enum_key(TicketPriority, request.args.get('priority', '')),
+        'user_id': request.args.get('user_id', '', type=str),
+        'assignee_id': request.args.get('assignee_id', '', type=str),
+    }
+
     if current_user.role == 'admin':
-        # Admin sees all tickets
-        tickets = Ticket.query.all()
+        # Admin sees all tickets, optionally narrowed to one creator or assignee
+        if filters['user_id'].isdigit():
+            query = query.filter(Ticket.user_id == int(filters['user_id']))
+        if filters['assignee_id'].isdigit():
+            query = query.filter(Ticket.assignee_id == int(filters['assignee_id']))
     else:
         # Regular user sees only their tickets
-        tickets = Ticket.query.filter_by(user_id=current_user.id).all()
+        query = query.filter(Ticket.user_id == current_user.id)
+        filters['user_id'] = filters['assignee_id'] = ''
+
+    if filters['status']:
+        query = query.filter(Ticket.status == filters['status'])
+    if filters['priority']:
+        query = query.filter(Ticket.priority == filters['priority'])
 
-    return render_template('index.html', title='Home', tickets=tickets)
+    tickets, next_cursor = keyset_page(
+        query,
+        [Ticket.created_date, Ticket.id],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['TICKETS_PER_PAGE'],
+    )
+    active_filters = {k: v for k, v in filters.items() if v}
+
+    response = make_response(render_template(
+        'index.html', title='Home', tickets=tickets, next_cursor=next_cursor,
+        filters=filters, active_filters=active_filters, ticket_card=caching.ticket_card,
+        status_choices=STATUS_CHOICES, priority_choices=PRIORITY_CHOICES))
+    return caching.set_validators(response, *validators)
 
 @bp.route('/login', methods=['GET', 'POST'])
 def login():
@@ -28,9 +108,13 @@ def login():
     form = LoginForm()
     if form.validate_on_submit():
         user = User.query.filter_by(username=form.username.data).first()
-        if user is None or not user.check_password(form.password.data):
+        if user is None or not verify_password(user, form.password.data):
             flash('Invalid username or password')
             return redirect(url_for('routes.login'))  # Correctly prefixed
+        if user.password_needs_rehash():
+            # Hashing parameters changed since this password was stored
+            user.set_password(form.password.data)
+            db.session.commit()
         login_user(user, remember=form.remember_me.data)
         next_page = request.args.get('next')
         if not next_page or urlparse(next_page).netloc != '':
@@ -59,6 +143,7 @@ def register():
 
 @bp.route('/create_ticket', methods=['GET', 'POST'])
 @login_required
+@query_budget(9)  # 6 with its history event, plus the queue, the pick and the agent's counter when routed
 def create_ticket():
     form = TicketForm()
     if form.validate_on_submit():
@@ -70,27 +155,173 @@ def create_ticket():
             priority=form.priority.data,
             user_id=current_user.id  # Associate ticket with the logged-in user
         )
+        assignment.route_new_ticket(ticket)
         db.session.add(ticket)
+        tasks.index_ticket_later(ticket)
+        realtime.ticket_changed(ticket, created=True)
         db.session.commit()
         return redirect(url_for('routes.index'))  # Redirect to the index page to view tickets
     return render_template('create_ticket.html', title='Create Ticket', form=form)
 
 @bp.route('/ticket/<int:id>', methods=['GET', 'POST'])
 @login_required
+@query_budget(6)  # posting a comment: the ticket check, the insert, version and counter bumps, its job and event
 def ticket(id):
-    ticket = Ticket.query.get_or_404(id)
-    comments = Comment.query.filter_by(ticket_id=id).all()
     form = CommentForm()
 
     if form.validate_on_submit():
+        Ticket.query.get_or_404(id)  # only needs to exist; nothing is rendered on this path
         comment = Comment(content=form.content.data, ticket_id=id, user_id=current_user.id)
         db.session.add(comment)
+        tasks.index_comment_later(comment)
+        realtime.comment_added(comment, author=current_user.username)
         db.session.commit()
         flash('Your comment has been added.')
         return redirect(url_for('routes.ticket', id=id))  # Correctly prefixed
 
+    # A primary-key lookup of the version decides whether anything needs loading at all
+    validators = caching.ticket_validators(id)
+    if validators is None:
+        if archival.is_archived(id):
+            return redirect(url_for('routes.archived_ticket', id=id))
+        abort(404)
+    cached = caching.not_modified(*validators)
+    if cached is not None:
+        return cached
+
+    # Creator, assignee and queue joined onto the ticket row; the newest comments and their authors in one more query
+    ticket = Ticket.query.options(
+        joinedload(Ticket.creator),
+        joinedload(Ticket.assignee),
+        joinedload(Ticket.queue),
+    ).get_or_404(id)
+    comments, older_cursor = comment_threads.page(id)
+
     # Ensure this return statement is outside the if block
-    return render_template('ticket.html', title=ticket.title, ticket=ticket, comments=comments, form=form)
+    response = make_response(render_template('ticket.html', title=ticket.title, ticket=ticket,
+                                             comments=comments, older_cursor=older_cursor, form=form))
+    return caching.set_validators(response, *validators)
+
+
+@bp.route('/ticket/<int:id>/comments')
+@login_required
+@query_budget(3)
+def ticket_comments(id):
+    # The "Load older comments" fragment; ?before= is the cursor the previous page handed out
+    validators = caching.ticket_validators(id)
+    if validators is None:
+        abort(404)
+    cursor = request.args.get('before')
+    etag, last_modified = validators
+    etag = caching.make_etag('comments', etag, cursor)
+    cached = caching.not_modified(etag, last_modified)
+    if cached is not None:
+        return cached
+    comments, older_cursor = comment_threads.page(id, cursor=cursor)
+    response = make_response(render_template('_comments.html', ticket_id=id, comments=comments,
+                                             older_cursor=older_cursor))
+    return caching.set_validators(response, etag, last_modified)
+
+
+def _timeline(ticket_id):
+    # A deleted ticket's history stays readable by admins, an archived one's by everybody
+    if (db.session.get(Ticket, ticket_id) is None and current_user.role != 'admin'
+            and not archival.is_archived(ticket_id)):
+        abort(404)
+    entries, next_cursor = audit.timeline(
+        ticket_id,
+        cursor=request.args.get('after'),
+        per_page=current_app.config['TIMELINE_PAGE_SIZE'],
+        include_archived=request.args.get('archived', type=int) == 1,
+    )
+    if not entries and not request.args.get('after'):
+        abort(404)
+    return entries, next_cursor
+
+
+@bp.route('/ticket/<int:id>/history')
+@login_required
+@query_budget(3)
+def ticket_history(id):
+    entries, next_cursor = _timeline(id)
+    return render_template('history.html', title=f'Ticket #{id} history', ticket_id=id, entries=entries,
+                           next_cursor=next_cursor)
+
+
+@bp.route('/ticket/<int:id>/history.json')
+@login_required
+@query_budget(3)
+def ticket_history_data(id):
+    entries, next_cursor = _timeline(id)
+    return jsonify({'ticket_id': id, 'entries': entries, 'next_cursor': next_cursor})
+
+
+@bp.route('/archive/ticket/<int:id>')
+@login_required
+@query_budget(3)
+def archived_ticket(id):
+    # Read-only view of a ticket moved to cold storage; deleted ones only for admins
+    found = archival.archived_ticket(id)
+    if found is None or (found[0].deleted_at is not None and current_user.role != 'admin'):
+        abort(404)
+    ticket, creator, comments = found
+    return render_template('archived_ticket.html', title=ticket.title, ticket=ticket, creator=creator,
+                           comments=comments)
+
+
+@bp.route('/my_queue')
+@login_required
+@query_budget(3)
+def my_queue():
+    # Open tickets assigned to the current agent: most urgent first (priorities are stored in
+    # order of urgency), oldest first within a priority. The (assignee_id, status, priority,
+    # created_date) index finds them, one range per open status; the database then sorts just
+    # this agent's open tickets, and the cursor compares plain columns rather than an expression
+    open_statuses = [status for status in TicketStatus if status not in rollups.resolved_statuses()]
+    query = ticket_list_query().filter(Ticket.assignee_id == current_user.id, Ticket.status.in_(open_statuses))
+    tickets, next_cursor = keyset_page(
+        query,
+        [Ticket.priority, Ticket.created_date, Ticket.id],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['TICKETS_PER_PAGE'],
+        descending=(True, False, False),
+    )
+    return render_template('my_queue.html', title='My Queue', tickets=tickets, next_cursor=next_cursor,
+                           load=db.session.get(AgentLoad, current_user.id), ticket_card=caching.ticket_card)
+
+
+@bp.route('/search')
+@login_required
+def search():
+    query = request.args.get('q', '').strip()
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = current_app.config['SEARCH_RESULTS_PER_PAGE']
+
+    # Fetch one extra hit to know whether there is a next page
+    hits = search_index.search(query, user=current_user, limit=per_page + 1, offset=(page - 1) * per_page)
+    has_next = len(hits) > per_page
+    return render_template('search.html', title='Search', query=query, hits=hits[:per_page],
+                           page=page, has_next=has_next)
+
+
+@bp.route('/events/ticket/<int:ticket_id>')
+@login_required
+def ticket_events(ticket_id):
+    # Comments and status changes on one ticket, for ticket.html
+    if db.session.get(Ticket, ticket_id) is None:
+        abort(404)
+    return realtime.stream([realtime.ticket_channel(ticket_id)])
+
+
+@bp.route('/events/queue')
+@login_required
+def queue_events():
+    # New and changed tickets for the list page: every ticket for admins, otherwise the user's own
+    if current_user.role == 'admin':
+        channel = realtime.ALL_TICKETS
+    else:
+        channel = realtime.user_channel(current_user.id)
+    return realtime.stream([channel])
 
 
 @bp.route('/update_ticket/<int:ticket_id>', methods=['GET', 'POST'])
@@ -102,10 +333,94 @@ def update_ticket(ticket_id):
         ticket.description = form.description.data
         ticket.status = form.status.data
         ticket.priority = form.priority.data
+        tasks.index_ticket_later(ticket)
+        realtime.ticket_changed(ticket)
         db.session.commit()
         flash('Ticket updated successfully!', 'success')
         return redirect(url_for('routes.index'))
-    return render_template('edit_ticket.html', title='Edit Ticket', form=form, ticket=ticket)
+    assign_form = _assign_form(ticket) if current_user.is_authenticated and current_user.role == 'admin' else None
+    return render_template('edit_ticket.html', title='Edit Ticket', form=form, ticket=ticket,
+                           assign_form=assign_form)
+
+
+def _assign_form(ticket):
+    form = AssignTicketForm(queue_id=ticket.queue_id or 0,
+                            assignee=str(ticket.assignee_id) if ticket.assignee_id else 'none')
+    form.queue_id.choices = [(0, 'No queue')] + [(q.id, q.name) for q in Queue.query.order_by(Queue.name)]
+    # Queue members, plus whoever holds the ticket now
+    agents = (db.session.query(User.id, User.username)
+              .filter(db.or_(User.id.in_(db.select(QueueMember.user_id)), User.id == ticket.assignee_id))
+              .order_by(User.username))
+    form.assignee.choices = ([('auto', 'Pick from the queue'), ('none', 'Unassigned')]
+                             + [(str(agent.id), agent.username) for agent in agents])
+    return form
+
+
+@bp.route('/ticket/<int:ticket_id>/assign', methods=['POST'])
+@login_required
+@admin_required
+def assign_ticket(ticket_id):
+    ticket = Ticket.query.get_or_404(ticket_id)
+    form = _assign_form(ticket)
+    if not form.validate_on_submit():
+        flash('Invalid assignment', 'danger')
+        return redirect(url_for('routes.update_ticket', ticket_id=ticket_id))
+
+    queue = db.session.get(Queue, form.queue_id.data) if form.queue_id.data else None
+    if form.assignee.data == 'auto':
+        if queue is None or assignment.auto_assign(ticket, queue) is None:
+            flash('That queue has no active agents to pick from.', 'danger')
+            return redirect(url_for('routes.update_ticket', ticket_id=ticket_id))
+    else:
+        ticket.queue_id = queue.id if queue else None
+        assignment.assign_to(ticket, None if form.assignee.data == 'none' else int(form.assignee.data))
+    realtime.ticket_changed(ticket)
+    db.session.commit()
+    flash('Ticket assigned.', 'success')
+    return redirect(url_for('routes.ticket', id=ticket_id))
+
+@bp.route('/create_ticket/similar', methods=['POST'])
+@login_required
+@query_budget(2)
+def similar_tickets():
+    # Possible duplicates of the ticket being written, for create_ticket.html. Posted,
+    # since a long description would not fit in a request line (or belong in access logs)
+    form = SimilarTicketsForm()
+    if not form.validate_on_submit():
+        abort(400)
+    suggestions = duplicates.similar(form.title.data or '', form.description.data or '', user=current_user)
+    return render_template('_similar_tickets.html', suggestions=suggestions)
+
+
+@bp.route('/ticket/<int:id>/duplicates')
+@login_required
+@admin_required
+@query_budget(3)
+def ticket_duplicates(id):
+    ticket = Ticket.query.get_or_404(id)
+    suggestions = duplicates.similar(ticket.title, ticket.description, exclude=id) if not ticket.merged_into_id else []
+    return render_template('duplicates.html', title=f'Duplicates of #{id}', ticket=ticket, suggestions=suggestions,
+                           form=MergeTicketForm())
+
+
+@bp.route('/ticket/<int:id>/merge', methods=['POST'])
+@login_required
+@admin_required
+def merge_ticket(id):
+    ticket = Ticket.query.get_or_404(id)
+    form = MergeTicketForm()
+    canonical = db.session.get(Ticket, form.into.data) if form.validate_on_submit() else None
+    if canonical is None:
+        flash('Pick an existing ticket to merge into.', 'danger')
+        return redirect(url_for('routes.ticket_duplicates', id=id))
+    try:
+        moved = duplicates.merge(ticket, canonical)
+    except ValueError as exc:
+        flash(str(exc), 'danger')
+        return redirect(url_for('routes.ticket_duplicates', id=id))
+    db.session.commit()
+    flash(f'Merged ticket #{id} into this one ({moved} comments moved).', 'success')
+    return redirect(url_for('routes.ticket', id=canonical.id))
 
 @bp.route('/create_admin', methods=['POST'])
 def create_admin():
@@ -118,33 +433,160 @@ def create_admin():
 @bp.route('/admin')
 @login_required
 @admin_required  # Protect this route with admin access control
+@query_budget(6)
 def admin_panel():
-    users = User.query.all()
-    tickets = Ticket.query.all()
-    comments = Comment.query.all()
-    return render_template('admin_panel.html', users=users, tickets=tickets, comments=comments)
+    # The counts are passed as callables so the queries only run once the
+    # streamed template reaches them; the page header is already on the wire
+    def totals():
+        return {
+            'users': db.session.query(db.func.count(User.id)).scalar(),
+            'tickets': db.session.query(db.func.count(Ticket.id)).scalar(),
+            'comments': db.session.query(db.func.count(Comment.id)).scalar(),
+        }
+
+    def grouped_counts(column):
+        return db.session.query(column, db.func.count(Ticket.id)).group_by(column).order_by(column).all()
+
+    return current_app.response_class(stream_template(
+        'admin_panel.html',
+        totals=totals,
+        status_counts=lambda: grouped_counts(Ticket.status),
+        priority_counts=lambda: grouped_counts(Ticket.priority),
+    ))
+
+
+@bp.route('/admin/dashboard')
+@login_required
+@admin_required
+@query_budget(4)
+def dashboard():
+    # Reads only the precomputed rollups, never the ticket table
+    days = current_app.config['DASHBOARD_DAYS']
+    return render_template('dashboard.html', metrics=rollups.dashboard(days), days=days)
+
+
+@bp.route('/admin/dashboard.json')
+@login_required
+@admin_required
+@query_budget(4)
+def dashboard_data():
+    return jsonify(rollups.dashboard(request.args.get('days', current_app.config['DASHBOARD_DAYS'], type=int)))
+
+
+@bp.route('/admin/queues', methods=['GET', 'POST'])
+@login_required
+@admin_required
+@query_budget(3)
+def admin_queues():
+    form = QueueForm()
+    if form.validate_on_submit():
+        if Queue.query.filter_by(name=form.name.data).first() is not None:
+            flash('A queue with that name already exists.', 'danger')
+        else:
+            assignment.create_queue(form.name.data, form.strategy.data)
+            db.session.commit()
+            flash('Queue created.', 'success')
+        return redirect(url_for('routes.admin_queues'))
+    return render_template('queues.html', title='Queues', queues=assignment.overview(), form=form,
+                           member_form=QueueMemberForm())
+
+
+@bp.route('/admin/queues/<int:queue_id>/members', methods=['POST'])
+@login_required
+@admin_required
+def queue_members(queue_id):
+    # Adds an agent, or pauses/resumes one already in the queue
+    queue = Queue.query.get_or_404(queue_id)
+    form = QueueMemberForm()
+    user = User.query.filter_by(username=form.username.data).first() if form.validate_on_submit() else None
+    if user is None:
+        flash('No such user.', 'danger')
+    else:
+        assignment.add_member(queue, user).active = form.active.data
+        db.session.commit()
+        flash(f'{user.username} {"takes tickets from" if form.active.data else "is paused in"} {queue.name}.', 'success')
+    return redirect(url_for('routes.admin_queues'))
+
+
+@bp.route('/admin/cache')
+@login_required
+@admin_required
+def cache_stats():
+    return jsonify(caching.cache_stats())
+
+
+@bp.route('/admin/users')
+@login_required
+@admin_required
+@query_budget(3)
+def admin_users():
+    users, next_cursor = keyset_page(
+        db.session.query(User.id, User.username, User.email, User.role),
+        [User.id],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['ADMIN_PAGE_SIZE'],
+        descending=False,
+    )
+    # Ticket counts for just this page of users, served by the user_id index
+    ticket_counts = dict(
+        db.session.query(Ticket.user_id, db.func.count(Ticket.id))
+        .filter(Ticket.user_id.in_([u.id for u in users]))
+        .group_by(Ticket.user_id)
+    ) if users else {}
+    return render_template('admin/_users.html', users=users, ticket_counts=ticket_counts,
+                           next_cursor=next_cursor)
+
+
+@bp.route('/admin/tickets')
+@login_required
+@admin_required
+@query_budget(2)
+def admin_tickets():
+    tickets, next_cursor = keyset_page(
+        db.session.query(Ticket.id, Ticket.title, Ticket.status, Ticket.priority, Ticket.created_date),
+        [Ticket.created_date, Ticket.id],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['ADMIN_PAGE_SIZE'],
+    )
+    return render_template('admin/_tickets.html', tickets=tickets, next_cursor=next_cursor,
+                           status_choices=STATUS_CHOICES)
+
+
+@bp.route('/admin/comments')
+@login_required
+@admin_required
+@query_budget(2)
+def admin_comments():
+    comments, next_cursor = keyset_page(
+        db.session.query(Comment.id, Comment.ticket_id, Comment.content),
+        [Comment.id],
+        cursor=request.args.get('after'),
+        per_page=current_app.config['ADMIN_PAGE_SIZE'],
+    )
+    return render_template('admin/_comments.html', comments=comments, next_cursor=next_cursor)
 
 @bp.route('/admin/update_ticket_status/<int:ticket_id>', methods=['POST'])
 @login_required
 @admin_required
 def update_ticket_status(ticket_id):
     ticket = Ticket.query.get_or_404(ticket_id)
-    new_status = request.form.get('status')
-    if new_status:
-        ticket.status = new_status
+    try:
+        ticket.status = request.form.get('status', '')
+    except ValueError:
+        flash('Invalid status selection', 'danger')
+    else:
+        realtime.ticket_changed(ticket)
         db.session.commit()
         flash('Ticket status updated successfully!', 'success')
-    else:
-        flash('Invalid status selection', 'danger')
     return redirect(url_for('routes.admin_panel'))
 
 @bp.route('/admin/delete_ticket/<int:id>')
 @login_required
 @admin_required  # Only admin can delete tickets
 def delete_ticket(id):
-    ticket = Ticket.query.get_or_404(id)
-    db.session.delete(ticket)
-    db.session.commit()
+    Ticket.query.get_or_404(id)
+    # A soft delete, through the same path as the bulk endpoint
+    bulk.delete_tickets(bulk.selection_clauses(Ticket, {'ids': [id]}, bulk.TICKET_FILTERS))
     flash('Ticket has been deleted.')
     return redirect(url_for('routes.admin_panel'))
 
@@ -153,8 +595,8 @@ def delete_ticket(id):
 @admin_required  # Only admin can delete users
 def delete_user(id):
     user = User.query.get_or_404(id)
-    db.session.delete(user)
-    db.session.commit()
+    # Same cascade as the bulk endpoint: their tickets and comments go too
+    bulk.delete_users(bulk.selection_clauses(User, {'ids': [user.id]}, bulk.USER_FILTERS))
     flash('User has been deleted.')
     return redirect(url_for('routes.admin_panel'))
 
@@ -162,8 +604,97 @@ def delete_user(id):
 @login_required
 @admin_required  # Only admin can delete comments
 def delete_comment(id):
-    comment = Comment.query.get_or_404(id)
-    db.session.delete(comment)
-    db.session.commit()
+    Comment.query.get_or_404(id)
+    bulk.delete_comments(bulk.selection_clauses(Comment, {'ids': [id]}, bulk.COMMENT_FILTERS))
     flash('Comment has been deleted.')
     return redirect(url_for('routes.admin_panel'))
+
+@bp.route('/admin/import', methods=['POST'])
+@login_required
+@admin_required
+def import_data():
+    kind = request.form.get('kind', 'tickets')
+    upload = request.files.get('file')
+    if kind not in bulk.KINDS or upload is None:
+        abort(400)
+    fmt = request.form.get('format') or bulk.format_for_filename(upload.filename)
+    if fmt not in bulk.FORMATS:
+        abort(400)
+    batch_size = request.form.get('batch_size', current_app.config['BULK_BATCH_SIZE'], type=int)
+
+    # Werkzeug spools large uploads to disk; wrapping the file keeps reads line by line
+    stream = io.TextIOWrapper(upload.stream, encoding='utf-8', newline='')
+    report = bulk.import_stream(kind, stream, fmt, batch_size=max(batch_size, 1))
+    return jsonify(report.to_dict())
+
+@bp.route('/admin/export')
+@login_required
+@admin_required
+def export_data():
+    kind = request.args.get('kind', 'tickets')
+    fmt = request.args.get('format', 'csv')
+    if kind not in bulk.KINDS or fmt not in bulk.FORMATS:
+        abort(400)
+    chunks = bulk.export_chunks(kind, fmt, batch_size=current_app.config['BULK_BATCH_SIZE'])
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return current_app.response_class(
+        stream_with_context(chunks), mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={kind}.{fmt}'},
+    )
+
+def _bulk_payload():
+    # JSON only: browsers cannot send it cross-site without a CORS preflight
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        abort(400)
+    return payload, bool(payload.get('dry_run'))
+
+def _bulk_response(operation):
+    try:
+        return jsonify(operation())
+    except bulk.BulkRequestError as exc:
+        return jsonify(error=str(exc)), 400
+
+@bp.route('/admin/bulk/tickets/status', methods=['POST'])
+@login_required
+@admin_required
+def bulk_ticket_status():
+    payload, dry_run = _bulk_payload()
+    status = payload.get('status')
+
+    def operation():
+        if status not in dict(STATUS_CHOICES):
+            raise bulk.BulkRequestError('status: Not a valid choice.')
+        clauses = bulk.selection_clauses(Ticket, payload, bulk.TICKET_FILTERS)
+        return bulk.update_ticket_status(clauses, status, dry_run=dry_run)
+    return _bulk_response(operation)
+
+@bp.route('/admin/bulk/tickets/delete', methods=['POST'])
+@login_required
+@admin_required
+def bulk_delete_tickets():
+    payload, dry_run = _bulk_payload()
+    return _bulk_response(lambda: bulk.delete_tickets(
+        bulk.selection_clauses(Ticket, payload, bulk.TICKET_FILTERS), dry_run=dry_run))
+
+@bp.route('/admin/bulk/comments/delete', methods=['POST'])
+@login_required
+@admin_required
+def bulk_delete_comments():
+    payload, dry_run = _bulk_payload()
+    return _bulk_response(lambda: bulk.delete_comments(
+        bulk.selection_clauses(Comment, payload, bulk.COMMENT_FILTERS), dry_run=dry_run))
+
+@bp.route('/admin/bulk/users/delete', methods=['POST'])
+@login_required
+@admin_required
+def bulk_delete_users():
+    payload, dry_run = _bulk_payload()
+
+    def operation():
+        clauses = bulk.selection_clauses(User, payload, bulk.USER_FILTERS)
+        # Never let an admin delete their own account from under the session
+        if any(db.session.query(User.id).filter(clause, User.id == current_user.id).first() for clause in clauses):
+            raise bulk.BulkRequestError('The selection includes your own account')
+        return bulk.delete_users(clauses, dry_run=dry_run)
+    return _bulk_response(operation)
@@ -0,0 +1,403 @@
+# app/search.py
+"""Full-text search over ticket titles, descriptions and comments.
+
+Two interchangeable backends keep an inverted index up to date inside the
+caller's transaction, so index changes commit (or roll back) together with
+the rows they describe:
+
+* ``fts5`` -- an SQLite FTS5 virtual table, ranked with its built-in bm25().
+* ``postings`` -- plain ``search_document``/``search_posting`` tables that work
+  on any database; BM25 is summed and ranked in SQL over the matching postings.
+
+``SEARCH_BACKEND`` picks one explicitly; ``auto`` uses FTS5 whenever the
+database is SQLite and was compiled with it.
+"""
+import math
+import re
+from collections import Counter, namedtuple
+
+from flask import current_app
+from markupsafe import Markup, escape
+from sqlalchemy import and_, column, delete, event, or_, select, table, text
+
+from app import db
+from app.models import Comment, SearchDocument, SearchPosting, Ticket
+
+KIND_TICKET = 'ticket'
+KIND_COMMENT = 'comment'
+
+# BM25 parameters and how much more a title hit counts than a body hit
+BM25_K1 = 1.2
+BM25_B = 0.75
+TITLE_WEIGHT = 5.0
+
+# Prefix terms expand to at most this many indexed terms in the postings backend
+MAX_PREFIX_EXPANSIONS = 50
+
+# Longer tokens (hashes, base64 blobs) are not worth indexing
+MAX_TERM_LENGTH = 64
+
+# Control characters used as highlight markers before the snippet is escaped
+_HL_START, _HL_END = '\x02', '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+SearchHit = namedtuple('SearchHit', 'kind ref_id ticket_id score title body')
+
+
+def tokenize(value):
+    return [t for t in _TOKEN_RE.findall((value or '').lower()) if len(t) <= MAX_TERM_LENGTH]
+
+
+def _highlight(fragment):
+    # Escape the indexed text, then turn the marker characters into <mark> tags
+    escaped = str(escape(fragment))
+    return Markup(escaped.replace(_HL_START, '<mark>').replace(_HL_END, '</mark>'))
+
+
+def _owner_filter(user):
+    # None means "every ticket"; otherwise only tickets created by this user id
+    if user is None or user.is_admin():
+        return None
+    return user.id
+
+
+# --- FTS5 backend -------------------------------------------------------------
+
+FTS_TABLE = 'search_fts'
+
+FTS_CREATE = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, body, ticket_id UNINDEXED, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+FTS_DROP = f'DROP TABLE IF EXISTS {FTS_TABLE}'
+
+
+def _fts_rowid(kind, ref_id):
+    # Tickets and comments share the table; the low bit keeps their rowids apart
+    return ref_id * 2 + (1 if kind == KIND_COMMENT else 0)
+
+
+def _fts_match(terms):
+    # Every term is quoted (so FTS5 operators in user input are inert) and
+    # treated as a prefix; terms are implicitly ANDed
+    return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+class FTS5Backend:
+    def upsert(self, kind, ref_id, ticket_id, title, body):
+        rowid = _fts_rowid(kind, ref_id)
+        db.session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :rowid'), {'rowid': rowid})
+        db.session.execute(
+            text(f'INSERT INTO {FTS_TABLE} (rowid, title, body, ticket_id) VALUES (:rowid, :title, :body, :ticket_id)'),
+            {'rowid': rowid, 'title': title or '', 'body': body or '', 'ticket_id': ticket_id},
+        )
+
+    def remove(self, kind, ref_id):
+        db.session.execute(text(f'DELETE FROM {FTS_TABLE} WHERE rowid = :rowid'),
+                           {'rowid': _fts_rowid(kind, ref_id)})
+
+    def remove_ticket(self, ticket_id):
+        comment_ids = db.session.query(Comment.id).filter(Comment.ticket_id == ticket_id)
+        for (comment_id,) in comment_ids:
+            self.remove(KIND_COMMENT, comment_id)
+        self.remove(KIND_TICKET, ticket_id)
+
+    def remove_matching(self, ticket_ids, comment_ids):
+        # Both arguments are SELECTs of ids, so this is two set-based DELETEs
+        fts = table(FTS_TABLE, column('rowid'))
+        if ticket_ids is not None:
+            db.session.execute(delete(fts).where(fts.c.rowid.in_(
+                select(ticket_ids.subquery().c[0] * 2))))
+        if comment_ids is not None:
+            db.session.execute(delete(fts).where(fts.c.rowid.in_(
+                select(comment_ids.subquery().c[0] * 2 + 1))))
+
+    def clear(self):
+        db.session.execute(text(f'DELETE FROM {FTS_TABLE}'))
+
+    def search(self, terms, owner_id, limit, offset):
+        params = {'match': _fts_match(terms), 'limit': limit, 'offset': offset,
+                  'hs': _HL_START, 'he': _HL_END, 'owner_id': owner_id}
+        where = f'{FTS_TABLE} MATCH :match'
+        if owner_id is not None:
+            where += ' AND ticket_id IN (SELECT id FROM ticket WHERE user_id = :owner_id)'
+        rows = db.session.execute(text(
+            f"SELECT rowid, ticket_id, bm25({FTS_TABLE}, {TITLE_WEIGHT}, 1.0) AS score, "
+            f"snippet({FTS_TABLE}, 0, :hs, :he, '…', 12) AS title, "
+            f"snippet({FTS_TABLE}, 1, :hs, :he, '…', 24) AS body "
+            f"FROM {FTS_TABLE} WHERE {where} ORDER BY score LIMIT :limit OFFSET :offset"
+        ), params)
+        hits = []
+        for row in rows:
+            kind = KIND_COMMENT if row.rowid % 2 else KIND_TICKET
+            # FTS5 bm25() is negative (lower is better); flip it so higher is better everywhere
+            hits.append(SearchHit(kind, row.rowid // 2, row.ticket_id, -row.score,
+                                  _highlight(row.title), _highlight(row.body)))
+        return hits
+
+
+# --- Posting-list backend -------------------------------------------------------
+
+class PostingsBackend:
+    def upsert(self, kind, ref_id, ticket_id, title, body):
+        title_terms = Counter(tokenize(title))
+        body_terms = Counter(tokenize(body))
+
+        document = SearchDocument.query.filter_by(kind=kind, ref_id=ref_id).first()
+        if document is None:
+            document = SearchDocument(kind=kind, ref_id=ref_id)
+            db.session.add(document)
+        else:
+            SearchPosting.query.filter_by(document_id=document.id).delete(synchronize_session=False)
+        document.ticket_id = ticket_id
+        document.length = sum(title_terms.values()) + sum(body_terms.values())
+        db.session.flush()
+
+        terms = set(title_terms) | set(body_terms)
+        if terms:
+            db.session.execute(SearchPosting.__table__.insert(), [
+                {'term': term, 'document_id': document.id,
+                 'title_tf': title_terms.get(term, 0), 'body_tf': body_terms.get(term, 0)}
+                for term in terms
+            ])
+
+    def _remove_documents(self, documents):
+        document_ids = [d.id for d in documents.with_entities(SearchDocument.id)]
+        if document_ids:
+            SearchPosting.query.filter(SearchPosting.document_id.in_(document_ids)).delete(synchronize_session=False)
+            SearchDocument.query.filter(SearchDocument.id.in_(document_ids)).delete(synchronize_session=False)
+
+    def remove(self, kind, ref_id):
+        self._remove_documents(SearchDocument.query.filter_by(kind=kind, ref_id=ref_id))
+
+    def remove_ticket(self, ticket_id):
+        self._remove_documents(SearchDocument.query.filter_by(ticket_id=ticket_id))
+
+    def remove_matching(self, ticket_ids, comment_ids):
+        clauses = []
+        if ticket_ids is not None:
+            clauses.append(and_(SearchDocument.kind == KIND_TICKET, SearchDocument.ref_id.in_(ticket_ids)))
+        if comment_ids is not None:
+            clauses.append(and_(SearchDocument.kind == KIND_COMMENT, SearchDocument.ref_id.in_(comment_ids)))
+        if not clauses:
+            return
+        document_ids = select(SearchDocument.id).where(or_(*clauses))
+        db.session.execute(delete(SearchPosting).where(SearchPosting.document_id.in_(document_ids)))
+        db.session.execute(delete(SearchDocument).where(or_(*clauses)))
+
+    def clear(self):
+        SearchPosting.query.delete(synchronize_session=False)
+        SearchDocument.query.delete(synchronize_session=False)
+
+    def _expand(self, term):
+        # Range scan on the term index instead of LIKE so every backend can use it
+        upper = term[:-1] + chr(ord(term[-1]) + 1)
+        rows = (db.session.query(SearchPosting.term)
+                .filter(SearchPosting.term >= term, SearchPosting.term < upper)
+                .distinct().limit(MAX_PREFIX_EXPANSIONS))
+        return [row.term for row in rows]
+
+    def search(self, terms, owner_id, limit, offset):
+        expansions = {term: self._expand(term) for term in terms}
+        if not all(expansions.values()):
+            return []
+
+        doc_count, total_length = db.session.query(
+            db.func.count(SearchDocument.id), db.func.coalesce(db.func.sum(SearchDocument.length), 0)
+        ).one()
+        avg_length = (total_length / doc_count) if doc_count else 1.0
+
+        # Document frequencies over the whole index, like doc_count: a term's weight must not
+        # depend on which tickets the searcher may see
+        indexed_terms = {term for expanded in expansions.values() for term in expanded}
+        document_frequency = (db.session.query(SearchPosting.term, db.func.count())
+                              .filter(SearchPosting.term.in_(indexed_terms))
+                              .group_by(SearchPosting.term))
+        idf = {term: math.log(1 + (doc_count - df + 0.5) / (df + 0.5)) for term, df in document_frequency}
+
+        # Each posting's BM25 share is computed, summed per document, filtered and sorted in SQL,
+        # so only the requested page leaves the database however common the terms are
+        tf = SearchPosting.title_tf * TITLE_WEIGHT + SearchPosting.body_tf
+        norm = BM25_K1 * (1 - BM25_B) + BM25_K1 * BM25_B / avg_length * db.func.coalesce(SearchDocument.length, 0)
+        share = db.case(idf, value=SearchPosting.term) * tf * (BM25_K1 + 1) / (tf + norm)
+        matches = []
+        for index, expanded in enumerate(expansions.values()):
+            query = (select(SearchPosting.document_id, db.literal(index).label('query_term'), share.label('score'))
+                     .join(SearchDocument, SearchDocument.id == SearchPosting.document_id)
+                     .where(SearchPosting.term.in_(expanded)))
+            if owner_id is not None:
+                query = query.where(SearchDocument.ticket_id.in_(select(Ticket.id).where(Ticket.user_id == owner_id)))
+            matches.append(query)
+        matches = (matches[0] if len(matches) == 1 else db.union_all(*matches)).subquery()
+        score = db.func.sum(matches.c.score).label('score')
+        # Every query term has to match (AND semantics, same as FTS5)
+        scores = dict(db.session.execute(
+            select(matches.c.document_id, score)
+            .group_by(matches.c.document_id)
+            .having(db.func.count(db.distinct(matches.c.query_term)) == len(expansions))
+            .order_by(score.desc(), matches.c.document_id)
+            .limit(limit).offset(offset)).all())
+        ranked = list(scores)
+        if not ranked:
+            return []
+
+        documents = {d.id: d for d in SearchDocument.query.filter(SearchDocument.id.in_(ranked))}
+        texts = _load_texts([documents[doc_id] for doc_id in ranked])
+        hits = []
+        for doc_id in ranked:
+            document = documents[doc_id]
+            title, body = texts.get((document.kind, document.ref_id), ('', ''))
+            hits.append(SearchHit(document.kind, document.ref_id, document.ticket_id, scores[doc_id],
+                                  _highlight(_snippet(title, terms, 12)), _highlight(_snippet(body, terms, 24))))
+        return hits
+
+
+def _load_texts(documents):
+    ticket_ids = [d.ref_id for d in documents if d.kind == KIND_TICKET]
+    comment_ids = [d.ref_id for d in documents if d.kind == KIND_COMMENT]
+    texts = {}
+    if ticket_ids:
+        for row in db.session.query(Ticket.id, Ticket.title, Ticket.description).filter(Ticket.id.in_(ticket_ids)):
+            texts[(KIND_TICKET, row.id)] = (row.title, row.description)
+    if comment_ids:
+        for row in db.session.query(Comment.id, Comment.content).filter(Comment.id.in_(comment_ids)):
+            texts[(KIND_COMMENT, row.id)] = ('', row.content)
+    return texts
+
+
+def _snippet(value, terms, window):
+    # Show ``window`` tokens around the first matching token, marking every hit
+    if not value:
+        return ''
+    spans = [(m.start(), m.end()) for m in _TOKEN_RE.finditer(value)]
+    hits = [i for i, (s, e) in enumerate(spans) if any(value[s:e].lower().startswith(t) for t in terms)]
+    first = hits[0] if hits else 0
+    start = max(0, first - window // 4)
+    end = min(len(spans), start + window)
+
+    pieces = []
+    # Keep leading punctuation when the window starts at the beginning of the text
+    position = spans[start][0] if spans and start > 0 else 0
+    for i in range(start, end):
+        s, e = spans[i]
+        pieces.append(value[position:s])
+        if i in hits:
+            pieces.append(_HL_START + value[s:e] + _HL_END)
+        else:
+            pieces.append(value[s:e])
+        position = e
+    if end == len(spans):
+        pieces.append(value[position:])
+    snippet = ''.join(pieces)
+    if start > 0:
+        snippet = '…' + snippet
+    if end < len(spans):
+        snippet += '…'
+    return snippet
+
+
+# --- Backend selection and public API -------------------------------------------
+
+_fts5_support = {}
+
+
+def fts5_available(connection):
+    if connection.dialect.name != 'sqlite':
+        return False
+    key = str(connection.engine.url)
+    if key not in _fts5_support:
+        options = {row[0] for row in connection.exec_driver_sql('PRAGMA compile_options')}
+        _fts5_support[key] = 'ENABLE_FTS5' in options
+    return _fts5_support[key]
+
+
+def backend_name():
+    choice = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if choice == 'auto':
+        choice = 'fts5' if fts5_available(db.session.connection()) else 'postings'
+    return choice
+
+
+def get_backend():
+    return FTS5Backend() if backend_name() == 'fts5' else PostingsBackend()
+
+
+def index_ticket(ticket):
+    """Add or refresh a ticket in the index; call before the session commits."""
+    if ticket.id is None:
+        db.session.flush()
+    get_backend().upsert(KIND_TICKET, ticket.id, ticket.id, ticket.title, ticket.description)
+
+
+def index_comment(comment):
+    """Add or refresh a comment in the index; call before the session commits."""
+    if comment.id is None:
+        db.session.flush()
+    get_backend().upsert(KIND_COMMENT, comment.id, comment.ticket_id, '', comment.content)
+
+
+def remove_ticket(ticket_id):
+    # Drops the ticket and every comment on it
+    get_backend().remove_ticket(ticket_id)
+
+
+def remove_comment(comment_id):
+    get_backend().remove(KIND_COMMENT, comment_id)
+
+
+def remove_matching(ticket_ids=None, comment_ids=None):
+    """Drop every ticket and/or comment whose id is returned by the given SELECTs.
+
+    Run it before the rows themselves are deleted, while the SELECTs still match.
+    """
+    get_backend().remove_matching(ticket_ids, comment_ids)
+
+
+def search(query, user=None, limit=20, offset=0):
+    """Rank tickets and comments matching every word in ``query`` (as prefixes).
+
+    Non-admin users only see hits on tickets they created.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return []
+    return get_backend().search(terms, _owner_filter(user), limit, offset)
+
+
+def rebuild(batch_size=1000):
+    """Re-index every ticket and comment, committing every ``batch_size`` rows."""
+    backend = get_backend()
+    backend.clear()
+    db.session.commit()
+
+    count = 0
+    for model, kind in ((Ticket, KIND_TICKET), (Comment, KIND_COMMENT)):
+        last_id = 0
+        while True:
+            rows = model.query.filter(model.id > last_id).order_by(model.id).limit(batch_size).all()
+            if not rows:
+                break
+            for row in rows:
+                if kind == KIND_TICKET:
+                    backend.upsert(kind, row.id, row.id, row.title, row.description)
+                else:
+                    backend.upsert(kind, row.id, row.ticket_id, '', row.content)
+            db.session.commit()
+            count += len(rows)
+            last_id = rows[-1].id
+    return count
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_fts_table(target, connection, **kw):
+    # The FTS5 table is not part of the ORM metadata, so db.create_all() needs a nudge
+    if fts5_available(connection):
+        connection.exec_driver_sql(FTS_CREATE)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_fts_table(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql(FTS_DROP)
@@ -0,0 +1,57 @@
+# app/startup.py
+"""Boot time: the Jinja bytecode cache, template precompilation and the startup report.
+
+With JINJA_BYTECODE_CACHE on, compiled templates are kept as files in
+JINJA_BYTECODE_CACHE_DIR (default instance/jinja_cache) and keyed by a
+checksum of their source. A new process, whether a gunicorn worker or a test's
+app, loads them from there instead of compiling again. ``flask templates
+compile`` fills the cache at deploy time. Under gunicorn with preload_app,
+gunicorn.conf.py also compiles every template in the master, so forked
+workers start with all of them in memory.
+
+With STARTUP_REPORT on, ``create_app`` logs one JSON line to ``app.startup``
+with how long importing the package and building the app took. gunicorn.conf.py
+logs each worker's boot time next to it.
+"""
+import json
+import logging
+import os
+import time
+
+from jinja2 import FileSystemBytecodeCache
+
+logger = logging.getLogger('app.startup')
+
+
+def configure_templates(app):
+    """Point the Jinja environment at the bytecode cache; call before anything renders."""
+    if not app.config['JINJA_BYTECODE_CACHE']:
+        return
+    directory = app.config['JINJA_BYTECODE_CACHE_DIR'] or os.path.join(app.instance_path, 'jinja_cache')
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(directory))
+
+
+def compile_templates(app):
+    """Load every template, filling the bytecode cache and the environment's own; returns how many."""
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+
+def report(app, import_seconds, create_seconds):
+    timings = {
+        'import_ms': round(import_seconds * 1000, 1),
+        'create_app_ms': round(create_seconds * 1000, 1),
+    }
+    app.extensions['startup'] = timings
+    if not app.config['STARTUP_REPORT']:
+        return
+    if not logger.handlers:
+        # One JSON object per line on stderr, like the profiling log
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    logger.info(json.dumps(dict(event='startup', pid=os.getpid(), at=round(time.time(), 3), **timings)))
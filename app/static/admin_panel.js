@@ -0,0 +1,30 @@
+// admin_panel.js
+// Loads each admin section the first time it is opened, then appends
+// further pages when its "Load more" button is clicked.
+(function () {
+  function loadInto(container, url) {
+    return fetch(url, { credentials: 'same-origin' })
+      .then(function (response) { return response.text(); })
+      .then(function (html) { container.insertAdjacentHTML('beforeend', html); });
+  }
+
+  document.querySelectorAll('.admin-section').forEach(function (section) {
+    var body = section.querySelector('.admin-section-body');
+
+    section.addEventListener('toggle', function () {
+      if (section.open && !section.dataset.loaded) {
+        section.dataset.loaded = 'true';
+        loadInto(body, section.dataset.fragmentUrl);
+      }
+    });
+
+    body.addEventListener('click', function (event) {
+      var button = event.target.closest('.load-more');
+      if (!button) {
+        return;
+      }
+      button.disabled = true;
+      loadInto(body, button.dataset.url).then(function () { button.remove(); });
+    });
+  });
+})();
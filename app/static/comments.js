@@ -0,0 +1,23 @@
+// comments.js
+// Replaces the ticket page's "Load older comments" button with the page of
+// comments before it, which brings its own button when there are more.
+(function () {
+  var comments = document.getElementById('comments');
+  if (!comments) {
+    return;
+  }
+  comments.addEventListener('click', function (event) {
+    var button = event.target.closest('.load-older');
+    if (!button) {
+      return;
+    }
+    button.disabled = true;
+    fetch(button.dataset.url, { credentials: 'same-origin' })
+      .then(function (response) { return response.text(); })
+      .then(function (html) {
+        var item = button.closest('li');
+        item.insertAdjacentHTML('afterend', html);
+        item.remove();
+      });
+  });
+})();
@@ -0,0 +1,67 @@
+// realtime.js
+// Applies Server-Sent Events to the ticket page and the ticket list in place,
+// so neither needs reloading to show new comments or status changes.
+(function () {
+  function setFields(container, data) {
+    // Enum fields come as a key plus a display label
+    container.querySelectorAll('[data-field]').forEach(function (element) {
+      var field = element.dataset.field;
+      var value = data[field + '_label'] !== undefined ? data[field + '_label'] : data[field];
+      if (value !== undefined) {
+        element.textContent = value;
+      }
+    });
+  }
+
+  function listen(element, handlers) {
+    if (!element || !window.EventSource) {
+      return;
+    }
+    // EventSource reconnects by itself and sends Last-Event-ID so nothing is missed
+    var source = new EventSource(element.dataset.eventSource);
+    Object.keys(handlers).forEach(function (name) {
+      source.addEventListener(name, function (event) { handlers[name](JSON.parse(event.data)); });
+    });
+  }
+
+  var ticket = document.getElementById('live-ticket');
+  var comments = document.getElementById('comments');
+  listen(ticket, {
+    ticket: function (data) { setFields(ticket, data); },
+    comment: function (data) {
+      if (comments.querySelector('[data-comment-id="' + data.id + '"]')) {
+        return;
+      }
+      var item = document.createElement('li');
+      item.dataset.commentId = data.id;
+      item.textContent = data.content + ' - ' + (data.author || 'unknown') + ', ' + data.timestamp;
+      comments.appendChild(item);
+    }
+  });
+
+  var queue = document.getElementById('live-queue');
+  listen(queue, {
+    ticket: function (data) {
+      var card = queue.querySelector('[data-ticket-id="' + data.id + '"]');
+      if (card) {
+        setFields(card, data);
+        return;
+      }
+      if (!data.created || queue.dataset.insertNew !== 'true') {
+        return;
+      }
+      card = document.createElement('div');
+      card.className = 'col-md-4 mb-4';
+      card.dataset.ticketId = data.id;
+      card.innerHTML =
+        '<div class="card"><div class="card-header"><h5 class="card-title" data-field="title"></h5></div>' +
+        '<div class="card-body">' +
+        '<p><strong>Status:</strong> <span data-field="status"></span></p>' +
+        '<p><strong>Priority:</strong> <span data-field="priority"></span></p>' +
+        '<a class="btn btn-primary">View Ticket</a></div></div>';
+      card.querySelector('a').href = queue.dataset.ticketUrl.replace(/0$/, data.id);
+      setFields(card, data);
+      queue.insertBefore(card, queue.firstChild);
+    }
+  });
+})();
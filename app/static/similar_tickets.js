@@ -0,0 +1,42 @@
+// similar_tickets.js
+// Asks for possible duplicates while a ticket is being written, once typing
+// pauses, and shows them above the submit button.
+(function () {
+  var target = document.getElementById('similar-tickets');
+  var form = target && target.closest('form');
+  if (!form) {
+    return;
+  }
+  var title = form.querySelector('[name="title"]');
+  var description = form.querySelector('[name="description"]');
+  var timer = null;
+  var last = null;
+
+  function lookup() {
+    var query = title.value + '\n' + description.value;
+    if (query === last || query.trim().length < 10) {
+      return;
+    }
+    last = query;
+    // Posted with the form's CSRF token: a long description would not fit in a URL
+    var body = new URLSearchParams({
+      csrf_token: form.querySelector('[name="csrf_token"]').value,
+      title: title.value,
+      description: description.value
+    });
+    fetch(target.dataset.url, { method: 'POST', body: body, credentials: 'same-origin' })
+      .then(function (response) { return response.text(); })
+      .then(function (html) {
+        if (last === query) {  // a newer lookup may have started meanwhile
+          target.innerHTML = html;
+        }
+      });
+  }
+
+  [title, description].forEach(function (field) {
+    field.addEventListener('input', function () {
+      clearTimeout(timer);
+      timer = setTimeout(lookup, 400);
+    });
+  });
+})();
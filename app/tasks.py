@@ -0,0 +1,156 @@
+# app/tasks.py
+"""Built-in background tasks and the hooks that queue them."""
+import logging
+import smtplib
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import archival, audit, db, duplicates, rollups, search
+from app.enums import TicketStatus
+from app.jobs import PRIORITY_LOW, enqueue, task
+from app.models import Comment, Ticket
+
+logger = logging.getLogger('app.notifications')
+
+
+# --- Search indexing --------------------------------------------------------------------
+
+def _index_ticket(ticket):
+    search.index_ticket(ticket)
+    if ticket.merged_into_id is None:
+        duplicates.index_ticket(ticket)
+
+
+@task('search.index_ticket')
+def index_ticket(ticket_id):
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is not None:  # deleted since; the delete already cleaned the index
+        _index_ticket(ticket)
+
+
+@task('search.index_comment')
+def index_comment(comment_id):
+    comment = db.session.get(Comment, comment_id)
+    if comment is not None:
+        search.index_comment(comment)
+
+
+@task('search.index_tickets')
+def index_tickets(ticket_ids):
+    for ticket in Ticket.query.filter(Ticket.id.in_(ticket_ids)):
+        _index_ticket(ticket)
+
+
+@task('search.index_comments')
+def index_comments(comment_ids):
+    for comment in Comment.query.filter(Comment.id.in_(comment_ids)):
+        search.index_comment(comment)
+
+
+def index_ticket_later(ticket):
+    """Queue a (re)index of ``ticket``; repeated edits before it runs collapse into one job."""
+    if ticket.id is None:
+        db.session.flush()
+    enqueue('search.index_ticket', {'ticket_id': ticket.id}, key=f'search.index_ticket:{ticket.id}')
+
+
+def index_comment_later(comment):
+    if comment.id is None:
+        db.session.flush()
+    enqueue('search.index_comment', {'comment_id': comment.id}, key=f'search.index_comment:{comment.id}')
+
+
+def index_imported_later(table, ids):
+    """Queue one job indexing a batch of rows bulk-inserted into ``table``."""
+    if table is Ticket.__table__:
+        enqueue('search.index_tickets', {'ticket_ids': ids}, priority=PRIORITY_LOW)
+    else:
+        enqueue('search.index_comments', {'comment_ids': ids}, priority=PRIORITY_LOW)
+
+
+# --- Rollups ----------------------------------------------------------------------------
+
+@task('rollups.backfill')
+def backfill_rollups(chunk_size=1000):
+    rollups.backfill(chunk_size=chunk_size)
+
+
+# --- Cold storage -----------------------------------------------------------------------
+
+@task('tickets.archive')
+def archive_tickets(batch_size=None):
+    archival.archive(batch_size=batch_size)
+
+
+# --- Ticket history ---------------------------------------------------------------------
+
+@task('audit.archive')
+def archive_events(days=None):
+    before = datetime.utcnow() - timedelta(days=days) if days is not None else None
+    audit.archive(before=before)
+
+
+# --- Notifications ----------------------------------------------------------------------
+
+def send_email(to, subject, body):
+    """Send through MAIL_SERVER, or just log the message when none is configured."""
+    config = current_app.config
+    if not config.get('MAIL_SERVER'):
+        logger.info('email to %s: %s', to, subject)
+        return
+    message = EmailMessage()
+    message['From'] = config['MAIL_DEFAULT_SENDER']
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+    with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=30) as smtp:
+        if config['MAIL_USE_TLS']:
+            smtp.starttls()
+        if config.get('MAIL_USERNAME'):
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        smtp.send_message(message)
+
+
+@task('notify.status_changed')
+def notify_status_changed(ticket_id, old_status, new_status):
+    ticket = db.session.get(Ticket, ticket_id)
+    if ticket is None or ticket.creator is None or not ticket.creator.email:
+        return
+    old_status, new_status = TicketStatus.parse(old_status), TicketStatus.parse(new_status)
+    send_email(
+        ticket.creator.email,
+        f'[Ticket #{ticket.id}] {ticket.title}: {new_status}',
+        f'Hello {ticket.creator.username},\n\n'
+        f'The status of your ticket "{ticket.title}" changed from {old_status} to {new_status}.\n',
+    )
+
+
+def queue_bulk_status_notifications(clause, status):
+    """Queue the creator emails for ``UPDATE ticket SET status=:status WHERE clause``; call it before the UPDATE."""
+    if not current_app.config.get('NOTIFY_ON_STATUS_CHANGE'):
+        return
+    status = TicketStatus.parse(status)
+    changed = db.session.execute(db.select(Ticket.id, Ticket.status).where(clause, Ticket.status != status)).all()
+    for ticket_id, old_status in changed:
+        enqueue('notify.status_changed',
+                {'ticket_id': ticket_id, 'old_status': old_status.key, 'new_status': status.key},
+                priority=PRIORITY_LOW)
+
+
+@event.listens_for(Session, 'before_flush')
+def _queue_status_notifications(session, flush_context, instances):
+    # Every ORM status change (ticket form, admin panel) queues an email to the creator
+    if not has_app_context() or not current_app.config.get('NOTIFY_ON_STATUS_CHANGE'):
+        return
+    for obj in session.dirty:
+        if not isinstance(obj, Ticket):
+            continue
+        history = db.inspect(obj).attrs.status.history
+        if history.deleted and history.added and history.deleted[0] != history.added[0]:
+            enqueue('notify.status_changed',
+                    {'ticket_id': obj.id, 'old_status': history.deleted[0].key, 'new_status': history.added[0].key},
+                    priority=PRIORITY_LOW)
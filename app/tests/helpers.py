@@ -0,0 +1,56 @@
+# app/tests/helpers.py
+"""Set-up shared by the suites that work through users, tickets and a logged-in client."""
+import unittest
+
+from app import create_app, db
+from app.models import Ticket, User
+from config import Config
+
+PASSWORD = 'password'
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_STRICT = True
+
+
+class AppTestCase(unittest.TestCase):
+    """A fresh app and in-memory database per test; subclasses set ``config`` to change settings."""
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_user(self, username, role=None):
+        user = User(username=username, email=f'{username}@example.com', role=role)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.commit()
+        return user
+
+    def new_ticket(self, user=None, **fields):
+        """An unsaved ticket created by ``user`` (default ``self.user``); ``fields`` override the defaults."""
+        values = dict(title='Printer offline', description='The office printer is offline',
+                      status='open', priority='medium', user_id=(user or self.user).id)
+        values.update(fields)
+        return Ticket(**values)
+
+    def make_ticket(self, user=None, **fields):
+        ticket = self.new_ticket(user, **fields)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket
+
+    def login(self, username, password=PASSWORD):
+        return self.client.post('/login', data={'username': username, 'password': password})
@@ -0,0 +1,132 @@
+import unittest
+
+from flask import g
+
+from app import db
+from app import auth
+from app.models import Ticket, Comment, ApiToken
+from app.tests.helpers import AppTestCase
+
+
+class ApiTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('adminuser', role='admin')
+        self.user = self.make_user('customer')
+        self.other = self.make_user('someoneelse')
+        self.admin_token = auth.create_token(self.admin, 'tests')
+        self.user_token = auth.create_token(self.user, 'tests')
+        db.session.commit()
+
+    def headers(self, token):
+        # Requests share the test's app context, and so Flask-Login's user in g; make each one load its own
+        g.pop('_login_user', None)
+        return {'Authorization': f'Bearer {token or self.admin_token}'}
+
+    def get(self, url, token=None):
+        return self.client.get(url, headers=self.headers(token))
+
+    def send(self, method, url, payload, token=None):
+        return self.client.open(url, method=method, json=payload, headers=self.headers(token))
+
+    def test_requires_a_valid_token(self):
+        rv = self.client.get('/api/v1/tickets')
+        self.assertEqual(rv.status_code, 401)
+        self.assertEqual(rv.headers['WWW-Authenticate'], 'Bearer')
+        self.assertEqual(rv.get_json(), {'error': 'Authentication required'})
+        self.assertEqual(self.get('/api/v1/tickets', token='not-a-token').status_code, 401)
+        self.assertEqual(self.get('/api/v1/users/me').get_json()['data']['username'], 'adminuser')
+
+        # Tokens only work on the API
+        self.assertEqual(self.get('/create_ticket').status_code, 302)
+
+        token = ApiToken.query.filter_by(user_id=self.user.id).one()
+        auth.revoke_token(token)
+        db.session.commit()
+        self.assertEqual(self.get('/api/v1/users/me', token=self.user_token).status_code, 401)
+
+    def test_sparse_fields_and_pagination(self):
+        ids = [self.make_ticket(self.user, title=f'Printer offline {i}').id for i in range(5)]
+        rv = self.get('/api/v1/tickets?fields=id,status&limit=2')
+        self.assertEqual(rv.status_code, 200)
+        page = rv.get_json()
+        self.assertEqual(page['data'], [{'id': ids[4], 'status': 'open'}, {'id': ids[3], 'status': 'open'}])
+
+        seen = [row['id'] for row in page['data']]
+        while page['next_cursor']:
+            page = self.get(f"/api/v1/tickets?fields=id&limit=2&after={page['next_cursor']}").get_json()
+            seen += [row['id'] for row in page['data']]
+        self.assertEqual(seen, ids[::-1])
+
+        full = self.get(f'/api/v1/tickets/{ids[0]}').get_json()['data']
+        self.assertEqual((full['title'], full['priority'], full['user_id']), ('Printer offline 0', 'medium', self.user.id))
+        self.assertEqual(self.get('/api/v1/tickets?fields=id,password').status_code, 400)
+        self.assertEqual(self.get('/api/v1/tickets?status=bogus').status_code, 400)
+
+    def test_batch_create_is_all_or_nothing(self):
+        good = {'title': 'Scanner jammed', 'description': 'The scanner on floor 2 jams', 'status': 'open',
+                'priority': 'high'}
+        rv = self.send('POST', '/api/v1/tickets', [good, dict(good, title='Bad')])
+        self.assertEqual(rv.status_code, 400)
+        self.assertEqual(rv.get_json()['details'][0]['index'], 1)
+        self.assertEqual(Ticket.query.count(), 0)
+
+        rv = self.send('POST', '/api/v1/tickets?fields=id,title,priority',
+                       [good, dict(good, title='Scanner still jammed')])
+        self.assertEqual(rv.status_code, 201)
+        self.assertEqual([(t['title'], t['priority']) for t in rv.get_json()['data']],
+                         [('Scanner jammed', 'high'), ('Scanner still jammed', 'high')])
+        self.assertEqual(Ticket.query.filter_by(user_id=self.admin.id).count(), 2)
+
+        rv = self.send('POST', '/api/v1/tickets', good)
+        self.assertEqual(rv.get_json()['data']['title'], 'Scanner jammed')
+
+    def test_batch_get_reports_missing_ids(self):
+        first = self.make_ticket(self.user).id
+        second = self.make_ticket(self.other).id
+        rv = self.get(f'/api/v1/tickets/batch?ids={second},999,{first}&fields=id')
+        self.assertEqual(rv.get_json(), {'data': [{'id': second}, {'id': first}], 'missing': [999]})
+
+        # Other people's tickets count as missing for non-admins
+        rv = self.get(f'/api/v1/tickets/batch?ids={first},{second}&fields=id', token=self.user_token)
+        self.assertEqual(rv.get_json(), {'data': [{'id': first}], 'missing': [second]})
+        self.assertEqual(self.get(f'/api/v1/tickets/{second}', token=self.user_token).status_code, 404)
+        self.assertEqual([t['id'] for t in self.get('/api/v1/tickets', token=self.user_token).get_json()['data']],
+                         [first])
+
+    def test_update_ticket(self):
+        ticket_id = self.make_ticket(self.user).id
+        rv = self.send('PATCH', f'/api/v1/tickets/{ticket_id}', {'status': 'in_progress'}, token=self.user_token)
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual((rv.get_json()['data']['status'], rv.get_json()['data']['title']),
+                         ('in_progress', 'Printer offline'))
+        rv = self.send('PATCH', f'/api/v1/tickets/{ticket_id}', {'priority': 'urgent-ish'}, token=self.user_token)
+        self.assertEqual(rv.status_code, 400)
+
+    def test_comments(self):
+        ticket_id = self.make_ticket(self.user).id
+        rv = self.send('POST', f'/api/v1/tickets/{ticket_id}/comments',
+                       [{'content': 'Any news?'}, {'content': 'Still broken'}], token=self.user_token)
+        self.assertEqual(rv.status_code, 201)
+        self.assertEqual(Comment.query.count(), 2)
+
+        page = self.get(f'/api/v1/tickets/{ticket_id}/comments?fields=content&limit=1').get_json()
+        self.assertEqual(page['data'], [{'content': 'Any news?'}])
+        page = self.get(f"/api/v1/tickets/{ticket_id}/comments?fields=content&after={page['next_cursor']}").get_json()
+        self.assertEqual((page['data'], page['next_cursor']), ([{'content': 'Still broken'}], None))
+
+        comment_ids = ','.join(str(c.id) for c in Comment.query)
+        self.assertEqual(len(self.get(f'/api/v1/comments/batch?ids={comment_ids}').get_json()['data']), 2)
+        self.assertEqual(self.get(f'/api/v1/tickets/{ticket_id}/comments', token=self.user_token).status_code, 200)
+
+    def test_users_are_admin_only_except_yourself(self):
+        self.assertEqual(self.get(f'/api/v1/users/{self.admin.id}', token=self.user_token).status_code, 403)
+        self.assertEqual(self.get(f'/api/v1/users/{self.user.id}?fields=email', token=self.user_token).get_json(),
+                         {'data': {'email': 'customer@example.com'}})
+        users = self.get('/api/v1/users?fields=username').get_json()
+        self.assertEqual([u['username'] for u in users['data']], ['adminuser', 'customer', 'someoneelse'])
+        self.assertNotIn('password_hash', self.get('/api/v1/users/me').get_json()['data'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import db
+from app import archival, rollups
+from app.models import Ticket, Comment, TicketArchive, CommentArchive, TicketEvent
+from app.tests import helpers
+
+
+class TestConfig(helpers.TestConfig):
+    ARCHIVE_RESOLVED_AFTER_DAYS = 90
+    ARCHIVE_DELETED_AFTER_DAYS = 7
+
+
+class ArchivalTests(helpers.AppTestCase):
+    config = TestConfig
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('adminuser', role='admin')
+        self.user = self.make_user('customer')
+
+    def make_ticket(self, comment='Any news?', **fields):
+        ticket = self.new_ticket(**fields)
+        db.session.add(ticket)
+        db.session.flush()
+        db.session.add(Comment(content=comment, ticket_id=ticket.id, user_id=self.user.id))
+        db.session.commit()
+        return ticket.id
+
+    def all_tickets(self):
+        return db.session.query(Ticket).execution_options(include_deleted=True)
+
+    def test_deletes_are_soft_and_hidden_everywhere(self):
+        kept = self.make_ticket(title='Scanner jammed')
+        gone = self.make_ticket()
+        self.login('adminuser')
+        self.client.get(f'/admin/delete_ticket/{gone}')
+        db.session.expire_all()
+
+        self.assertEqual([t.id for t in Ticket.query], [kept])
+        self.assertEqual(Comment.query.count(), 1)
+        deleted = self.all_tickets().filter(Ticket.id == gone).one()
+        self.assertIsNotNone(deleted.deleted_at)
+        self.assertEqual(len(deleted.comments), 1)  # lazy loads from an include_deleted query see them too
+
+        self.assertEqual(self.client.get(f'/ticket/{gone}').status_code, 404)
+        self.assertNotIn('Printer offline', self.client.get('/').get_data(as_text=True))
+        self.assertEqual(TicketEvent.query.filter_by(ticket_id=gone, action='deleted').count(), 1)
+
+    def test_deleted_comments_disappear_from_the_ticket(self):
+        ticket_id = self.make_ticket(comment='Please ignore this')
+        comment_id = Comment.query.one().id
+        self.login('adminuser')
+        self.client.get(f'/admin/delete_comment/{comment_id}')
+        db.session.expire_all()
+        html = self.client.get(f'/ticket/{ticket_id}').get_data(as_text=True)
+        self.assertNotIn('Please ignore this', html)
+        self.assertIsNotNone(db.session.query(Comment).execution_options(include_deleted=True).one().deleted_at)
+
+    def test_archive_moves_old_resolved_and_deleted_tickets(self):
+        long_ago = datetime.utcnow() - timedelta(days=200)
+        old_closed = self.make_ticket(status='closed', created_date=long_ago, resolved_date=long_ago)
+        recent_closed = self.make_ticket(status='closed', resolved_date=datetime.utcnow())
+        old_open = self.make_ticket(created_date=long_ago)
+        old_deleted = self.make_ticket(status='resolved', resolved_date=datetime.utcnow())
+        self.all_tickets().filter(Ticket.id == old_deleted).update(
+            {'deleted_at': datetime.utcnow() - timedelta(days=10)}, synchronize_session=False)
+        db.session.commit()
+
+        self.assertEqual(archival.archive(dry_run=True), 2)
+        self.assertEqual(archival.archive(batch_size=1), 2)
+        self.assertEqual(sorted(t.id for t in self.all_tickets()), [recent_closed, old_open])
+        self.assertEqual(sorted(t.id for t in TicketArchive.query), [old_closed, old_deleted])
+        self.assertEqual(CommentArchive.query.count(), 2)
+        self.assertEqual(db.session.query(Comment).execution_options(include_deleted=True).count(), 2)
+        self.assertEqual(TicketEvent.query.filter_by(action='archived').count(), 2)
+
+        # The dashboard history still includes the archived ticket, but not the deleted one
+        self.assertEqual(rollups.backfill(), 3)
+
+    def test_archived_tickets_are_read_only_lookups(self):
+        long_ago = datetime.utcnow() - timedelta(days=200)
+        ticket_id = self.make_ticket(comment='Fixed by restarting it', status='closed', resolved_date=long_ago)
+        archival.archive()
+
+        self.login('customer')
+        rv = self.client.get(f'/ticket/{ticket_id}')
+        self.assertEqual(rv.status_code, 302)
+        self.assertTrue(rv.headers['Location'].endswith(f'/archive/ticket/{ticket_id}'))
+        html = self.client.get(f'/archive/ticket/{ticket_id}').get_data(as_text=True)
+        self.assertIn('This ticket is read-only', html)
+        self.assertIn('Fixed by restarting it - customer', html)
+        self.assertEqual(self.client.get('/archive/ticket/999').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from flask import render_template_string
+from app import create_app, assets
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    STATIC_FINGERPRINT = True
+
+
+class AssetTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        # Build from a copy, so the tests neither need nor touch a real build
+        self.static = os.path.join(self.directory, 'static')
+        os.makedirs(os.path.join(self.static, 'img'))
+        with open(os.path.join(self.static, 'styles.css'), 'w') as f:
+            f.write('body { color: teal; }\n' * 50)
+        with open(os.path.join(self.static, 'img', 'logo.png'), 'wb') as f:
+            f.write(b'\x89PNG fake')
+        self.app = create_app(TestConfig)
+        self.app.static_folder = self.static
+        with self.app.app_context():
+            self.manifest = assets.build(self.app)
+        # A fresh app picks the manifest up, as after a deploy
+        self.app = create_app(TestConfig)
+        self.app.static_folder = self.static
+        assets.init_app(self.app)
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_build_fingerprints_and_compresses(self):
+        css = self.manifest['styles.css']
+        self.assertRegex(css, r'^dist/styles\.[0-9a-f]{12}\.css$')
+        self.assertRegex(self.manifest['img/logo.png'], r'^dist/img/logo\.[0-9a-f]{12}\.png$')
+        with gzip.open(os.path.join(self.static, css + '.gz')) as f:
+            self.assertEqual(f.read(), b'body { color: teal; }\n' * 50)
+        # Images are not compressed again
+        self.assertFalse(os.path.exists(os.path.join(self.static, self.manifest['img/logo.png'] + '.gz')))
+
+    def test_url_for_rewritten_and_served_immutable(self):
+        with self.app.test_request_context():
+            url = render_template_string("{{ url_for('static', filename='styles.css') }}")
+            self.assertEqual(url, '/static/' + self.manifest['styles.css'])
+            self.assertEqual(render_template_string("{{ url_for('static', filename='other.js') }}"),
+                             '/static/other.js')
+
+        rv = self.client.get(url, headers={'Accept-Encoding': 'gzip, deflate'})
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(rv.mimetype, 'text/css')
+        self.assertIn('Accept-Encoding', rv.headers['Vary'])
+        self.assertIn('immutable', rv.headers['Cache-Control'])
+        self.assertIn('max-age=31536000', rv.headers['Cache-Control'])
+        self.assertEqual(gzip.decompress(rv.data), b'body { color: teal; }\n' * 50)
+        rv.close()
+
+        rv = self.client.get(url)
+        self.assertNotIn('Content-Encoding', rv.headers)
+        self.assertEqual(rv.data, b'body { color: teal; }\n' * 50)
+        rv.close()
+
+        # The original name still works, with the default headers
+        rv = self.client.get('/static/styles.css')
+        self.assertEqual(rv.status_code, 200)
+        self.assertNotIn('immutable', rv.headers.get('Cache-Control', ''))
+        rv.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+import unittest
+from datetime import datetime, timedelta
+
+from app import db
+from app import assignment, bulk
+from app.models import User, Ticket, Queue, AgentLoad
+from app.tests import helpers
+
+
+class TestConfig(helpers.TestConfig):
+    ASSIGNMENT_DEFAULT_QUEUE = 'support'
+
+
+class AssignmentTests(helpers.AppTestCase):
+    config = TestConfig
+
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('adminuser', role='admin')
+        self.ann = self.make_user('ann')
+        self.bob = self.make_user('bob')
+        self.customer = self.make_user('customer')
+        self.queue = assignment.create_queue('support')
+        db.session.commit()
+        for agent in (self.ann, self.bob):
+            assignment.add_member(self.queue, agent)
+        db.session.commit()
+
+    def make_ticket(self, priority='medium', status='open', assignee=None, **fields):
+        ticket = self.new_ticket(self.customer, priority=priority, status=status, **fields)
+        if assignee is not None:
+            assignment.assign_to(ticket, assignee.id)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket
+
+    def load(self, user):
+        row = db.session.get(AgentLoad, user.id)
+        db.session.refresh(row)
+        return row.open_tickets, row.weighted_load
+
+    def test_counters_follow_assignment_status_priority_and_delete(self):
+        ticket = self.make_ticket(priority='high', assignee=self.ann)
+        self.assertEqual(self.load(self.ann), (1, 4))
+
+        ticket.priority = 'low'
+        db.session.commit()
+        self.assertEqual(self.load(self.ann), (1, 1))
+
+        assignment.assign_to(ticket, self.bob.id)
+        db.session.commit()
+        self.assertEqual((self.load(self.ann), self.load(self.bob)), ((0, 0), (1, 1)))
+
+        ticket.status = 'closed'
+        db.session.commit()
+        self.assertEqual(self.load(self.bob), (0, 0))
+        ticket.status = 'open'
+        db.session.commit()
+        self.assertEqual(self.load(self.bob), (1, 1))
+
+        db.session.delete(ticket)
+        db.session.commit()
+        self.assertEqual(self.load(self.bob), (0, 0))
+
+    def test_least_loaded_weighs_priority(self):
+        self.make_ticket(priority='critical', assignee=self.ann)
+        self.make_ticket(priority='low', assignee=self.bob)
+        self.make_ticket(priority='low', assignee=self.bob)
+        # Bob has more tickets but the lighter load
+        self.assertEqual(assignment.next_agent(self.queue), self.bob.id)
+
+    def test_round_robin_cycles_and_skips_paused_agents(self):
+        self.queue.strategy = 'round_robin'
+        carol = self.make_user('carol')
+        assignment.add_member(self.queue, carol)
+        db.session.commit()
+        picks = [assignment.next_agent(self.queue) for _ in range(4)]
+        self.assertEqual(picks, [self.ann.id, self.bob.id, carol.id, self.ann.id])
+
+        assignment.add_member(self.queue, self.bob).active = False
+        db.session.commit()
+        self.assertEqual(assignment.next_agent(self.queue), carol.id)
+        self.assertEqual(assignment.next_agent(self.queue), self.ann.id)
+
+    def test_new_tickets_are_routed_to_the_default_queue(self):
+        self.login('customer')
+        for priority in ('high', 'low'):
+            response = self.client.post('/create_ticket', data={
+                'title': 'Printer offline', 'description': 'The office printer is offline',
+                'status': 'open', 'priority': priority})
+            self.assertEqual(response.status_code, 302)
+        tickets = Ticket.query.order_by(Ticket.id).all()
+        self.assertEqual([t.queue_id for t in tickets], [self.queue.id] * 2)
+        self.assertEqual([t.assignee_id for t in tickets], [self.ann.id, self.bob.id])
+        self.assertIsNotNone(tickets[0].assigned_at)
+
+    def test_my_queue_lists_open_tickets_by_urgency(self):
+        old = datetime.utcnow() - timedelta(days=1)
+        low = self.make_ticket(priority='low', assignee=self.ann, created_date=old)
+        newer_high = self.make_ticket(priority='high', assignee=self.ann)
+        older_high = self.make_ticket(priority='high', assignee=self.ann, created_date=old)
+        self.make_ticket(priority='critical', status='resolved', assignee=self.ann)
+        self.make_ticket(priority='critical', assignee=self.bob)
+
+        self.login('ann')
+        html = self.client.get('/my_queue').get_data(as_text=True)
+        order = [html.index(f'data-ticket-id="{t.id}"') for t in (older_high, newer_high, low)]
+        self.assertEqual(order, sorted(order))
+        self.assertEqual(html.count('data-ticket-id='), 3)
+        self.assertIn('3 open tickets assigned to you (load 9)', html)
+
+    def test_my_queue_pages_with_a_cursor(self):
+        self.app.config['TICKETS_PER_PAGE'] = 2
+        tickets = [self.make_ticket(priority=p, assignee=self.ann) for p in ('low', 'critical', 'medium')]
+        self.login('ann')
+        first = self.client.get('/my_queue').get_data(as_text=True)
+        self.assertIn(f'data-ticket-id="{tickets[1].id}"', first)
+        self.assertIn(f'data-ticket-id="{tickets[2].id}"', first)
+        cursor = first.split('after=')[1].split('"')[0]
+        second = self.client.get(f'/my_queue?after={cursor}').get_data(as_text=True)
+        self.assertEqual(second.count('data-ticket-id='), 1)
+        self.assertIn(f'data-ticket-id="{tickets[0].id}"', second)
+
+    def test_my_queue_cursor_keeps_oldest_first_within_a_priority(self):
+        self.app.config['TICKETS_PER_PAGE'] = 2
+        now = datetime.utcnow()
+        tickets = [self.make_ticket(priority='high', assignee=self.ann, created_date=now - timedelta(hours=hours))
+                   for hours in (1, 3, 2)]
+        self.login('ann')
+        first = self.client.get('/my_queue').get_data(as_text=True)
+        order = [first.index(f'data-ticket-id="{tickets[i].id}"') for i in (1, 2)]
+        self.assertEqual(order, sorted(order))
+        cursor = first.split('after=')[1].split('"')[0]
+        second = self.client.get(f'/my_queue?after={cursor}').get_data(as_text=True)
+        self.assertEqual(second.count('data-ticket-id='), 1)
+        self.assertIn(f'data-ticket-id="{tickets[0].id}"', second)
+
+    def test_admin_assigns_and_manages_queues(self):
+        ticket = self.make_ticket(assignee=self.ann)
+        self.login('adminuser')
+        self.client.post(f'/ticket/{ticket.id}/assign', data={'queue_id': self.queue.id, 'assignee': str(self.bob.id)})
+        db.session.refresh(ticket)
+        self.assertEqual(ticket.assignee_id, self.bob.id)
+        self.assertEqual((self.load(self.ann), self.load(self.bob)), ((0, 0), (1, 2)))
+
+        self.client.post('/admin/queues', data={'name': 'network', 'strategy': 'round_robin'})
+        network = Queue.query.filter_by(name='network').one()
+        self.client.post(f'/admin/queues/{network.id}/members', data={'username': 'ann', 'active': 'y'})
+        page = self.client.get('/admin/queues').get_data(as_text=True)
+        self.assertIn('network', page)
+        self.assertEqual(page.count('<td>ann</td>'), 2)  # in both queues
+        self.assertEqual(assignment.next_agent(network), self.ann.id)
+
+    def test_bulk_changes_recount_loads(self):
+        self.make_ticket(priority='high', assignee=self.ann)
+        self.make_ticket(priority='low', assignee=self.bob)
+        bulk.update_ticket_status(bulk.selection_clauses(Ticket, {'filter': {'priority': 'high'}}, bulk.TICKET_FILTERS),
+                                  'closed')
+        self.assertEqual(self.load(self.ann), (0, 0))
+
+        bob_id = self.bob.id
+        bulk.delete_users(bulk.selection_clauses(User, {'ids': [bob_id]}, bulk.USER_FILTERS))
+        self.assertIsNone(db.session.get(AgentLoad, bob_id))
+        self.assertEqual(Ticket.query.filter(Ticket.assignee_id.isnot(None)).count(), 1)
+
+    def test_recount_matches_the_maintained_counters(self):
+        for priority in ('low', 'high', 'critical'):
+            self.make_ticket(priority=priority, assignee=self.ann)
+        self.make_ticket(priority='medium', status='Closed', assignee=self.ann)
+        maintained = self.load(self.ann)
+        db.session.query(AgentLoad).update({'open_tickets': 0, 'weighted_load': 0})
+        assignment.recount()
+        db.session.commit()
+        self.assertEqual(self.load(self.ann), maintained)
+        self.assertEqual(maintained, (3, 13))
+
+
+if __name__ == '__main__':
+    unittest.main()
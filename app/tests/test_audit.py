@@ -0,0 +1,137 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from app import db
+from app import audit, bulk
+from app.models import Ticket, Comment, TicketEvent, TicketEventArchive
+from app.tests.helpers import AppTestCase
+
+
+class AuditTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('adminuser', role='admin')
+        self.user = self.make_user('customer')
+
+    def events(self, ticket_id):
+        return [(e.action, json.loads(e.changes)) for e in
+                TicketEvent.query.filter_by(ticket_id=ticket_id).order_by(TicketEvent.id)]
+
+    def test_changes_are_recorded_as_compact_diffs(self):
+        ticket = self.make_ticket()
+        ticket.status = 'in_progress'
+        ticket.title = 'Printer offline on floor 2'
+        db.session.commit()
+        ticket.status = 'In Progress'  # same value: nothing to record
+        db.session.commit()
+        ticket_id = ticket.id
+        db.session.delete(ticket)
+        db.session.commit()
+
+        events = self.events(ticket_id)
+        self.assertEqual([action for action, _ in events], ['created', 'updated', 'deleted'])
+        self.assertEqual(events[0][1], {'title': 'Printer offline', 'status': 'open', 'priority': 'medium',
+                                        'user_id': self.user.id, 'assignee_id': None, 'queue_id': None})
+        self.assertEqual(events[1][1], {'title': ['Printer offline', 'Printer offline on floor 2'],
+                                        'status': ['open', 'in_progress']})
+        self.assertEqual(events[2][1]['status'], 'in_progress')
+        self.assertEqual(TicketEvent.query.filter_by(action='updated').one().changes,
+                         '{"title":["Printer offline","Printer offline on floor 2"],"status":["open","in_progress"]}')
+
+    def test_events_roll_back_with_the_change(self):
+        ticket = self.make_ticket()
+        ticket.priority = 'high'
+        db.session.flush()
+        db.session.rollback()
+        self.assertEqual([action for action, _ in self.events(ticket.id)], ['created'])
+
+    def test_edits_through_the_form_record_the_actor(self):
+        ticket = self.make_ticket()
+        self.login('customer')
+        self.client.post(f'/update_ticket/{ticket.id}', data={
+            'title': ticket.title, 'description': 'The printer on floor 2 is offline',
+            'status': 'open', 'priority': 'high'})
+        event = TicketEvent.query.filter_by(action='updated').one()
+        self.assertEqual(event.user_id, self.user.id)
+        self.assertEqual(set(json.loads(event.changes)), {'description', 'priority'})
+
+    def test_bulk_operations_are_recorded(self):
+        first, second = self.make_ticket(), self.make_ticket(status='closed')
+        comment = Comment(content='Any news?', ticket_id=second.id, user_id=self.admin.id)
+        db.session.add(comment)
+        db.session.commit()
+        first_id, second_id = first.id, second.id
+
+        bulk.update_ticket_status(bulk.selection_clauses(Ticket, {'ids': [first_id, second_id]}, bulk.TICKET_FILTERS),
+                                  'closed')
+        self.assertEqual(self.events(first_id)[-1], ('updated', {'status': ['open', 'closed']}))
+        self.assertEqual(len(self.events(second_id)), 1)  # already closed
+
+        bulk.delete_comments(bulk.selection_clauses(Comment, {'ids': [comment.id]}, bulk.COMMENT_FILTERS))
+        self.assertEqual(self.events(second_id)[-1][0], 'comment_deleted')
+
+        bulk.delete_tickets(bulk.selection_clauses(Ticket, {'ids': [first_id]}, bulk.TICKET_FILTERS))
+        action, changes = self.events(first_id)[-1]
+        self.assertEqual((action, changes['title'], changes['status']), ('deleted', 'Printer offline', 'closed'))
+
+    def test_timeline_merges_events_and_comments_in_order(self):
+        ticket = self.make_ticket()
+        db.session.add(Comment(content='Still broken', ticket_id=ticket.id, user_id=self.user.id,
+                               timestamp=datetime.utcnow() + timedelta(seconds=1)))
+        db.session.commit()
+        ticket.status = 'resolved'
+        TicketEvent.query.update({'created': datetime.utcnow() - timedelta(seconds=5)})
+        db.session.commit()
+
+        entries, next_cursor = audit.timeline(ticket.id)
+        self.assertIsNone(next_cursor)
+        self.assertEqual([(e['type'], e.get('action')) for e in entries],
+                         [('event', 'created'), ('event', 'updated'), ('comment', None)])
+        self.assertEqual(entries[2]['content'], 'Still broken')
+
+        first, cursor = audit.timeline(ticket.id, per_page=2)
+        rest, _ = audit.timeline(ticket.id, cursor=cursor, per_page=2)
+        self.assertEqual(first + rest, entries)
+
+    def test_history_pages_and_json(self):
+        ticket = self.make_ticket()
+        ticket.priority = 'critical'
+        db.session.commit()
+        self.login('customer')
+        html = self.client.get(f'/ticket/{ticket.id}/history').get_data(as_text=True)
+        self.assertIn('priority from <em>medium</em>', html)
+        data = self.client.get(f'/ticket/{ticket.id}/history.json').get_json()
+        self.assertEqual([e['action'] for e in data['entries']], ['created', 'updated'])
+        self.assertEqual(data['entries'][0]['user'], None)
+
+        # Only admins can read the history of a deleted ticket
+        ticket_id = ticket.id
+        self.client.get('/logout')
+        self.login('adminuser')
+        self.client.get(f'/admin/delete_ticket/{ticket_id}')
+        data = self.client.get(f'/ticket/{ticket_id}/history.json').get_json()
+        self.assertEqual((data['entries'][-1]['action'], data['entries'][-1]['user']), ('deleted', 'adminuser'))
+        self.client.get('/logout')
+        db.session.remove()  # the test shares the requests' session; drop the ticket it still holds
+        self.login('customer')
+        self.assertEqual(self.client.get(f'/ticket/{ticket_id}/history.json').status_code, 404)
+
+    def test_archive_moves_old_events(self):
+        ticket = self.make_ticket()
+        ticket.priority = 'low'
+        db.session.commit()
+        TicketEvent.query.filter_by(action='created').update({'created': datetime.utcnow() - timedelta(days=400)})
+        db.session.commit()
+
+        self.assertEqual(audit.archive(batch_size=1), 1)
+        self.assertEqual([e.action for e in TicketEvent.query], ['updated'])
+        self.assertEqual([e.action for e in TicketEventArchive.query], ['created'])
+        entries, _ = audit.timeline(ticket.id)
+        self.assertEqual(len(entries), 1)
+        entries, _ = audit.timeline(ticket.id, include_archived=True)
+        self.assertEqual([e['action'] for e in entries], ['created', 'updated'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import threading
+import unittest
+from app import create_app, db
+from app import auth
+from app.instrumentation import count_queries
+from app.models import User
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    # Cheap hashes keep the suite fast; the rehash test raises the cost
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+
+class AuthTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(username='testuser', email='test@example.com', role='user')
+        self.user.set_password('testpass')
+        db.session.add(self.user)
+        db.session.commit()
+        self.user_id = self.user.id
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def fresh_session(self):
+        db.session.remove()
+
+    def test_loader_cache_skips_database(self):
+        self.fresh_session()
+        self.assertEqual(auth.load_user(self.user_id).username, 'testuser')
+        self.fresh_session()
+        with count_queries(db.engine) as counter:
+            user = auth.load_user(self.user_id)
+            self.assertEqual(user.username, 'testuser')
+            self.assertFalse(user.is_admin())
+        self.assertEqual(counter.count, 0)
+        # The hash is not cached but still loads on demand
+        self.assertTrue(user.check_password('testpass'))
+
+    def test_role_change_invalidates_cache(self):
+        auth.load_user(self.user_id)
+        user = db.session.get(User, self.user_id)
+        user.role = 'admin'
+        db.session.commit()
+        self.fresh_session()
+        self.assertTrue(auth.load_user(self.user_id).is_admin())
+
+    def test_delete_invalidates_cache(self):
+        auth.load_user(self.user_id)
+        db.session.delete(db.session.get(User, self.user_id))
+        db.session.commit()
+        self.fresh_session()
+        self.assertIsNone(auth.load_user(self.user_id))
+
+    def test_admins_are_not_cached(self):
+        user = db.session.get(User, self.user_id)
+        user.role = 'admin'
+        db.session.commit()
+        self.fresh_session()
+        self.assertTrue(auth.load_user(self.user_id).is_admin())
+        # Demoted by another worker: no flush here, so nothing is invalidated in this process
+        with db.engine.begin() as connection:
+            connection.execute(db.update(User).where(User.id == self.user_id).values(role='user'))
+        self.fresh_session()
+        self.assertFalse(auth.load_user(self.user_id).is_admin())
+
+    def test_password_check_timeout_fails_the_login(self):
+        self.app.config['PASSWORD_HASH_TIMEOUT'] = 0.05
+        pool = self.app.extensions['password_hash_pool']
+        release = threading.Event()
+        busy = [pool.submit(release.wait) for _ in range(self.app.config['PASSWORD_HASH_WORKERS'])]
+        try:
+            self.assertFalse(auth.verify_password(self.user, 'testpass'))
+            rv = self.client.post('/login', data=dict(username='testuser', password='testpass'))
+            self.assertEqual(rv.status_code, 302)
+            self.assertTrue(rv.headers['Location'].endswith('/login'))
+        finally:
+            release.set()
+            for future in busy:
+                future.result()
+
+    def test_verify_password_uses_pool(self):
+        self.assertIsNotNone(self.app.extensions['password_hash_pool'])
+        self.assertTrue(auth.verify_password(self.user, 'testpass'))
+        self.assertFalse(auth.verify_password(self.user, 'wrong'))
+
+    def test_login_rehashes_outdated_hash(self):
+        self.app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:2000'
+        self.assertTrue(self.user.password_needs_rehash())
+        self.client.post('/login', data=dict(username='testuser', password='testpass'))
+        self.fresh_session()
+        user = db.session.get(User, self.user_id)
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:2000$'))
+        self.assertFalse(user.password_needs_rehash())
+        self.assertTrue(user.check_password('testpass'))
+
+
+if __name__ == '__main__':
+    unittest.main()
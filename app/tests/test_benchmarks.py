@@ -0,0 +1,45 @@
+import unittest
+from app import create_app, db
+from benchmarks import micro, seed, stats
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    RATELIMIT_ENABLED = False  # as in the benchmark config: one address, many logins
+
+
+class BenchmarkTests(unittest.TestCase):
+    def test_percentiles_interpolate(self):
+        values = [0.001 * i for i in range(1, 101)]
+        summary = stats.summarize(values, queries=[2, 4])
+        self.assertEqual(summary['requests'], 100)
+        self.assertAlmostEqual(summary['p50_ms'], 50.5)
+        self.assertAlmostEqual(summary['p99_ms'], 99.01)
+        self.assertEqual(summary['queries_per_request'], 3)
+        self.assertIsNone(stats.summarize([])['p95_ms'])
+
+    def test_compare_flags_slower_and_chattier_scenarios(self):
+        base = {'results': {'index': {'p95_ms': 10.0, 'queries_per_request': 1}}}
+        head = {'results': {'index': {'p95_ms': 10.5, 'queries_per_request': 2}}}
+        regressed = {metric: flag for _, metric, _, _, flag in stats.compare(base, head, threshold=0.10)}
+        self.assertEqual(regressed, {'p95_ms': False, 'queries_per_request': True})
+
+    def test_every_scenario_runs_against_seeded_data(self):
+        app = create_app(TestConfig)
+        with app.app_context():
+            db.create_all()
+            data = seed.seed(users=3, tickets=20, comments=40, batch_size=7)
+        self.assertEqual(micro.uncovered_endpoints(app), [])
+
+        results = micro.run(app, data, iterations=1, warmup=1)
+        self.assertEqual(set(results), {s.name for s in micro.SCENARIOS})
+        self.assertEqual({name: r['errors'] for name, r in results.items() if r['errors']}, {})
+        self.assertEqual(results['index']['queries_per_request'], 2)
+        self.assertEqual(results['index_not_modified']['queries_per_request'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+import io
+import json
+import unittest
+from app import create_app, db
+from app import bulk, duplicates, jobs, search
+from app.enums import TicketStatus
+from app.models import User, Ticket, Comment, Job
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    BULK_BATCH_SIZE = 2
+
+
+TICKETS_CSV = '''title,description,status,priority,user_id,created_date
+Printer offline,The office printer is offline,open,high,1,2024-01-02T10:00:00
+VPN drops,VPN drops every few minutes,in_progress,low,1,
+Bad status,This row has an unknown status,Whatever,low,1,
+Bad user,This row points at a missing user,open,low,99,
+Short,tiny,open,low,1,
+'''
+
+
+class BulkTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        admin = User(username='adminuser', email='admin@example.com', role='admin')
+        admin.set_password('adminpass')
+        db.session.add(admin)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_import_csv_validates_like_ticket_form(self):
+        report = bulk.import_stream('tickets', io.StringIO(TICKETS_CSV), 'csv', batch_size=2)
+        self.assertEqual(report.inserted, 2)
+        self.assertEqual(report.rejected, 3)
+        errors = {e['line']: ' '.join(e['errors']) for e in report.errors}
+        self.assertIn('status: Not a valid choice.', errors[4])
+        self.assertIn('user_id: 99 does not exist', errors[5])
+        self.assertIn('description: Field must be between 10 and 5000 characters long.', errors[6])
+        printer = Ticket.query.filter_by(title='Printer offline').one()
+        self.assertEqual(printer.created_date.year, 2024)
+        self.assertIsNotNone(Ticket.query.filter_by(title='VPN drops').one().created_date)
+
+    def test_import_jsonl_comments_by_username(self):
+        ticket = Ticket(title='Existing ticket', description='Needs comments', status='open',
+                        priority='low', user_id=1)
+        db.session.add(ticket)
+        db.session.commit()
+        lines = [
+            json.dumps({'ticket_id': ticket.id, 'username': 'adminuser', 'content': 'Looking into it'}),
+            json.dumps({'ticket_id': ticket.id, 'username': 'ghost', 'content': 'Who am I'}),
+            json.dumps({'ticket_id': 999, 'user_id': 1, 'content': 'Wrong ticket'}),
+            'not json',
+        ]
+        report = bulk.import_stream('comments', io.StringIO('\n'.join(lines)), 'jsonl')
+        self.assertEqual((report.inserted, report.rejected), (1, 3))
+        self.assertEqual(Comment.query.one().content, 'Looking into it')
+
+    def test_explicit_ids_are_kept_and_not_duplicated(self):
+        records = [
+            (1, {'id': 50, 'title': 'Imported fifty', 'description': 'From the old tracker',
+                 'status': 'open', 'priority': 'low', 'user_id': 1}),
+            (2, {'title': 'Imported without id', 'description': 'From the old tracker',
+                 'status': 'open', 'priority': 'low', 'user_id': 1}),
+        ]
+        self.assertEqual(bulk.import_records('tickets', records).inserted, 2)
+        self.assertEqual(db.session.get(Ticket, 50).title, 'Imported fifty')
+        report = bulk.import_records('tickets', records[:1])
+        self.assertEqual((report.inserted, report.rejected), (0, 1))
+
+    def test_export_round_trip(self):
+        bulk.import_stream('tickets', io.StringIO(TICKETS_CSV), 'csv')
+        exported = ''.join(bulk.export_chunks('tickets', 'jsonl', batch_size=1))
+        rows = [json.loads(line) for line in exported.splitlines()]
+        self.assertEqual([r['title'] for r in rows], ['Printer offline', 'VPN drops'])
+        self.assertEqual(rows[0]['created_date'], '2024-01-02T10:00:00')
+
+        csv_text = ''.join(bulk.export_chunks('tickets', 'csv'))
+        self.assertTrue(csv_text.startswith('id,title,description,status'))
+        self.assertEqual(len(csv_text.strip().splitlines()), 3)
+
+    def test_http_import_and_export(self):
+        self.client.post('/login', data=dict(username='adminuser', password='adminpass'))
+        rv = self.client.post('/admin/import', data={
+            'kind': 'tickets',
+            'file': (io.BytesIO(TICKETS_CSV.encode()), 'tickets.csv'),
+        }, content_type='multipart/form-data')
+        self.assertEqual(rv.status_code, 200)
+        self.assertEqual(rv.get_json()['inserted'], 2)
+
+        rv = self.client.get('/admin/export?kind=tickets&format=csv')
+        self.assertTrue(rv.is_streamed)
+        self.assertIn('Printer offline', rv.get_data(as_text=True))
+        self.assertEqual(self.client.get('/admin/export?kind=users').status_code, 400)
+
+    def test_cli_import(self):
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['tickets', 'import', '-', '--format', 'csv'], input=TICKETS_CSV)
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('Inserted 2 tickets, rejected 3', result.output)
+        result = runner.invoke(args=['tickets', 'export', '-', '--format', 'jsonl'])
+        self.assertEqual(len(result.output.strip().splitlines()), 2)
+
+    def test_imported_rows_are_indexed_by_the_worker(self):
+        bulk.import_stream('tickets', io.StringIO(TICKETS_CSV), 'csv', batch_size=2)
+        printer = Ticket.query.filter_by(title='Printer offline').one()
+        comment = json.dumps({'ticket_id': printer.id, 'user_id': 1, 'content': 'Toner replaced yesterday'})
+        bulk.import_stream('comments', io.StringIO(comment), 'jsonl')
+        admin = db.session.get(User, 1)
+        self.assertEqual(search.search('printer', admin), [])
+
+        self.assertEqual(jobs.run_pending(self.app), 2)
+        self.assertEqual([h.ticket_id for h in search.search('printer', admin)], [printer.id])
+        self.assertEqual([h.ticket_id for h in search.search('toner', admin)], [printer.id])
+        similar = duplicates.similar('Printer offline', 'The office printer is offline')
+        self.assertEqual([s.id for s in similar], [printer.id])
+
+
+class BulkOperationTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        admin = User(username='adminuser', email='admin@example.com', role='admin')
+        admin.set_password('adminpass')
+        user = User(username='testuser', email='test@example.com', role='user')
+        user.set_password('testpass')
+        db.session.add_all([admin, user])
+        db.session.commit()
+        self.admin_id, self.user_id = admin.id, user.id
+
+        for i in range(6):
+            owner = self.user_id if i < 4 else self.admin_id
+            ticket = Ticket(title=f'Ticket {i}', description='Bulk test ticket', status='open',
+                            priority='high' if i % 2 else 'low', user_id=owner)
+            db.session.add(ticket)
+            db.session.flush()
+            search.index_ticket(ticket)
+            comment = Comment(content=f'Comment {i}', ticket_id=ticket.id, user_id=self.admin_id)
+            db.session.add(comment)
+            search.index_comment(comment)
+        db.session.commit()
+        self.client.post('/login', data=dict(username='adminuser', password='adminpass'))
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def post(self, url, payload):
+        return self.client.post(url, json=payload)
+
+    def test_status_change_by_filter(self):
+        rv = self.post('/admin/bulk/tickets/status', {'filter': {'priority': 'high'}, 'status': 'closed'})
+        self.assertEqual(rv.get_json(), {'tickets': 3, 'dry_run': False})
+        self.assertEqual(Ticket.query.filter_by(status='closed').count(), 3)
+
+    def test_status_change_queues_notifications(self):
+        self.post('/admin/bulk/tickets/status', {'ids': [1, 2, 3], 'status': 'in_progress'})
+        self.post('/admin/bulk/tickets/status', {'ids': [1, 2], 'status': 'closed', 'dry_run': True})
+        jobs_queued = Job.query.filter_by(name='notify.status_changed').all()
+        self.assertEqual(sorted(json.loads(job.payload)['ticket_id'] for job in jobs_queued), [1, 2, 3])
+        self.assertEqual({json.loads(job.payload)['new_status'] for job in jobs_queued}, {'in_progress'})
+        # Tickets already in the status are not written to
+        self.post('/admin/bulk/tickets/status', {'ids': [1, 4], 'status': 'in_progress'})
+        self.assertEqual(Job.query.filter_by(name='notify.status_changed').count(), 4)
+
+    def test_status_change_skips_soft_deleted_tickets(self):
+        self.post('/admin/bulk/tickets/delete', {'ids': [2]})
+        tickets = Ticket.__table__
+        before = db.session.execute(db.select(tickets.c.version).where(tickets.c.id == 2)).scalar()
+        rv = self.post('/admin/bulk/tickets/status', {'ids': [1, 2, 3], 'status': 'closed', 'dry_run': True})
+        self.assertEqual(rv.get_json(), {'tickets': 2, 'dry_run': True})
+        rv = self.post('/admin/bulk/tickets/status', {'ids': [1, 2, 3], 'status': 'closed'})
+        self.assertEqual(rv.get_json(), {'tickets': 2, 'dry_run': False})
+        # Read past the soft-delete filter: the deleted ticket was left alone
+        deleted = db.session.execute(db.select(tickets.c.status, tickets.c.version, tickets.c.resolved_date)
+                                     .where(tickets.c.id == 2)).one()
+        self.assertEqual(tuple(deleted), (TicketStatus.OPEN, before, None))
+
+    def test_dry_run_changes_nothing(self):
+        rv = self.post('/admin/bulk/tickets/delete', {'ids': [1, 2, 3], 'dry_run': True})
+        self.assertEqual(rv.get_json(), {'tickets': 3, 'comments': 3, 'dry_run': True})
+        self.assertEqual(Ticket.query.count(), 6)
+        self.assertEqual(Comment.query.count(), 6)
+
+    def test_delete_tickets_cascades_to_comments_and_search(self):
+        rv = self.post('/admin/bulk/tickets/delete', {'ids': [1, 2]})
+        self.assertEqual(rv.get_json(), {'tickets': 2, 'comments': 2, 'dry_run': False})
+        self.assertEqual(Ticket.query.count(), 4)
+        self.assertEqual(Comment.query.count(), 4)
+        admin = db.session.get(User, self.admin_id)
+        self.assertEqual(sorted(h.ticket_id for h in search.search('comment', admin)), [3, 4, 5, 6])
+
+    def test_delete_users_cascades(self):
+        rv = self.post('/admin/bulk/users/delete', {'ids': [self.user_id], 'dry_run': True})
+        self.assertEqual(rv.get_json(), {'users': 1, 'tickets': 4, 'comments': 4, 'dry_run': True})
+        rv = self.post('/admin/bulk/users/delete', {'ids': [self.user_id]})
+        self.assertEqual(rv.get_json(), {'users': 1, 'tickets': 4, 'comments': 4, 'dry_run': False})
+        self.assertIsNone(db.session.get(User, self.user_id))
+        self.assertEqual(Ticket.query.count(), 2)
+
+    def test_single_delete_user_cascades(self):
+        rv = self.client.get(f'/admin/delete_user/{self.user_id}')
+        self.assertEqual(rv.status_code, 302)
+        self.assertEqual(Ticket.query.filter_by(user_id=self.user_id).count(), 0)
+
+    def test_rejects_bad_requests(self):
+        self.assertEqual(self.post('/admin/bulk/tickets/delete', {}).status_code, 400)
+        self.assertEqual(self.post('/admin/bulk/tickets/delete', {'filter': {'colour': 'red'}}).status_code, 400)
+        self.assertEqual(self.post('/admin/bulk/tickets/status', {'ids': [1], 'status': 'bogus'}).status_code, 400)
+        self.assertEqual(self.post('/admin/bulk/users/delete', {'filter': {'role': 'admin'}}).status_code, 400)
+        self.assertEqual(self.client.post('/admin/bulk/tickets/delete', data={'ids': '1'}).status_code, 400)
+        self.assertEqual(Ticket.query.count(), 6)
+
+    def test_large_id_lists_are_chunked(self):
+        ids = list(range(1, bulk.ID_CHUNK_SIZE * 2 + 10))
+        rv = self.post('/admin/bulk/comments/delete', {'ids': ids})
+        self.assertEqual(rv.get_json()['comments'], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+from app import create_app, db
+from app import bulk
+from app.models import User, Ticket, Comment
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+
+
+class CachingTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        admin = User(username='adminuser', email='admin@example.com', role='admin')
+        admin.set_password('adminpass')
+        db.session.add(admin)
+        db.session.commit()
+        self.ticket = Ticket(title='Printer offline', description='The office printer is offline',
+                             status='open', priority='high', user_id=admin.id)
+        db.session.add(self.ticket)
+        db.session.commit()
+        self.client.post('/login', data={'username': 'adminuser', 'password': 'adminpass'})
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def revalidate(self, path, etag):
+        return self.client.get(path, headers={'If-None-Match': etag})
+
+    def test_ticket_page_revalidates_until_a_comment_is_added(self):
+        path = f'/ticket/{self.ticket.id}'
+        response = self.client.get(path)
+        etag = response.headers['ETag'].strip('"')
+        self.assertIn('no-cache', response.headers['Cache-Control'])
+        self.assertIsNotNone(response.last_modified)
+        self.assertEqual(self.revalidate(path, etag).status_code, 304)
+
+        self.client.post(path, data={'content': 'Still broken'})
+        self.assertEqual(db.session.get(Ticket, self.ticket.id).version, 2)
+        self.client.get(path)  # consumes the flashed message
+        response = self.revalidate(path, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Still broken', response.data)
+
+    def test_pages_with_flashed_messages_are_not_cached(self):
+        path = f'/ticket/{self.ticket.id}'
+        etag = self.client.get(path).headers['ETag'].strip('"')
+        self.client.post(path, data={'content': 'Flashes a message'})
+        response = self.client.get(path)
+        self.assertIn(b'Your comment has been added.', response.data)
+        self.assertNotIn('ETag', response.headers)
+
+    def test_not_modified_skips_the_ticket_queries(self):
+        path = f'/ticket/{self.ticket.id}'
+        etag = self.client.get(path).headers['ETag'].strip('"')
+        from app.instrumentation import count_queries
+        with count_queries(db.engine) as counter:
+            self.assertEqual(self.revalidate(path, etag).status_code, 304)
+        self.assertEqual(counter.count, 1)
+
+    def test_list_etag_follows_ticket_changes_only(self):
+        etag = self.client.get('/').headers['ETag'].strip('"')
+        self.assertEqual(self.revalidate('/', etag).status_code, 304)
+        self.assertEqual(self.revalidate('/?status=open', etag).status_code, 200)
+
+        # A comment bumps the ticket's version but leaves the list alone
+        db.session.add(Comment(content='Only on the ticket page', ticket_id=self.ticket.id, user_id=1))
+        db.session.commit()
+        self.assertEqual(self.revalidate('/', etag).status_code, 304)
+
+        ticket = db.session.get(Ticket, self.ticket.id)
+        ticket.status = 'closed'
+        db.session.commit()
+        self.assertEqual(self.revalidate('/', etag).status_code, 200)
+
+    def test_bulk_changes_invalidate_list_and_ticket(self):
+        list_etag = self.client.get('/').headers['ETag'].strip('"')
+        ticket_etag = self.client.get(f'/ticket/{self.ticket.id}').headers['ETag'].strip('"')
+        bulk.update_ticket_status(bulk.selection_clauses(Ticket, {'ids': [self.ticket.id]}, bulk.TICKET_FILTERS),
+                                  'closed')
+        self.assertEqual(self.revalidate('/', list_etag).status_code, 200)
+        self.assertEqual(self.revalidate(f'/ticket/{self.ticket.id}', ticket_etag).status_code, 200)
+
+    def test_ticket_cards_are_cached_by_version(self):
+        self.client.get('/')
+        self.client.get('/?priority=high')
+        stats = self.client.get('/admin/cache').get_json()['fragment_cache']
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+
+        ticket = db.session.get(Ticket, self.ticket.id)
+        ticket.title = 'Printer still offline'
+        db.session.commit()
+        self.assertIn(b'Printer still offline', self.client.get('/').data)
+        self.assertEqual(self.client.get('/admin/cache').get_json()['fragment_cache']['size'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
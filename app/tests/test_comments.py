@@ -0,0 +1,108 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app import bulk
+from app.models import User, Ticket, Comment
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_STRICT = True
+    COMMENTS_PER_PAGE = 3
+
+
+class CommentThreadTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(username='customer', email='customer@example.com')
+        self.user.set_password('password')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def make_ticket(self):
+        ticket = Ticket(title='Printer offline', description='The office printer is offline',
+                        status='open', priority='medium', user_id=self.user.id)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket
+
+    def add_comments(self, ticket, count):
+        start = datetime.utcnow() - timedelta(hours=1)
+        comments = [Comment(content=f'Update {i}', ticket_id=ticket.id, user_id=self.user.id,
+                            timestamp=start + timedelta(minutes=i)) for i in range(count)]
+        db.session.add_all(comments)
+        db.session.commit()
+        return comments
+
+    def older_url(self, html):
+        match = re.search(r'data-url="([^"]+)"', html)
+        return match.group(1).replace('&amp;', '&') if match else None
+
+    def test_counts_follow_inserts_and_deletes(self):
+        ticket = self.make_ticket()
+        self.assertEqual((ticket.comment_count, ticket.last_activity_at), (0, None))
+        comments = self.add_comments(ticket, 3)
+        self.assertEqual((ticket.comment_count, ticket.last_activity_at), (3, comments[-1].timestamp))
+
+        # Appended through the relationship to a ticket created in the same flush
+        other = Ticket(title='Scanner jammed', description='The scanner on floor 2 jams', status='open',
+                       priority='low', user_id=self.user.id)
+        other.comments.append(Comment(content='Any news?', user_id=self.user.id))
+        db.session.add(other)
+        db.session.commit()
+        self.assertEqual(other.comment_count, 1)
+
+        latest = comments[-1].id
+        bulk.delete_comments(bulk.selection_clauses(Comment, {'ids': [latest]}, bulk.COMMENT_FILTERS))
+        db.session.expire_all()
+        self.assertEqual((ticket.comment_count, ticket.last_activity_at), (2, comments[1].timestamp))
+
+        db.session.delete(db.session.get(Comment, comments[0].id))
+        db.session.commit()
+        self.assertEqual(ticket.comment_count, 1)
+
+        report = bulk.import_records('comments', [(1, {'ticket_id': ticket.id, 'username': 'customer',
+                                                       'content': 'Imported note'})])
+        self.assertEqual(report.inserted, 1)
+        db.session.expire_all()
+        self.assertEqual(ticket.comment_count, 2)
+
+    def test_ticket_page_shows_the_newest_comments_and_loads_older_ones(self):
+        ticket = self.make_ticket()
+        self.add_comments(ticket, 7)
+        self.client.post('/login', data={'username': 'customer', 'password': 'password'})
+
+        html = self.client.get(f'/ticket/{ticket.id}').get_data(as_text=True)
+        self.assertIn('Comments (7)', html)
+        self.assertLess(html.index('Update 4 -'), html.index('Update 6 -'))
+        self.assertNotIn('Update 3 -', html)
+        self.assertIn('Load older comments', html)
+
+        # Each fragment holds the page before the last one and, while there are more, its own button
+        older = []
+        url = self.older_url(html)
+        while url:
+            fragment = self.client.get(url).get_data(as_text=True)
+            older = re.findall(r'>(Update \d) -', fragment) + older
+            url = self.older_url(fragment)
+        self.assertEqual(older, ['Update 0', 'Update 1', 'Update 2', 'Update 3'])
+        self.assertEqual(self.client.get('/ticket/999/comments').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.database import engine_options
+from config import Config, ProductionConfig, config_from_env
+
+
+class MemoryConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+
+
+class DatabaseTests(unittest.TestCase):
+    def test_in_memory_sqlite_gets_no_pool_sizing(self):
+        app = create_app(MemoryConfig)
+        options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertNotIn('pool_size', options)
+
+    def test_explicit_engine_options_win(self):
+        config = dict(vars(Config), SQLALCHEMY_DATABASE_URI='postgresql://db/helpdesk',
+                      SQLALCHEMY_ENGINE_OPTIONS={'pool_size': 20})
+        options = engine_options(config)
+        self.assertEqual(options['pool_size'], 20)
+        self.assertEqual(options['pool_recycle'], Config.DB_POOL_RECYCLE)
+
+    def test_file_sqlite_connections_get_pragmas(self):
+        with tempfile.TemporaryDirectory() as directory:
+            class FileConfig(MemoryConfig):
+                SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(directory, 'test.db')
+
+            app = create_app(FileConfig)
+            with app.app_context():
+                self.assertEqual(db.engine.pool.size(), Config.DB_POOL_SIZE)
+                pragma = lambda name: db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+                self.assertEqual(pragma('journal_mode'), 'wal')
+                self.assertEqual(pragma('busy_timeout'), Config.SQLITE_BUSY_TIMEOUT_MS)
+                self.assertEqual(pragma('synchronous'), 1)  # NORMAL
+                db.session.remove()
+                db.engine.dispose()
+
+    def test_config_selected_from_environment(self):
+        previous = os.environ.get('APP_CONFIG')
+        try:
+            os.environ['APP_CONFIG'] = 'production'
+            self.assertIs(config_from_env(), ProductionConfig)
+            os.environ['APP_CONFIG'] = 'nonsense'
+            self.assertRaises(ValueError, config_from_env)
+        finally:
+            if previous is None:
+                os.environ.pop('APP_CONFIG', None)
+            else:
+                os.environ['APP_CONFIG'] = previous
+
+
+if __name__ == '__main__':
+    unittest.main()
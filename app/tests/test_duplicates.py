@@ -0,0 +1,125 @@
+import json
+import unittest
+
+from app import db
+from app import duplicates, jobs
+from app.enums import TicketStatus
+from app.models import Ticket, Comment, TicketEvent, TicketSignature, DuplicateBucket
+from app.tests.helpers import AppTestCase
+
+OUTAGE = 'The VPN keeps dropping every few minutes since this morning and I cannot reach the file server'
+
+
+class DuplicateTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin = self.make_user('adminuser', role='admin')
+        self.user = self.make_user('customer')
+
+    def create_ticket(self, title, description):
+        self.client.post('/create_ticket', data={'title': title, 'description': description,
+                                                 'status': 'open', 'priority': 'high'})
+        jobs.Worker(self.app).run(burst=True)  # indexes the new ticket
+        return Ticket.query.order_by(Ticket.id.desc()).first().id
+
+    def test_signatures_estimate_similarity(self):
+        first = duplicates.signature('VPN dropping', OUTAGE)
+        self.assertEqual(len(first), 64)
+        self.assertEqual(duplicates.unpack(duplicates.pack(first)), tuple(first))
+        near = duplicates.signature('VPN dropping again', OUTAGE + ' either')
+        other = duplicates.signature('Printer jammed', 'The printer on the second floor jams on every page')
+        self.assertGreater(duplicates.similarity(first, near), 0.7)
+        self.assertLess(duplicates.similarity(first, other), 0.2)
+        self.assertIsNone(duplicates.signature('', '  '))
+
+    def test_suggestions_while_creating_a_ticket(self):
+        self.login('customer')
+        original = self.create_ticket('VPN dropping', OUTAGE)
+        self.create_ticket('Printer jammed', 'The printer on the second floor jams on every page')
+        self.assertEqual(TicketSignature.query.count(), 2)
+        self.assertEqual(DuplicateBucket.query.count(), 2 * self.app.config['DUPLICATE_BANDS'])
+
+        html = self.client.post('/create_ticket/similar', data={
+            'title': 'VPN keeps dropping', 'description': OUTAGE}).get_data(as_text=True)
+        self.assertIn(f'#{original} VPN dropping', html)
+        self.assertNotIn('Printer jammed', html)
+        # Descriptions run to 5000 characters, more than a request line may carry
+        html = self.client.post('/create_ticket/similar', data={
+            'title': 'VPN keeps dropping', 'description': (OUTAGE + ' ') * 40}).get_data(as_text=True)
+        self.assertIn(f'#{original} VPN dropping', html)
+        self.assertEqual(self.client.get('/create_ticket/similar').status_code, 405)
+
+        # Other people's tickets are not suggested to non-admins
+        self.client.get('/logout')
+        db.session.remove()
+        self.make_user('colleague')
+        self.login('colleague')
+        html = self.client.post('/create_ticket/similar', data={
+            'title': 'VPN keeps dropping', 'description': OUTAGE}).get_data(as_text=True)
+        self.assertNotIn('VPN dropping', html)
+
+    def test_suggestions_need_the_csrf_token(self):
+        self.login('customer')
+        self.app.config['WTF_CSRF_ENABLED'] = True
+        rv = self.client.post('/create_ticket/similar', data={'title': 'VPN keeps dropping', 'description': OUTAGE})
+        self.assertEqual(rv.status_code, 400)
+
+    def test_merge_moves_comments_and_closes_the_duplicate(self):
+        self.login('adminuser')
+        canonical = self.create_ticket('VPN dropping', OUTAGE)
+        duplicate = self.create_ticket('VPN dropping again', OUTAGE + ' either')
+        for content in ('Same for me', 'Still down'):
+            self.client.post(f'/ticket/{duplicate}', data={'content': content})
+
+        html = self.client.get(f'/ticket/{duplicate}/duplicates').get_data(as_text=True)
+        self.assertIn(f'Merge into #{canonical}', html)
+
+        rv = self.client.post(f'/ticket/{duplicate}/merge', data={'into': canonical})
+        self.assertTrue(rv.headers['Location'].endswith(f'/ticket/{canonical}'))
+        db.session.expire_all()
+        merged, kept = db.session.get(Ticket, duplicate), db.session.get(Ticket, canonical)
+        self.assertEqual((merged.merged_into_id, merged.status, merged.comment_count), (canonical, TicketStatus.CLOSED, 0))
+        self.assertEqual(kept.comment_count, 2)
+        self.assertEqual(Comment.query.filter_by(ticket_id=canonical).count(), 2)
+        self.assertIsNone(db.session.get(TicketSignature, duplicate))
+        event = TicketEvent.query.filter_by(ticket_id=canonical, action='merged').one()
+        self.assertEqual(json.loads(event.changes), {'ticket_id': duplicate, 'comments': 2})
+
+        # Merged tickets are no longer suggested, nor merged again
+        self.assertEqual([s.id for s in duplicates.similar('VPN dropping', OUTAGE)], [canonical])
+        self.client.post(f'/ticket/{canonical}/merge', data={'into': duplicate})
+        self.assertIsNone(db.session.get(Ticket, canonical).merged_into_id)
+        self.assertIn(f'Merged into</strong> <a href="/ticket/{canonical}"',
+                      self.client.get(f'/ticket/{duplicate}').get_data(as_text=True))
+
+    def test_merged_ticket_cannot_be_merged_again(self):
+        self.login('adminuser')
+        canonical = self.create_ticket('VPN dropping', OUTAGE)
+        duplicate = self.create_ticket('VPN dropping again', OUTAGE + ' either')
+        other = self.create_ticket('VPN down', OUTAGE + ' too')
+        self.client.post(f'/ticket/{duplicate}/merge', data={'into': canonical})
+
+        rv = self.client.post(f'/ticket/{duplicate}/merge', data={'into': other}, follow_redirects=True)
+        self.assertIn(f'Ticket #{duplicate} was already merged into #{canonical}', rv.get_data(as_text=True))
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Ticket, duplicate).merged_into_id, canonical)
+        self.assertEqual(TicketEvent.query.filter_by(action='merged').count(), 1)
+
+    def test_merge_requires_admin(self):
+        self.login('customer')
+        first = self.create_ticket('VPN dropping', OUTAGE)
+        second = self.create_ticket('VPN dropping again', OUTAGE)
+        self.assertEqual(self.client.post(f'/ticket/{second}/merge', data={'into': first}).status_code, 403)
+
+    def test_rebuild(self):
+        for i in range(3):
+            db.session.add(Ticket(title=f'VPN dropping {i}', description=OUTAGE, status='open', priority='low',
+                                  user_id=self.user.id))
+        db.session.commit()
+        self.assertEqual(TicketSignature.query.count(), 0)  # not created through a view
+        self.assertEqual(duplicates.rebuild(batch_size=2), 3)
+        self.assertEqual(len(duplicates.similar('VPN dropping', OUTAGE)), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
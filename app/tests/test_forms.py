@@ -20,8 +20,7 @@ class TestConfig(Config):
 class FormTests(unittest.TestCase):
     def setUp(self):
         # Create a test Flask application context
-        self.app = create_app()
-        self.app.config.from_object(TestConfig) # Apply the test configuration
+        self.app = create_app(TestConfig) # Apply the test configuration
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all() # Create database tables for the test
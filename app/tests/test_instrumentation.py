@@ -0,0 +1,78 @@
+import json
+import unittest
+from app import create_app, db
+from app.instrumentation import parameter_shape
+from app.models import User
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    PROFILING_ENABLED = True
+    SLOW_QUERY_THRESHOLD_MS = 0  # report every statement
+
+
+class ProfilingTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        user = User(username='testuser', email='test@example.com', role='user')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_server_timing_header(self):
+        self.client.post('/login', data=dict(username='testuser', password='testpass'))
+        rv = self.client.get('/')
+        timing = rv.headers['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_structured_log_line(self):
+        self.client.post('/login', data=dict(username='testuser', password='testpass'))
+        with self.assertLogs('app.profiling', level='INFO') as logs:
+            self.client.get('/')
+        record = json.loads(logs.output[-1].split(':', 2)[2])
+        self.assertEqual(record['endpoint'], 'routes.index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreaterEqual(record['queries'], 1)
+        self.assertTrue(record['slow_queries'])
+        self.assertIn('SELECT', record['slow_queries'][0]['statement'])
+
+    def test_metrics_endpoint(self):
+        self.client.get('/login')
+        self.client.get('/login')
+        body = self.client.get('/metrics').get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_duration_seconds_count{endpoint="routes.login"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="routes.login",le="+Inf"} 2', body)
+        self.assertIn('db_queries_per_request_count{endpoint="routes.login"} 2', body)
+
+    def test_metrics_endpoint_is_opt_in(self):
+        class QuietConfig(TestConfig):
+            PROFILING_ENABLED = False
+        app = create_app(QuietConfig)
+        rv = app.test_client().get('/login')
+        self.assertNotIn('Server-Timing', rv.headers)
+        self.assertEqual(app.test_client().get('/metrics').status_code, 404)
+
+    def test_parameter_shape_hides_values(self):
+        self.assertEqual(parameter_shape({'id': 3, 'name': 'secret'}), '{id: int, name: str}')
+        self.assertEqual(parameter_shape((3, 'secret')), '(int, str)')
+        self.assertEqual(parameter_shape([(1,), (2,)], executemany=True), '2 x (int)')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,161 @@
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app import jobs
+from app.models import User, Ticket, Job
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    JOBS_RUN_INLINE = False
+
+
+CALLS = []
+
+
+@jobs.task('test.record')
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.task('test.explode')
+def explode():
+    raise RuntimeError('boom')
+
+
+class JobQueueTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        CALLS.clear()
+
+        self.user = User(username='testuser', email='test@example.com')
+        self.user.set_password('testpass')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_enqueued_job_waits_for_commit_and_runs_once(self):
+        jobs.enqueue('test.record', {'value': 1})
+        db.session.rollback()
+        self.assertEqual(Job.query.count(), 0)
+
+        jobs.enqueue('test.record', {'value': 2})
+        db.session.commit()
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(CALLS, [2])
+        self.assertEqual(jobs.stats(), {'done': 1})
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_unknown_task_is_rejected(self):
+        with self.assertRaises(LookupError):
+            jobs.enqueue('test.missing')
+
+    def test_idempotency_key_collapses_queued_jobs(self):
+        for value in range(3):
+            jobs.enqueue('test.record', {'value': value}, key='record')
+        db.session.commit()
+        self.assertEqual(Job.query.count(), 1)
+        jobs.run_pending()
+        self.assertEqual(CALLS, [0])
+
+        # Once claimed, the key is free again
+        jobs.enqueue('test.record', {'value': 9}, key='record')
+        db.session.commit()
+        self.assertEqual(Job.query.count(), 2)
+
+    def test_priority_then_age_order(self):
+        jobs.enqueue('test.record', {'value': 'low'}, priority=jobs.PRIORITY_LOW)
+        jobs.enqueue('test.record', {'value': 'first'})
+        jobs.enqueue('test.record', {'value': 'high'}, priority=jobs.PRIORITY_HIGH)
+        jobs.enqueue('test.record', {'value': 'second'})
+        jobs.enqueue('test.record', {'value': 'later'}, delay=3600)
+        db.session.commit()
+        self.assertEqual(jobs.run_pending(), 4)
+        self.assertEqual(CALLS, ['high', 'first', 'second', 'low'])
+
+    def test_batches_are_claimed_up_to_batch_size(self):
+        for value in range(5):
+            jobs.enqueue('test.record', {'value': value})
+        db.session.commit()
+        worker = jobs.Worker(self.app, batch_size=2)
+        self.assertEqual(worker.work_batch(), 2)
+        self.assertEqual(worker.work_batch(), 2)
+        self.assertEqual(worker.work_batch(), 1)
+        self.assertEqual(worker.work_batch(), 0)
+        self.assertEqual(CALLS, [0, 1, 2, 3, 4])
+
+    def test_failures_retry_with_backoff_then_fail(self):
+        jobs.enqueue('test.explode', max_attempts=2)
+        db.session.commit()
+        jobs.run_pending()
+
+        job = Job.query.one()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, datetime.utcnow() + timedelta(seconds=4))
+        self.assertEqual(jobs.run_pending(), 0)  # not due yet
+
+        job.run_at = datetime.utcnow()
+        db.session.commit()
+        jobs.run_pending()
+        db.session.refresh(job)
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+        self.assertIsNotNone(job.finished_at)
+
+    def test_backoff_doubles_and_is_capped(self):
+        config = {'JOB_RETRY_BASE_SECONDS': 10, 'JOB_RETRY_MAX_SECONDS': 60}
+        self.assertTrue(5 <= jobs.backoff(1, config) <= 10)
+        self.assertTrue(20 <= jobs.backoff(3, config) <= 40)
+        self.assertTrue(30 <= jobs.backoff(10, config) <= 60)
+
+    def test_maintenance_requeues_stale_jobs_and_prunes_old_ones(self):
+        long_ago = datetime.utcnow() - timedelta(days=30)
+        db.session.add_all([
+            Job(name='test.record', payload=json.dumps({'value': 'stale'}), status='running',
+                attempts=1, max_attempts=5, run_at=long_ago, locked_by='gone', locked_at=long_ago, created=long_ago),
+            Job(name='test.record', payload='{}', status='done', attempts=1, max_attempts=5,
+                run_at=long_ago, created=long_ago, finished_at=long_ago),
+        ])
+        db.session.commit()
+        jobs.Worker(self.app).maintenance()
+        self.assertEqual(jobs.stats(), {'queued': 1})
+        jobs.run_pending()
+        self.assertEqual(CALLS, ['stale'])
+
+    def test_status_change_queues_a_notification(self):
+        ticket = Ticket(title='Printer', description='Offline', status='open', priority='low', user_id=self.user.id)
+        db.session.add(ticket)
+        db.session.commit()
+        ticket.title = 'Printer on floor 2'
+        db.session.commit()
+        self.assertEqual(Job.query.filter_by(name='notify.status_changed').count(), 0)
+
+        ticket.status = 'closed'
+        db.session.commit()
+        job = Job.query.filter_by(name='notify.status_changed').one()
+        self.assertEqual(json.loads(job.payload)['new_status'], 'closed')
+        with self.assertLogs('app.notifications', 'INFO') as logs:
+            jobs.run_pending()
+        self.assertIn('test@example.com', logs.output[0])
+
+    def test_inline_mode_runs_immediately(self):
+        self.app.config['JOBS_RUN_INLINE'] = True
+        jobs.enqueue('test.record', {'value': 'now'})
+        self.assertEqual(CALLS, ['now'])
+        self.assertEqual(Job.query.count(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 import unittest
 from app import create_app, db
-from app.models import User, Ticket
+from app.enums import TicketPriority, TicketStatus
+from app.models import User, Ticket, Comment
 from config import Config # Import your Config class
 
 # Define a test configuration for the app
@@ -11,8 +12,7 @@ class TestConfig(Config):
 
 class UserModelTests(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
-        self.app.config.from_object(TestConfig)
+        self.app = create_app(TestConfig)
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()
@@ -44,8 +44,7 @@ class UserModelTests(unittest.TestCase):
 
 class TicketModelTests(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
-        self.app.config.from_object(TestConfig)
+        self.app = create_app(TestConfig)
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()
@@ -69,5 +68,51 @@ class TicketModelTests(unittest.TestCase):
         self.assertEqual(Ticket.query.count(), 1)
         self.assertEqual(ticket.creator.username, 'testuser') # Check relationship
 
+    def test_comment_relationships(self):
+        ticket = Ticket(title='Test Ticket', description='This is a test description.',
+                        status='open', priority='low', user_id=self.user.id)
+        db.session.add(ticket)
+        db.session.commit()
+        comment = Comment(content='First!', ticket_id=ticket.id, user_id=self.user.id)
+        db.session.add(comment)
+        db.session.commit()
+        self.assertEqual(comment.author.username, 'testuser')
+        self.assertEqual(comment.ticket, ticket)
+        self.assertEqual(ticket.comments, [comment])
+        self.assertEqual(self.user.tickets, [ticket])
+
+    def test_deleting_ticket_deletes_its_comments(self):
+        ticket = Ticket(title='Test Ticket', description='This is a test description.',
+                        status='open', priority='low', user_id=self.user.id)
+        ticket.comments.append(Comment(content='Doomed', user_id=self.user.id))
+        db.session.add(ticket)
+        db.session.commit()
+        db.session.delete(ticket)
+        db.session.commit()
+        self.assertEqual(Comment.query.count(), 0)
+
+    def test_status_and_priority_are_stored_as_small_integers(self):
+        ticket = Ticket(title='Test Ticket', description='This is a test description.',
+                        status='In Progress', priority='HIGH', user_id=self.user.id)
+        self.assertIs(ticket.status, TicketStatus.IN_PROGRESS)
+        db.session.add(ticket)
+        db.session.commit()
+        raw = db.session.execute(db.text('SELECT status, priority FROM ticket')).one()
+        self.assertEqual(tuple(raw), (2, 3))
+        db.session.expire(ticket)
+        self.assertIs(ticket.priority, TicketPriority.HIGH)
+        self.assertEqual(str(ticket.status), 'In Progress')
+        # Keys work in queries too
+        self.assertEqual(Ticket.query.filter_by(status='in_progress').count(), 1)
+
+    def test_unknown_status_is_rejected(self):
+        ticket = Ticket(title='Test Ticket', description='This is a test description.',
+                        status='open', priority='low', user_id=self.user.id)
+        with self.assertRaises(ValueError):
+            ticket.status = 'pending'
+        with self.assertRaises(ValueError):
+            TicketPriority.parse(9)
+        self.assertIs(ticket.status, TicketStatus.OPEN)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,117 @@
+import os
+import tempfile
+import unittest
+from flask import g
+from app import create_app, db
+from app import auth, ratelimit
+from app.instrumentation import count_queries
+from app.models import User
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    RATELIMITS = {
+        'routes.login': [('ip', 4, 60), ('user', 2, 60)],
+        'api.create_tickets': [('user', 1, 60)],
+    }
+
+
+class RateLimitTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        user = User(username='testuser', email='test@example.com', role='user')
+        user.set_password('testpass')
+        db.session.add(user)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, username, address='10.0.0.1'):
+        return self.client.post('/login', data={'username': username, 'password': 'wrong'},
+                                environ_base={'REMOTE_ADDR': address})
+
+    def test_login_throttled_per_username_before_any_query(self):
+        self.assertEqual(self.login('testuser', '10.0.0.1').status_code, 302)
+        self.assertEqual(self.login('TestUser', '10.0.0.2').status_code, 302)
+        with count_queries(db.engine) as counter:
+            response = self.login('testuser', '10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(counter.count, 0)
+        self.assertTrue(1 <= int(response.headers['Retry-After']) <= 30)
+        # Other accounts and the form itself are unaffected
+        self.assertEqual(self.login('someoneelse', '10.0.0.3').status_code, 302)
+        self.assertEqual(self.client.get('/login').status_code, 200)
+
+    def test_address_limit_covers_every_username(self):
+        for name in ('a', 'b', 'c', 'd'):
+            self.assertEqual(self.login(name).status_code, 302)
+        self.assertEqual(self.login('e').status_code, 429)
+        self.assertEqual(self.login('e', '10.0.0.9').status_code, 302)
+
+    def test_address_limit_counts_clients_behind_a_proxy(self):
+        app = create_app(type('ProxyConfig', (TestConfig,), {'PROXY_COUNT': 1}))
+        client = app.test_client()
+
+        def login(name, address):
+            return client.post('/login', data={'username': name, 'password': 'wrong'},
+                               environ_base={'REMOTE_ADDR': '192.168.0.1'}, headers={'X-Forwarded-For': address})
+
+        with app.app_context():
+            db.create_all()
+            for name in ('a', 'b', 'c', 'd'):
+                self.assertEqual(login(name, '203.0.113.1').status_code, 302)
+            self.assertEqual(login('e', '203.0.113.1').status_code, 429)
+            # Another client behind the same proxy has its own allowance
+            self.assertEqual(login('e', '203.0.113.2').status_code, 302)
+
+    def test_api_gets_json_429(self):
+        user = User.query.filter_by(username='testuser').one()
+        secret = auth.create_token(user, 'test')
+        db.session.commit()
+        headers = {'Authorization': f'Bearer {secret}'}
+        body = {'title': 'Printer jammed', 'description': 'The printer on floor 2 jams', 'status': 'open',
+                'priority': 'low'}
+        self.assertEqual(self.client.post('/api/v1/tickets', json=body, headers=headers).status_code, 201)
+        g.pop('_login_user', None)
+        response = self.client.post('/api/v1/tickets', json=body, headers=headers)
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertIn('Too many attempts', response.get_json()['error'])
+
+    def test_sqlite_store_is_shared_and_refills(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.app.config['RATELIMIT_SQLITE_PATH'] = os.path.join(directory, 'ratelimit.db')
+            first, second = ratelimit.SQLiteStore(self.app), ratelimit.SQLiteStore(self.app)
+            buckets = [('login:ip', 2, 2 / 60)]
+            self.assertEqual(first.take(buckets, 1000.0), 0)
+            self.assertEqual(second.take(buckets, 1000.0), 0)
+            # Both workers drew from the same bucket
+            self.assertAlmostEqual(first.take(buckets, 1000.0), 30.0)
+            # A refused request takes nothing; half a minute later one token is back
+            self.assertAlmostEqual(second.take(buckets, 1015.0), 15.0)
+            self.assertEqual(second.take(buckets, 1030.0), 0)
+            self.assertGreater(first.take(buckets, 1030.0), 0)
+
+    def test_all_or_nothing(self):
+        store = ratelimit.MemoryStore(self.app)
+        self.assertEqual(store.take([('a', 1, 1.0)], 0.0), 0)
+        self.assertGreater(store.take([('b', 5, 1.0), ('a', 1, 1.0)], 0.0), 0)
+        # 'b' was not charged for the refused request
+        for _ in range(5):
+            self.assertEqual(store.take([('b', 5, 1.0)], 0.0), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+from app import create_app, db
+from app.models import User, Ticket, RealtimeMessage
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    # Short streams so a test client read returns
+    REALTIME_KEEPALIVE_SECONDS = 0.05
+    REALTIME_STREAM_SECONDS = 0.2
+    REALTIME_POLL_INTERVAL = 0.01
+
+
+class DatabaseBrokerConfig(TestConfig):
+    REALTIME_BACKEND = 'database'
+
+
+class RealtimeTests(unittest.TestCase):
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.admin = User(username='adminuser', email='admin@example.com', role='admin')
+        self.admin.set_password('adminpass')
+        self.user = User(username='regular', email='regular@example.com', role='user')
+        self.user.set_password('userpass')
+        db.session.add_all([self.admin, self.user])
+        db.session.commit()
+        self.ticket = Ticket(title='Printer offline', description='The office printer is offline',
+                             status='open', priority='high', user_id=self.user.id)
+        db.session.add(self.ticket)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self, username, password):
+        self.client.post('/login', data={'username': username, 'password': password})
+
+    def read_stream(self, url):
+        response = self.client.get(url, headers={'Last-Event-ID': '0'})
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        return response.get_data(as_text=True)
+
+    def test_comment_and_status_change_reach_the_ticket_stream(self):
+        self.login('adminuser', 'adminpass')
+        self.client.post(f'/ticket/{self.ticket.id}', data={'content': 'Tried turning it off and on'})
+        self.client.post(f'/admin/update_ticket_status/{self.ticket.id}', data={'status': 'resolved'})
+
+        body = self.read_stream(f'/events/ticket/{self.ticket.id}')
+        self.assertIn('event: comment', body)
+        self.assertIn('"author": "adminuser"', body)
+        self.assertIn('"status": "resolved"', body)
+        self.assertLess(body.index('event: comment'), body.index('event: ticket'))
+
+    def test_queue_stream_is_scoped_to_the_user(self):
+        other = Ticket(title='Someone else', description='Not for the regular user',
+                       status='open', priority='low', user_id=self.admin.id)
+        db.session.add(other)
+        db.session.commit()
+        self.login('adminuser', 'adminpass')
+        for ticket in (self.ticket, other):
+            self.client.post(f'/admin/update_ticket_status/{ticket.id}', data={'status': 'closed'})
+        self.assertIn('Someone else', self.read_stream('/events/queue'))
+
+        self.client.get('/logout')
+        self.login('regular', 'userpass')
+        body = self.read_stream('/events/queue')
+        self.assertIn('Printer offline', body)
+        self.assertNotIn('Someone else', body)
+
+    def test_rolled_back_changes_are_not_published(self):
+        from app import realtime
+        self.ticket.status = 'closed'
+        realtime.ticket_changed(self.ticket)
+        db.session.rollback()
+        self.assertEqual(realtime.get_broker().latest_id(), 0)
+
+    def test_stream_resumes_after_last_event_id(self):
+        self.login('adminuser', 'adminpass')
+        for status in ('in_progress', 'resolved'):
+            self.client.post(f'/admin/update_ticket_status/{self.ticket.id}', data={'status': status})
+        first = self.read_stream(f'/events/ticket/{self.ticket.id}')
+        last_id = first.split('id: ')[1].split('\n')[0]
+
+        response = self.client.get(f'/events/ticket/{self.ticket.id}', headers={'Last-Event-ID': last_id})
+        body = response.get_data(as_text=True)
+        self.assertNotIn('in_progress', body)
+        self.assertIn('resolved', body)
+
+    def test_stream_ends_after_delivering(self):
+        self.login('adminuser', 'adminpass')
+        self.app.config['REALTIME_STREAM_SECONDS'] = 30
+        self.client.post(f'/admin/update_ticket_status/{self.ticket.id}', data={'status': 'closed'})
+        started = time.monotonic()
+        self.assertIn('event: ticket', self.read_stream(f'/events/ticket/{self.ticket.id}'))
+        self.assertLess(time.monotonic() - started, 5)
+
+    def test_streams_over_the_limit_end_at_once(self):
+        self.login('adminuser', 'adminpass')
+        self.client.post(f'/admin/update_ticket_status/{self.ticket.id}', data={'status': 'closed'})
+        slots = self.app.extensions['realtime_slots'] = threading.BoundedSemaphore(1)
+        slots.acquire()
+        self.assertEqual(self.read_stream(f'/events/ticket/{self.ticket.id}'), 'retry: 3000\n\n')
+        slots.release()
+        self.assertIn('event: ticket', self.read_stream(f'/events/ticket/{self.ticket.id}'))
+        # The finished stream gave its slot back
+        self.assertTrue(slots.acquire(blocking=False))
+
+    def test_unknown_ticket_stream_is_404(self):
+        self.login('adminuser', 'adminpass')
+        self.assertEqual(self.client.get('/events/ticket/999').status_code, 404)
+
+
+class DatabaseBrokerTests(RealtimeTests):
+    config = DatabaseBrokerConfig
+
+    def test_messages_are_written_in_the_change_transaction(self):
+        self.login('adminuser', 'adminpass')
+        self.client.post(f'/admin/update_ticket_status/{self.ticket.id}', data={'status': 'closed'})
+        channels = {m.channel for m in RealtimeMessage.query.all()}
+        self.assertEqual(channels, {f'ticket:{self.ticket.id}', f'user:{self.user.id}', 'tickets'})
+
+
+if __name__ == '__main__':
+    unittest.main()
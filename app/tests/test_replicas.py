@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import unittest
+from flask import g
+from app import create_app, db, replicas
+from app.models import User, Ticket, Comment
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+    RATELIMIT_ENABLED = False
+
+
+class ReplicaTests(unittest.TestCase):
+    def make_app(self, **settings):
+        # A second SQLite file stands in for the replica; replicate() copies rows into it
+        config = type('ReplicaConfig', (TestConfig,), dict({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(self.directory, 'primary.db'),
+            'DB_REPLICA_URLS': ['sqlite:///' + os.path.join(self.directory, 'replica.db')],
+        }, **settings))
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.replica = self.app.extensions['replicas'][0].engine
+        db.metadata.create_all(self.replica)
+        self.client = self.app.test_client()
+
+        user = User(username='customer', email='customer@example.com')
+        user.set_password('password')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+        self.replicate()
+        self.client.post('/login', data={'username': 'customer', 'password': 'password'})
+        with self.client.session_transaction() as session:
+            session.pop(replicas.STICKY_KEY, None)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.app_context = None
+
+    def tearDown(self):
+        if self.app_context is not None:
+            db.session.remove()
+            for engine in [db.engine] + [replica.engine for replica in self.app.extensions['replicas']]:
+                engine.dispose()
+            self.app_context.pop()
+        shutil.rmtree(self.directory)
+
+    def replicate(self):
+        with db.engine.connect() as primary, self.replica.begin() as replica:
+            for table in (Comment.__table__, Ticket.__table__, User.__table__):
+                replica.execute(table.delete())
+            for table in (User.__table__, Ticket.__table__, Comment.__table__):
+                rows = [dict(row._mapping) for row in primary.execute(table.select())]
+                if rows:
+                    replica.execute(table.insert(), rows)
+
+    def add_ticket(self):
+        ticket = Ticket(title='Printer offline', description='The office printer is offline',
+                        status='open', priority='medium', user_id=self.user_id)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket.id
+
+    def get(self, url):
+        g.pop('_login_user', None)
+        db.session.remove()
+        return self.client.get(url)
+
+    def test_reads_go_to_replica_and_writes_stick_to_primary(self):
+        self.make_app()
+        ticket_id = self.add_ticket()
+        # Not replicated yet
+        self.assertEqual(self.get(f'/ticket/{ticket_id}').status_code, 404)
+        self.replicate()
+        self.assertEqual(self.get(f'/ticket/{ticket_id}').status_code, 200)
+
+        rv = self.client.post(f'/ticket/{ticket_id}', data={'content': 'Still offline after a restart'})
+        self.assertEqual(rv.status_code, 302)
+        # The author sees their comment at once, from the primary
+        self.assertIn(b'Still offline after a restart', self.get(f'/ticket/{ticket_id}').data)
+
+        with self.client.session_transaction() as session:
+            session[replicas.STICKY_KEY] = 0
+        self.assertNotIn(b'Still offline after a restart', self.get(f'/ticket/{ticket_id}').data)
+
+    def test_lagging_replica_is_skipped(self):
+        self.make_app(DB_REPLICA_LAG_QUERY='SELECT 60')
+        ticket_id = self.add_ticket()
+        self.assertEqual(self.get(f'/ticket/{ticket_id}').status_code, 200)
+        self.assertFalse(self.app.extensions['replicas'][0].healthy)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        self.make_app()
+        ticket_id = self.add_ticket()
+        missing = os.path.join(self.directory, 'missing', 'replica.db')
+        self.replica.dispose()
+        self.app.extensions['replicas'][0] = replicas.Replica('replica_0', db.create_engine('sqlite:///' + missing))
+        self.assertEqual(self.get(f'/ticket/{ticket_id}').status_code, 200)
+        self.assertFalse(self.app.extensions['replicas'][0].healthy)
+
+    def test_writes_never_go_to_replica(self):
+        self.make_app()
+        rv = self.client.post('/create_ticket', data={'title': 'VPN drops', 'description': 'Every hour',
+                                                      'status': 'open', 'priority': 'low'})
+        self.assertEqual(rv.status_code, 302)
+        self.assertEqual(Ticket.query.count(), 1)
+        with self.replica.connect() as replica:
+            self.assertEqual(replica.execute(db.select(db.func.count()).select_from(Ticket.__table__)).scalar(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,178 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app import bulk, rollups
+from app.models import User, Ticket, TicketRollup
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    QUERY_BUDGET_STRICT = True
+
+
+class RollupTests(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app(TestConfig)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.admin = User(username='adminuser', email='admin@example.com', role='admin')
+        self.admin.set_password('adminpass')
+        db.session.add(self.admin)
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_ticket(self, status='open', priority='high', created_date=None):
+        ticket = Ticket(title='Printer offline', description='The office printer is offline',
+                        status=status, priority=priority, user_id=self.admin.id, created_date=created_date)
+        db.session.add(ticket)
+        db.session.commit()
+        return ticket
+
+    def totals(self, granularity='day'):
+        rows = TicketRollup.query.filter_by(granularity=granularity)
+        result = {}
+        for row in rows:
+            key = (row.status.key, row.priority.key)
+            counters = result.setdefault(key, dict.fromkeys(rollups.COUNTERS, 0))
+            for name in rollups.COUNTERS:
+                counters[name] += getattr(row, name)
+        return result
+
+    def backlog(self):
+        return {key: c['entered'] - c['exited'] for key, c in self.totals().items() if c['entered'] - c['exited']}
+
+    def test_create_and_status_change_update_both_granularities(self):
+        ticket = self.add_ticket()
+        self.assertEqual(self.totals('hour'), self.totals('day'))
+        self.assertEqual(self.backlog(), {('open', 'high'): 1})
+
+        ticket.status = 'in_progress'
+        db.session.commit()
+        self.assertEqual(self.backlog(), {('in_progress', 'high'): 1})
+        self.assertEqual(self.totals()[('open', 'high')]['created'], 1)
+
+        ticket.priority = 'low'
+        db.session.commit()
+        self.assertEqual(self.backlog(), {('in_progress', 'low'): 1})
+
+    def test_resolution_records_time_and_sla_breach(self):
+        late = self.add_ticket(priority='critical', created_date=datetime.utcnow() - timedelta(hours=5))
+        on_time = self.add_ticket(priority='High', created_date=datetime.utcnow() - timedelta(hours=2))
+        late.status = 'resolved'
+        on_time.status = 'Resolved'
+        db.session.commit()
+
+        self.assertIsNotNone(late.resolved_date)
+        resolved = self.totals()
+        self.assertEqual(resolved[('resolved', 'critical')]['sla_breached'], 1)
+        # Capitalized input lands on the same row as the lowercase key
+        self.assertEqual(resolved[('resolved', 'high')]['sla_breached'], 0)
+        self.assertAlmostEqual(resolved[('resolved', 'critical')]['resolution_seconds'], 5 * 3600, delta=60)
+
+        late.status = 'open'
+        db.session.commit()
+        self.assertIsNone(late.resolved_date)
+
+    def test_delete_and_bulk_operations_keep_backlog_in_step(self):
+        tickets = [self.add_ticket(created_date=datetime.utcnow() - timedelta(days=2)) for _ in range(3)]
+        db.session.delete(tickets[0])
+        db.session.commit()
+        self.assertEqual(self.backlog(), {('open', 'high'): 2})
+
+        bulk.update_ticket_status(bulk.selection_clauses(Ticket, {'ids': [tickets[1].id]}, bulk.TICKET_FILTERS),
+                                  'closed')
+        self.assertEqual(self.backlog(), {('open', 'high'): 1, ('closed', 'high'): 1})
+        self.assertEqual(self.totals()[('closed', 'high')]['sla_breached'], 1)
+        self.assertIsNotNone(db.session.get(Ticket, tickets[1].id).resolved_date)
+
+        bulk.delete_tickets(bulk.selection_clauses(Ticket, {'filter': {'status': 'open'}}, bulk.TICKET_FILTERS))
+        self.assertEqual(self.backlog(), {('closed', 'high'): 1})
+
+    def test_backfill_matches_incremental_counts(self):
+        for status in ('open', 'open', 'in_progress'):
+            self.add_ticket(status=status, created_date=datetime(2024, 1, 2, 10))
+        live = self.backlog()
+
+        self.assertEqual(rollups.backfill(chunk_size=2), 3)
+        self.assertEqual(self.backlog(), live)
+        self.assertEqual(TicketRollup.query.filter_by(granularity='hour').count(), 2)
+
+    def test_changes_during_backfill_are_counted_once(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        config = type('FileConfig', (TestConfig,), {
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'rollups.db')})
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+            admin = User(username='adminuser', email='admin@example.com', role='admin')
+            db.session.add(admin)
+            db.session.flush()
+            tickets = [Ticket(title='Printer offline', description='The office printer is offline',
+                              status='open', priority='high', user_id=admin.id) for _ in range(3)]
+            db.session.add_all(tickets)
+            db.session.commit()
+            last_id = tickets[-1].id
+
+            def close_last_ticket():
+                with app.app_context():
+                    db.session.get(Ticket, last_id).status = 'closed'
+                    db.session.commit()
+                    db.session.remove()
+
+            # Another worker closes a ticket the backfill has not reached yet
+            writer = threading.Thread(target=close_last_ticket)
+            record = rollups.record_existing_tickets
+
+            def record_and_race(tickets):
+                if writer.ident is None:
+                    writer.start()
+                    writer.join(0.5)
+                    self.assertTrue(writer.is_alive())  # waiting for the backfill to commit
+                record(tickets)
+
+            rollups.record_existing_tickets = record_and_race
+            try:
+                rollups.backfill(chunk_size=2)
+            finally:
+                rollups.record_existing_tickets = record
+            writer.join()
+
+            db.session.remove()
+            self.assertEqual(self.backlog(), {('open', 'high'): 2, ('closed', 'high'): 1})
+            db.session.remove()
+            db.engine.dispose()
+
+    def test_dashboard_reads_only_rollups(self):
+        self.add_ticket()
+        self.add_ticket(status='closed', priority='low')
+        self.client.post('/login', data={'username': 'adminuser', 'password': 'adminpass'})
+
+        response = self.client.get('/admin/dashboard.json')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(data['open_backlog'], 1)
+        self.assertEqual(sum(day['created'] for day in data['daily']), 2)
+        self.assertEqual([r['priority'] for r in data['resolution'] if r['resolved']], ['low'])
+
+        response = self.client.get('/admin/dashboard')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Open backlog: 1', response.data)
+
+
+if __name__ == '__main__':
+    unittest.main()
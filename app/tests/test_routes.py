@@ -1,6 +1,8 @@
 import unittest
 from app import create_app, db
-from app.models import User
+from datetime import datetime, timedelta
+from app.models import User, Ticket, Comment
+from app.instrumentation import query_budget, QueryBudgetExceeded
 from config import Config
 
 
@@ -8,12 +10,13 @@ class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False  # Disable CSRF for easier testing
+    TICKETS_PER_PAGE = 5
+    QUERY_BUDGET_STRICT = True  # Views that exceed their @query_budget fail the test
 
 
 class RouteTests(unittest.TestCase):
     def setUp(self):
-        self.app = create_app()
-        self.app.config.from_object(TestConfig)
+        self.app = create_app(TestConfig)
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()  # Ensures a clean database for each test
@@ -78,6 +81,160 @@ class RouteTests(unittest.TestCase):
             # This assertion is now correct (200 OK for admin user)
             self.assertEqual(rv.status_code, 200)
 
+    def add_tickets(self, count, user_id, status='open', priority='low'):
+        start = datetime(2024, 1, 1)
+        for i in range(count):
+            db.session.add(Ticket(title=f'Ticket {i:03d}', description='x' * 300, status=status,
+                                  priority=priority, user_id=user_id, created_date=start + timedelta(minutes=i)))
+        db.session.commit()
+
+    def test_index_keyset_pagination(self):
+        self.add_tickets(12, self.user_id)
+        with self.app.test_client() as client:
+            self.client = client
+            self.login('testuser', 'testpass')
+            seen = []
+            url = '/'
+            while url:
+                rv = client.get(url)
+                self.assertEqual(rv.status_code, 200)
+                body = rv.get_data(as_text=True)
+                found = [i for i in range(12) if f'Ticket {i:03d}' in body]
+                seen.extend(sorted(found, key=lambda i: body.index(f'Ticket {i:03d}')))
+                marker = 'href="/?after='
+                url = None
+                if marker in body:
+                    start = body.index(marker) + len('href="')
+                    url = body[start:body.index('"', start)].replace('&amp;', '&')
+            # Newest first, every ticket exactly once
+            self.assertEqual(seen[:5], [11, 10, 9, 8, 7])
+            self.assertEqual(sorted(seen), list(range(12)))
+
+    def test_index_truncates_description(self):
+        self.add_tickets(1, self.user_id)
+        with self.app.test_client() as client:
+            self.client = client
+            self.login('testuser', 'testpass')
+            body = client.get('/').get_data(as_text=True)
+            self.assertIn('x' * self.app.config['TICKET_SUMMARY_LENGTH'] + '&hellip;', body)
+            self.assertNotIn('x' * 300, body)
+
+    def test_index_filters_and_ownership(self):
+        self.add_tickets(2, self.user_id, status='open')
+        db.session.add(Ticket(title='Closed one', description='closed ticket', status='closed',
+                              priority='high', user_id=self.user_id))
+        db.session.add(Ticket(title='Admin ticket', description='admin owned', status='open',
+                              priority='low', user_id=self.admin_user_id))
+        db.session.commit()
+        with self.app.test_client() as client:
+            self.client = client
+            self.login('testuser', 'testpass')
+            body = client.get('/?status=closed').get_data(as_text=True)
+            self.assertIn('Closed one', body)
+            self.assertNotIn('Ticket 000', body)
+            # A regular user cannot widen the list to another creator
+            body = client.get(f'/?user_id={self.admin_user_id}').get_data(as_text=True)
+            self.assertNotIn('Admin ticket', body)
+
+            self.logout()
+            self.login('adminuser', 'adminpass')
+            body = client.get(f'/?user_id={self.admin_user_id}').get_data(as_text=True)
+            self.assertIn('Admin ticket', body)
+            self.assertNotIn('Closed one', body)
+            body = client.get('/?priority=high').get_data(as_text=True)
+            self.assertIn('Closed one', body)
+            self.assertNotIn('Admin ticket', body)
+            # Labels work as filter values; unknown values are ignored
+            self.assertIn('Closed one', client.get('/?status=Closed').get_data(as_text=True))
+            body = client.get('/?status=bogus').get_data(as_text=True)
+            self.assertIn('Admin ticket', body)
+            self.assertIn('Closed one', body)
+
+    def test_admin_status_update_rejects_unknown_status(self):
+        self.add_tickets(1, self.user_id)
+        ticket = Ticket.query.one()
+        self.login('adminuser', 'adminpass')
+        self.client.post(f'/admin/update_ticket_status/{ticket.id}', data={'status': 'bogus'})
+        self.assertIn(b'Invalid status selection', self.client.get('/admin').data)
+        self.assertEqual(ticket.status.key, 'open')
+        self.client.post(f'/admin/update_ticket_status/{ticket.id}', data={'status': 'resolved'})
+        db.session.refresh(ticket)
+        self.assertEqual(ticket.status.key, 'resolved')
+
+    def test_index_ignores_malformed_cursor(self):
+        self.add_tickets(1, self.user_id)
+        with self.app.test_client() as client:
+            self.client = client
+            self.login('testuser', 'testpass')
+            rv = client.get('/?after=not-a-cursor')
+            self.assertEqual(rv.status_code, 200)
+            self.assertIn(b'Ticket 000', rv.data)
+
+    def test_admin_panel_streams_aggregate_counts(self):
+        self.add_tickets(3, self.user_id, status='open', priority='high')
+        self.add_tickets(2, self.user_id, status='closed', priority='low')
+        self.login('adminuser', 'adminpass')
+        rv = self.client.get('/admin')
+        self.assertTrue(rv.is_streamed)
+        body = rv.get_data(as_text=True)
+        self.assertIn('Tickets: 5', body)
+        self.assertIn('Open: 3', body)
+        self.assertIn('Closed: 2', body)
+        self.assertIn('High: 3', body)
+        # Sections are placeholders until opened
+        self.assertNotIn('Ticket 000', body)
+        self.assertIn('data-fragment-url="/admin/tickets"', body)
+
+    def test_admin_fragments_paginate(self):
+        self.app.config['ADMIN_PAGE_SIZE'] = 2
+        self.add_tickets(3, self.user_id)
+        self.login('adminuser', 'adminpass')
+        body = self.client.get('/admin/tickets').get_data(as_text=True)
+        self.assertIn('Ticket 002', body)
+        self.assertIn('Ticket 001', body)
+        self.assertNotIn('Ticket 000', body)
+        start = body.index('data-url="') + len('data-url="')
+        next_url = body[start:body.index('"', start)].replace('&amp;', '&')
+        body = self.client.get(next_url).get_data(as_text=True)
+        self.assertIn('Ticket 000', body)
+        self.assertNotIn('load-more', body)
+
+        body = self.client.get('/admin/users').get_data(as_text=True)
+        self.assertIn('testuser', body)
+        self.assertIn('3 tickets', body)
+
+    def test_admin_fragments_require_admin(self):
+        with self.app.test_client() as client:
+            self.client = client
+            self.login('testuser', 'testpass')
+            for url in ('/admin/users', '/admin/tickets', '/admin/comments'):
+                self.assertEqual(client.get(url).status_code, 403)
+
+    def test_ticket_detail_stays_within_query_budget(self):
+        self.add_tickets(1, self.user_id)
+        for i in range(10):
+            author = User(username=f'author{i}', email=f'author{i}@example.com', role='user')
+            db.session.add(author)
+            db.session.flush()
+            db.session.add(Comment(content=f'Comment body {i}', ticket_id=1, user_id=author.id))
+        db.session.commit()
+
+        self.login('adminuser', 'adminpass')
+        # One query per comment author would blow the budget and raise here
+        rv = self.client.get('/ticket/1')
+        self.assertEqual(rv.status_code, 200)
+        body = rv.get_data(as_text=True)
+        self.assertIn('author9', body)
+        self.assertIn('Opened by:</strong> testuser', body)
+
+    def test_query_budget_is_enforced(self):
+        @query_budget(0)
+        def probe():
+            return str(User.query.count())
+        self.app.add_url_rule('/_budget_probe', 'budget_probe', probe)
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/_budget_probe')
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,136 @@
+import unittest
+from app import create_app, db
+from app import jobs, search
+from app.models import User, Ticket, Comment
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+    SEARCH_BACKEND = 'fts5'
+
+
+class PostingsTestConfig(TestConfig):
+    SEARCH_BACKEND = 'postings'
+
+
+class FTS5SearchTests(unittest.TestCase):
+    config = TestConfig
+
+    def setUp(self):
+        self.app = create_app(self.config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(username='testuser', email='test@example.com', role='user')
+        self.user.set_password('testpass')
+        self.other = User(username='otheruser', email='other@example.com', role='user')
+        self.other.set_password('otherpass')
+        self.admin = User(username='adminuser', email='admin@example.com', role='admin')
+        self.admin.set_password('adminpass')
+        db.session.add_all([self.user, self.other, self.admin])
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_ticket(self, title, description, user):
+        ticket = Ticket(title=title, description=description, status='open', priority='low', user_id=user.id)
+        db.session.add(ticket)
+        search.index_ticket(ticket)
+        db.session.commit()
+        return ticket
+
+    def test_ranks_title_matches_first(self):
+        self.add_ticket('Printer jammed', 'Paper stuck in the tray', self.user)
+        self.add_ticket('Monitor flicker', 'Happens next to the printer', self.user)
+        hits = search.search('printer', self.admin)
+        self.assertEqual([h.title.striptags() for h in hits], ['Printer jammed', 'Monitor flicker'])
+
+    def test_prefix_and_highlight(self):
+        self.add_ticket('VPN disconnects', 'The connection drops every hour', self.user)
+        hits = search.search('conn', self.admin)
+        self.assertEqual(len(hits), 1)
+        self.assertIn('<mark>connection</mark>', hits[0].body)
+
+    def test_all_terms_must_match(self):
+        self.add_ticket('Email outage', 'Outlook cannot reach the server', self.user)
+        self.add_ticket('Server reboot', 'Scheduled maintenance window', self.user)
+        hits = search.search('server outlook', self.admin)
+        self.assertEqual([h.ticket_id for h in hits], [1])
+
+    def test_snippet_escapes_html(self):
+        self.add_ticket('Script in ticket', '<script>alert(1)</script> widget broken', self.user)
+        hits = search.search('widget', self.admin)
+        self.assertNotIn('<script>', hits[0].body)
+        self.assertIn('&lt;script&gt;', hits[0].body)
+
+    def test_comments_update_and_delete(self):
+        ticket = self.add_ticket('Keyboard issue', 'Keys are sticky', self.user)
+        comment = Comment(content='Replaced with a spare unit', ticket_id=ticket.id, user_id=self.admin.id)
+        db.session.add(comment)
+        search.index_comment(comment)
+        db.session.commit()
+        hits = search.search('spare', self.admin)
+        self.assertEqual([(h.kind, h.ticket_id) for h in hits], [('comment', ticket.id)])
+
+        ticket.title = 'Mouse issue'
+        search.index_ticket(ticket)
+        db.session.commit()
+        self.assertEqual(search.search('keyboard', self.admin), [])
+        self.assertEqual(len(search.search('mouse', self.admin)), 1)
+
+        search.remove_ticket(ticket.id)
+        db.session.commit()
+        self.assertEqual(search.search('spare', self.admin), [])
+        self.assertEqual(search.search('mouse', self.admin), [])
+
+    def test_regular_user_sees_only_own_tickets(self):
+        self.add_ticket('Laptop battery', 'Drains quickly', self.user)
+        self.add_ticket('Laptop screen', 'Cracked display', self.other)
+        self.assertEqual(len(search.search('laptop', self.user)), 1)
+        self.assertEqual(len(search.search('laptop', self.admin)), 2)
+
+    def test_scores_do_not_depend_on_visibility(self):
+        self.add_ticket('Laptop battery', 'Drains quickly', self.user)
+        for i in range(3):
+            self.add_ticket(f'Laptop dock {i}', 'No video out', self.other)
+        self.add_ticket('Printer toner', 'Empty again', self.other)
+        own = search.search('laptop', self.user)
+        self.assertEqual(len(own), 1)
+        admin_hit = next(h for h in search.search('laptop', self.admin) if h.ticket_id == own[0].ticket_id)
+        self.assertAlmostEqual(own[0].score, admin_hit.score)
+
+    def test_rebuild(self):
+        db.session.add(Ticket(title='Imported ticket', description='Loaded without indexing',
+                              status='open', priority='low', user_id=self.user.id))
+        db.session.commit()
+        self.assertEqual(search.search('imported', self.admin), [])
+        self.assertEqual(search.rebuild(batch_size=1), 1)
+        self.assertEqual(len(search.search('imported', self.admin)), 1)
+
+    def test_search_route_indexes_on_create(self):
+        with self.app.test_client() as client:
+            client.post('/login', data=dict(username='testuser', password='testpass'))
+            client.post('/create_ticket', data=dict(title='Projector broken', description='No signal from HDMI',
+                                                    status='open', priority='high'))
+            # Indexing is queued for the worker
+            self.assertNotIn(b'<mark>HDMI</mark>', client.get('/search?q=hdmi').data)
+            self.assertEqual(jobs.run_pending(), 1)
+            rv = client.get('/search?q=hdmi')
+            self.assertEqual(rv.status_code, 200)
+            self.assertIn(b'<mark>HDMI</mark>', rv.data)
+
+
+class PostingsSearchTests(FTS5SearchTests):
+    config = PostingsTestConfig
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app import startup
+from config import Config
+
+
+class TestConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    WTF_CSRF_ENABLED = False
+
+
+class StartupTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        config = type('CacheConfig', (TestConfig,), {'JINJA_BYTECODE_CACHE_DIR': self.directory})
+        self.app = create_app(config)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.directory)
+
+    def test_compiled_templates_are_cached_on_disk(self):
+        count = startup.compile_templates(self.app)
+        self.assertGreater(count, 10)
+        self.assertEqual(len(os.listdir(self.directory)), count)
+        # A second app loads them instead of compiling
+        other = create_app(type('CacheConfig', (TestConfig,), {'JINJA_BYTECODE_CACHE_DIR': self.directory}))
+        other.jinja_env.compile = lambda *args, **kwargs: self.fail('template compiled again')
+        self.assertEqual(other.jinja_env.get_template('login.html').name, 'login.html')
+
+    def test_startup_timings_recorded(self):
+        timings = self.app.extensions['startup']
+        self.assertGreater(timings['create_app_ms'], 0)
+        self.assertGreaterEqual(timings['import_ms'], 0)
+
+    def test_migrations_command_loads_on_demand(self):
+        self.assertNotIn('migrate', self.app.extensions)
+        result = self.app.test_cli_runner().invoke(args=['db', '--help'])
+        self.assertEqual(result.exit_code, 0, result.output)
+        self.assertIn('upgrade', result.output)
+
+
+if __name__ == '__main__':
+    unittest.main()
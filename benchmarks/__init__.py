@@ -0,0 +1,15 @@
+"""Benchmarks for the routes blueprint.
+
+    python -m benchmarks micro --tickets 5000 --output base.json
+    python -m benchmarks load --duration 30 --concurrency 16 --output load.json
+    python -m benchmarks startup --runs 10 --output startup.json
+    python -m benchmarks compare base.json head.json
+
+``micro`` seeds a throwaway SQLite database (or DATABASE_URL with --database-url)
+and times each scenario in-process through the Flask test client. ``load``
+serves the same seeded database with gunicorn.conf.py and drives it over HTTP
+from many threads. ``startup`` boots the app in fresh interpreters and times
+the import, ``create_app`` and the first request. All write JSON with
+p50/p95/p99 latencies (and queries-per-request), which ``compare`` diffs
+between two runs.
+"""
@@ -0,0 +1,154 @@
+# benchmarks/__main__.py
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from app import create_app, db
+from benchmarks import load, micro, seed, startup, stats
+from config import ProductionConfig
+
+
+def _make_app(database_url):
+    class BenchmarkConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = database_url
+        WTF_CSRF_ENABLED = False
+        SESSION_COOKIE_SECURE = False
+        PROFILING_ENABLED = False
+        QUERY_BUDGET_STRICT = False
+        # Every request comes from one address and logs in over and over
+        RATELIMIT_ENABLED = False
+    return create_app(BenchmarkConfig)
+
+
+def _seeded_app(args, directory):
+    database_url = args.database_url or 'sqlite:///' + os.path.join(directory, 'benchmark.db')
+    app = _make_app(database_url)
+    with app.app_context():
+        db.create_all()
+        if db.session.query(db.func.count()).select_from(db.metadata.tables['ticket']).scalar():
+            sys.exit(f'{database_url} already has tickets; point --database-url at an empty database')
+        data = seed.seed(users=args.users, tickets=args.tickets, comments=args.comments,
+                         random_seed=args.seed)
+    return app, database_url, data
+
+
+def _sizes(args):
+    return {'users': args.users, 'tickets': args.tickets, 'comments': args.comments, 'seed': args.seed}
+
+
+def run_micro(args):
+    with tempfile.TemporaryDirectory() as directory:
+        app, database_url, data = _seeded_app(args, directory)
+        missing = micro.uncovered_endpoints(app)
+        if missing:
+            print(f"warning: no scenario for {', '.join(missing)}", file=sys.stderr)
+        results = micro.run(app, data, iterations=args.iterations, warmup=args.warmup,
+                            only=set(args.only) if args.only else None, random_seed=args.seed)
+        with app.app_context():
+            dialect = db.engine.dialect.name
+            db.engine.dispose()
+        stats.write_results(args.output, 'micro',
+                            dict(_sizes(args), iterations=args.iterations, warmup=args.warmup, database=dialect),
+                            results)
+
+
+def run_load(args):
+    with tempfile.TemporaryDirectory() as directory:
+        process = None
+        if args.url:
+            base_url, data = args.url, {'tickets': list(range(1, args.tickets + 1))}
+        else:
+            app, database_url, data = _seeded_app(args, directory)
+            with app.app_context():
+                db.engine.dispose()
+            log = open(args.server_log, 'a') if args.server_log else None
+            process = load.start_gunicorn(database_url, args.port, workers=args.workers, threads=args.threads,
+                                          log=log)
+            base_url = f'http://127.0.0.1:{args.port}'
+        try:
+            results = load.run(base_url, data['tickets'], concurrency=args.concurrency,
+                               duration=args.duration, random_seed=args.seed, streams=args.streams)
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=60)
+        stats.write_results(args.output, 'load',
+                            dict(_sizes(args), concurrency=args.concurrency, streams=args.streams,
+                                 duration=args.duration,
+                                 workers=args.workers, threads=args.threads, url=args.url),
+                            results)
+
+
+def run_startup(args):
+    results = startup.run(runs=args.runs, database_url=args.database_url)
+    stats.write_results(args.output, 'startup', {'runs': args.runs}, results)
+
+
+def run_compare(args):
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.head) as f:
+        head = json.load(f)
+    regressions = 0
+    print(f"{'scenario':32} {'metric':20} {'base':>10} {'head':>10} {'change':>8}")
+    for name, metric, old, new, regressed in stats.compare(base, head, threshold=args.threshold):
+        change = f'{(new - old) / old * 100:+.1f}%' if old else ''
+        print(f"{name:32} {metric:20} {old:>10} {new:>10} {change:>8}{'  REGRESSION' if regressed else ''}")
+        regressions += regressed
+    if regressions:
+        print(f'{regressions} regression(s) over {args.threshold:.0%}', file=sys.stderr)
+        sys.exit(1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def data_options(command):
+        command.add_argument('--users', type=int, default=50)
+        command.add_argument('--tickets', type=int, default=2000)
+        command.add_argument('--comments', type=int, default=6000)
+        command.add_argument('--seed', type=int, default=1, help='Random seed for data and request choices.')
+        command.add_argument('--database-url', help='Empty database to seed (default: a temporary SQLite file).')
+        command.add_argument('--output', default='-', help="JSON results file ('-' for stdout).")
+
+    command = commands.add_parser('micro', help='Time each route in-process.')
+    data_options(command)
+    command.add_argument('--iterations', type=int, default=50)
+    command.add_argument('--warmup', type=int, default=5)
+    command.add_argument('--only', nargs='*', help='Scenario names to run.')
+    command.set_defaults(func=run_micro)
+
+    command = commands.add_parser('load', help='Concurrent HTTP load against gunicorn.')
+    data_options(command)
+    command.add_argument('--url', help='Existing server to target instead of starting gunicorn.')
+    command.add_argument('--port', type=int, default=8765)
+    command.add_argument('--concurrency', type=int, default=8)
+    command.add_argument('--duration', type=float, default=30.0)
+    command.add_argument('--streams', type=int, default=0,
+                         help='Open event streams (tabs left open) kept up alongside the request mix.')
+    command.add_argument('--workers', type=int)
+    command.add_argument('--threads', type=int)
+    command.add_argument('--server-log', help='Append gunicorn output here instead of discarding it.')
+    command.set_defaults(func=run_load)
+
+    command = commands.add_parser('startup', help='Time app boot in fresh interpreters.')
+    command.add_argument('--runs', type=int, default=10)
+    command.add_argument('--database-url', help='Database the app points at (default: a temporary SQLite file).')
+    command.add_argument('--output', default='-', help="JSON results file ('-' for stdout).")
+    command.set_defaults(func=run_startup)
+
+    command = commands.add_parser('compare', help='Diff two result files; exits 1 on regressions.')
+    command.add_argument('base')
+    command.add_argument('head')
+    command.add_argument('--threshold', type=float, default=0.10, help='Allowed latency growth (0.10 = 10%%).')
+    command.set_defaults(func=run_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
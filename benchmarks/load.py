@@ -0,0 +1,154 @@
+# benchmarks/load.py
+"""Concurrent HTTP load against a running server (gunicorn by default)."""
+import http.cookiejar
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+
+from benchmarks.seed import ADMIN_USERNAME, PASSWORD
+from benchmarks.stats import summarize
+
+CSRF_PATTERN = re.compile(r'name="csrf_token" type="hidden" value="([^"]+)"')
+QUERIES_PATTERN = re.compile(r'desc="(\d+) queries"')
+EVENT_ID_PATTERN = re.compile(r'^id: (\d+)$', re.MULTILINE)
+RETRY_PATTERN = re.compile(r'^retry: (\d+)$', re.MULTILINE)
+
+# (weight, name, path template) for the read-mostly mix each virtual user loops over
+MIX = [
+    (40, 'index', '/'),
+    (30, 'ticket', '/ticket/{ticket_id}'),
+    (10, 'search', '/search?q=printer'),
+    (10, 'admin_tickets', '/admin/tickets'),
+    (5, 'admin_panel', '/admin'),
+    (5, 'dashboard_data', '/admin/dashboard.json'),
+]
+
+
+class VirtualUser:
+    def __init__(self, base_url, rng):
+        self.base_url = base_url.rstrip('/')
+        self.rng = rng
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=30) as response:
+                text = response.read().decode('utf-8', 'replace')
+                status, timing = response.status, response.headers.get('Server-Timing', '')
+        except urllib.error.HTTPError as exc:
+            text, status, timing = '', exc.code, ''
+        elapsed = time.perf_counter() - started
+        match = QUERIES_PATTERN.search(timing)
+        return status, elapsed, int(match.group(1)) if match else None, text
+
+    def login(self):
+        status, elapsed, queries, page = self.request('/login')
+        token = CSRF_PATTERN.search(page)
+        data = {'username': ADMIN_USERNAME, 'password': PASSWORD}
+        if token:
+            data['csrf_token'] = token.group(1)
+        status, elapsed, queries, _ = self.request('/login', data)
+        return status, elapsed, queries
+
+
+def _wait_for_port(host, port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server did not start listening on {host}:{port}')
+
+
+def start_gunicorn(database_url, port, workers=None, threads=None, log=None):
+    """Serve run:app with gunicorn.conf.py on ``database_url``; returns the process.
+
+    Profiling is switched on for the Server-Timing query counts; its per-request
+    log lines go to ``log`` (a file object) or are discarded.
+    """
+    env = dict(os.environ, DATABASE_URL=database_url, APP_CONFIG='production',
+               SESSION_COOKIE_SECURE='false', PROFILING_ENABLED='1', GUNICORN_ACCESS_LOG='/dev/null',
+               RATELIMIT_ENABLED='false')
+    if workers:
+        env['WEB_CONCURRENCY'] = str(workers)
+    if threads:
+        env['GUNICORN_THREADS'] = str(threads)
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                                '--bind', f'127.0.0.1:{port}'], cwd=root, env=env,
+                               stdout=log or subprocess.DEVNULL, stderr=log or subprocess.DEVNULL)
+    _wait_for_port('127.0.0.1', port)
+    return process
+
+
+def run(base_url, ticket_ids, concurrency=8, duration=30.0, random_seed=1, streams=0):
+    """Drive MIX from ``concurrency`` threads for ``duration`` seconds; returns summaries by name.
+
+    ``streams`` more threads each keep the queue's event stream open the way
+    an open tab does, reconnecting as EventSource would, so the MIX numbers
+    show whether waiting streams starve page requests of worker threads.
+    """
+    samples = defaultdict(lambda: {'latencies': [], 'queries': [], 'errors': 0})
+    lock = threading.Lock()
+    weights, names, paths = zip(*MIX)
+    deadline = time.monotonic() + duration
+
+    def record(name, status, elapsed, queries):
+        with lock:
+            sample = samples[name]
+            sample['latencies'].append(elapsed)
+            if queries is not None:
+                sample['queries'].append(queries)
+            if status >= 400:
+                sample['errors'] += 1
+
+    def worker(index):
+        user = VirtualUser(base_url, random.Random(random_seed + index))
+        record('login', *user.login())
+        while time.monotonic() < deadline:
+            i = user.rng.choices(range(len(MIX)), weights=weights)[0]
+            path = paths[i].format(ticket_id=user.rng.choice(ticket_ids))
+            status, elapsed, queries, _ = user.request(path)
+            record(names[i], status, elapsed, queries)
+
+    def listener(index):
+        user = VirtualUser(base_url, random.Random(random_seed + concurrency + index))
+        user.login()
+        last_id = ''
+        while time.monotonic() < deadline:
+            status, elapsed, _, body = user.request(f'/events/queue?last_event_id={last_id}')
+            record('events', status, elapsed, None)
+            ids = EVENT_ID_PATTERN.findall(body)
+            last_id = ids[-1] if ids else last_id
+            retry = RETRY_PATTERN.search(body)
+            time.sleep(int(retry.group(1)) / 1000 if retry else 3)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    threads += [threading.Thread(target=listener, args=(i,)) for i in range(streams)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {name: summarize(s['latencies'], s['queries'], elapsed=elapsed, errors=s['errors'])
+               for name, s in samples.items()}
+    everything = [s for name, s in samples.items() if name not in ('login', 'events')]
+    results['all'] = summarize([v for s in everything for v in s['latencies']],
+                               [v for s in everything for v in s['queries']],
+                               elapsed=elapsed, errors=sum(s['errors'] for s in everything))
+    return results
@@ -0,0 +1,167 @@
+# benchmarks/micro.py
+"""In-process route benchmarks through the Flask test client."""
+import random
+import time
+
+from app import db
+from app.instrumentation import count_queries
+from app.routes import bp
+from benchmarks.seed import ADMIN_USERNAME, PASSWORD
+from benchmarks.stats import summarize
+
+
+class Scenario:
+    """One request shape: ``request(client, rng, data)`` returns the response.
+
+    ``fresh_client`` scenarios get a new, logged-out client per request
+    (login); the rest share a client logged in as ``role``.
+    """
+
+    def __init__(self, name, endpoint, role, request, fresh_client=False):
+        self.name = name
+        self.endpoint = endpoint
+        self.role = role
+        self.request = request
+        self.fresh_client = fresh_client
+
+
+def _ticket_id(rng, data):
+    return rng.choice(data['tickets'])
+
+
+def _new_ticket(rng):
+    return {'title': f'Benchmark ticket {rng.randrange(10 ** 9)}',
+            'description': 'Created by the benchmark suite to time ticket creation.',
+            'status': 'open', 'priority': 'medium'}
+
+
+def _revalidate(client, path, data):
+    # Conditional GET with the ETag from an earlier full response (fetched once per path)
+    etags = data.setdefault('etags', {})
+    if path not in etags:
+        etags[path] = client.get(path).headers.get('ETag')
+    return client.get(path, headers={'If-None-Match': etags[path]})
+
+
+SCENARIOS = [
+    Scenario('index', 'routes.index', 'user', lambda c, rng, d: c.get('/')),
+    Scenario('index_admin', 'routes.index', 'admin', lambda c, rng, d: c.get('/')),
+    Scenario('index_admin_filtered', 'routes.index', 'admin',
+             lambda c, rng, d: c.get('/?status=open&priority=high')),
+    Scenario('index_not_modified', 'routes.index', 'user', lambda c, rng, d: _revalidate(c, '/', d)),
+    Scenario('ticket', 'routes.ticket', 'admin', lambda c, rng, d: c.get(f'/ticket/{_ticket_id(rng, d)}')),
+    Scenario('ticket_not_modified', 'routes.ticket', 'admin',
+             lambda c, rng, d: _revalidate(c, f'/ticket/{_ticket_id(rng, d)}', d)),
+    Scenario('ticket_comment', 'routes.ticket', 'admin',
+             lambda c, rng, d: c.post(f'/ticket/{_ticket_id(rng, d)}', data={'content': 'Benchmark comment'})),
+    Scenario('ticket_older_comments', 'routes.ticket_comments', 'admin',
+             lambda c, rng, d: c.get(f'/ticket/{_ticket_id(rng, d)}/comments')),
+    Scenario('similar_tickets', 'routes.similar_tickets', 'user',
+             lambda c, rng, d: c.post('/create_ticket/similar', data=_new_ticket(rng))),
+    Scenario('ticket_duplicates', 'routes.ticket_duplicates', 'admin',
+             lambda c, rng, d: c.get(f'/ticket/{_ticket_id(rng, d)}/duplicates')),
+    Scenario('create_ticket_form', 'routes.create_ticket', 'user', lambda c, rng, d: c.get('/create_ticket')),
+    Scenario('create_ticket', 'routes.create_ticket', 'user',
+             lambda c, rng, d: c.post('/create_ticket', data=_new_ticket(rng))),
+    Scenario('update_ticket_form', 'routes.update_ticket', 'admin',
+             lambda c, rng, d: c.get(f'/update_ticket/{_ticket_id(rng, d)}')),
+    Scenario('ticket_history', 'routes.ticket_history', 'admin',
+             lambda c, rng, d: c.get(f'/ticket/{_ticket_id(rng, d)}/history')),
+    Scenario('ticket_history_data', 'routes.ticket_history_data', 'admin',
+             lambda c, rng, d: c.get(f'/ticket/{_ticket_id(rng, d)}/history.json')),
+    Scenario('my_queue', 'routes.my_queue', 'admin', lambda c, rng, d: c.get('/my_queue')),
+    Scenario('assign_ticket', 'routes.assign_ticket', 'admin',
+             lambda c, rng, d: c.post(f'/ticket/{_ticket_id(rng, d)}/assign', data={'queue_id': 0, 'assignee': 'none'})),
+    Scenario('search', 'routes.search', 'admin', lambda c, rng, d: c.get('/search?q=printer+network')),
+    Scenario('login', 'routes.login', None,
+             lambda c, rng, d: c.post('/login', data={'username': ADMIN_USERNAME, 'password': PASSWORD}),
+             fresh_client=True),
+    Scenario('login_form', 'routes.login', None, lambda c, rng, d: c.get('/login')),
+    Scenario('register_form', 'routes.register', None, lambda c, rng, d: c.get('/register')),
+    Scenario('logout', 'routes.logout', None, lambda c, rng, d: c.get('/logout')),
+    Scenario('admin_panel', 'routes.admin_panel', 'admin', lambda c, rng, d: c.get('/admin')),
+    Scenario('admin_users', 'routes.admin_users', 'admin', lambda c, rng, d: c.get('/admin/users')),
+    Scenario('admin_tickets', 'routes.admin_tickets', 'admin', lambda c, rng, d: c.get('/admin/tickets')),
+    Scenario('admin_comments', 'routes.admin_comments', 'admin', lambda c, rng, d: c.get('/admin/comments')),
+    Scenario('admin_queues', 'routes.admin_queues', 'admin', lambda c, rng, d: c.get('/admin/queues')),
+    Scenario('admin_cache_stats', 'routes.cache_stats', 'admin', lambda c, rng, d: c.get('/admin/cache')),
+    Scenario('dashboard', 'routes.dashboard', 'admin', lambda c, rng, d: c.get('/admin/dashboard')),
+    Scenario('dashboard_data', 'routes.dashboard_data', 'admin', lambda c, rng, d: c.get('/admin/dashboard.json')),
+    Scenario('admin_update_ticket_status', 'routes.update_ticket_status', 'admin',
+             lambda c, rng, d: c.post(f'/admin/update_ticket_status/{_ticket_id(rng, d)}',
+                                      data={'status': rng.choice(['open', 'in_progress'])})),
+    Scenario('admin_export', 'routes.export_data', 'admin', lambda c, rng, d: c.get('/admin/export?kind=tickets')),
+    Scenario('admin_bulk_status_dry_run', 'routes.bulk_ticket_status', 'admin',
+             lambda c, rng, d: c.post('/admin/bulk/tickets/status',
+                                      json={'filter': {'status': 'open'}, 'status': 'closed', 'dry_run': True})),
+]
+
+# Routes deliberately left out, and why
+SKIPPED = {
+    'routes.create_admin': 'one-off bootstrap; fails once the admin exists',
+    'routes.delete_ticket': 'destructive; covered by the bulk dry run',
+    'routes.archived_ticket': 'needs tickets old enough to archive; the seed data has none',
+    'routes.delete_user': 'destructive; covered by the bulk dry run',
+    'routes.delete_comment': 'destructive; covered by the bulk dry run',
+    'routes.import_data': 'measured by `flask tickets import` on real files',
+    'routes.bulk_delete_tickets': 'destructive; same path as the status dry run',
+    'routes.bulk_delete_comments': 'destructive; same path as the status dry run',
+    'routes.bulk_delete_users': 'destructive; same path as the status dry run',
+    'routes.queue_members': 'one-off queue setup',
+    'routes.merge_ticket': 'destructive; closes the ticket it merges',
+    'routes.ticket_events': 'long-lived event stream, not a request/response',
+    'routes.queue_events': 'long-lived event stream, not a request/response',
+}
+
+
+def uncovered_endpoints(app):
+    covered = {s.endpoint for s in SCENARIOS} | set(SKIPPED)
+    return sorted(rule.endpoint for rule in app.url_map.iter_rules()
+                  if rule.endpoint.startswith(bp.name + '.') and rule.endpoint not in covered)
+
+
+def _logged_in_client(app, username):
+    client = app.test_client()
+    response = client.post('/login', data={'username': username, 'password': PASSWORD})
+    if response.status_code != 302:
+        raise RuntimeError(f'could not log in as {username}')
+    return client
+
+
+def run(app, data, iterations=50, warmup=5, only=None, random_seed=1):
+    """Time every scenario (or those named in ``only``) and return summaries by name.
+
+    Call it without an app context pushed: requests would otherwise share that
+    context's ``g``, and with it Flask-Login's cached user.
+    """
+    with app.app_context():
+        engine = db.engine
+    users = {'admin': ADMIN_USERNAME, 'user': 'bench-user-2' if len(data['users']) > 1 else ADMIN_USERNAME}
+    results = {}
+    for scenario in SCENARIOS:
+        if only and scenario.name not in only:
+            continue
+        rng = random.Random(random_seed)
+        client = app.test_client()
+        if scenario.role:
+            client = _logged_in_client(app, users[scenario.role])
+
+        latencies, queries, errors = [], [], 0
+        for i in range(warmup + iterations):
+            if scenario.fresh_client:
+                client = app.test_client()
+            with count_queries(engine) as counter:
+                started = time.perf_counter()
+                response = scenario.request(client, rng, data)
+                response.get_data()  # drain streamed bodies inside the timing
+                elapsed = time.perf_counter() - started
+            response.close()
+            if i < warmup:
+                continue
+            if response.status_code >= 400:
+                errors += 1
+            latencies.append(elapsed)
+            queries.append(counter.count)
+        results[scenario.name] = summarize(latencies, queries, errors=errors)
+        results[scenario.name]['endpoint'] = scenario.endpoint
+    return results
@@ -0,0 +1,81 @@
+# benchmarks/seed.py
+"""Deterministic synthetic data: N users, M tickets, K comments."""
+import random
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from app import db, duplicates, rollups, search
+from app import comments as comment_threads  # seed() takes a comments count
+from app.forms import PRIORITY_CHOICES, STATUS_CHOICES
+from app.models import Comment, Ticket, User, password_hash_method
+
+PASSWORD = 'benchmark-password'
+ADMIN_USERNAME = 'bench-admin'
+WORDS = ('printer', 'network', 'vpn', 'email', 'laptop', 'password', 'reset', 'slow', 'crash', 'screen',
+         'keyboard', 'license', 'update', 'server', 'backup', 'access', 'outlook', 'wifi', 'monitor', 'install')
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+
+def seed(users=50, tickets=2000, comments=6000, batch_size=1000, random_seed=1):
+    """Fill an empty schema and return ``{'users': [...ids], 'tickets': [...ids]}``.
+
+    Every user shares one password hash (hashing is the slow part and is timed
+    by the login scenario instead). Tickets are spread over the last 90 days.
+    """
+    rng = random.Random(random_seed)
+    password_hash = generate_password_hash(PASSWORD, method=password_hash_method())
+    now = datetime.utcnow()
+
+    user_rows = [{'id': 1, 'username': ADMIN_USERNAME, 'email': 'bench-admin@example.com',
+                  'password_hash': password_hash, 'role': 'admin'}]
+    user_rows += [{'id': i, 'username': f'bench-user-{i}', 'email': f'bench-user-{i}@example.com',
+                   'password_hash': password_hash, 'role': 'user'} for i in range(2, users + 1)]
+    db.session.execute(User.__table__.insert(), user_rows)
+
+    def ticket_rows():
+        for ticket_id in range(1, tickets + 1):
+            created = now - timedelta(minutes=rng.randrange(90 * 24 * 60))
+            status = rng.choice(STATUS_CHOICES)[0]
+            yield {
+                'id': ticket_id,
+                'title': _sentence(rng, 4),
+                'description': _sentence(rng, rng.randrange(10, 80)),
+                'status': status,
+                'priority': rng.choice(PRIORITY_CHOICES)[0],
+                'created_date': created,
+                'resolved_date': created + timedelta(hours=rng.randrange(1, 200))
+                                 if status in ('resolved', 'closed') else None,
+                'user_id': rng.randrange(1, users + 1),
+            }
+
+    def comment_rows():
+        for comment_id in range(1, comments + 1 if tickets else 1):
+            yield {
+                'id': comment_id,
+                'content': _sentence(rng, rng.randrange(5, 40)),
+                'timestamp': now - timedelta(minutes=rng.randrange(90 * 24 * 60)),
+                'ticket_id': rng.randrange(1, tickets + 1),
+                'user_id': rng.randrange(1, users + 1),
+            }
+
+    for table, rows in ((Ticket.__table__, ticket_rows()), (Comment.__table__, comment_rows())):
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                db.session.execute(table.insert(), batch)
+                batch = []
+        if batch:
+            db.session.execute(table.insert(), batch)
+    comment_threads.recount(db.session.connection(), db.true())
+    db.session.commit()
+
+    search.rebuild(batch_size=batch_size)
+    duplicates.rebuild(batch_size=batch_size)
+    rollups.backfill(chunk_size=batch_size)
+    return {'users': [row['id'] for row in user_rows], 'tickets': list(range(1, tickets + 1))}
+
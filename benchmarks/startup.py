@@ -0,0 +1,61 @@
+# benchmarks/startup.py
+"""Cold-start timings: each run boots the app in a fresh interpreter.
+
+A run times importing the app package, ``create_app`` and the first request
+to a page (``/login``, which renders templates but needs no data). All runs
+share one Jinja bytecode cache directory, so the first run pays for compiling
+the templates and the rest show what a worker boot costs once it is warm.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.stats import summarize
+
+PHASES = ('import', 'create_app', 'first_request')
+
+
+def _boot():
+    # Runs in the child process
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    response = app.test_client().get('/login')
+    finished = time.perf_counter()
+    if response.status_code != 200:
+        sys.exit(f'/login answered {response.status_code}')
+    print(json.dumps({'import': imported - started, 'create_app': created - imported,
+                      'first_request': finished - created}))
+
+
+def run(runs=10, database_url=None):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = {phase: [] for phase in PHASES}
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, APP_CONFIG='production', STARTUP_REPORT='false',
+                   DATABASE_URL=database_url or 'sqlite:///' + os.path.join(directory, 'startup.db'),
+                   JINJA_BYTECODE_CACHE='true', JINJA_BYTECODE_CACHE_DIR=os.path.join(directory, 'jinja'),
+                   RATELIMIT_SQLITE_PATH=os.path.join(directory, 'ratelimit.db'))
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, '-m', 'benchmarks.startup'], cwd=root, env=env,
+                                    capture_output=True, text=True, check=True).stdout
+            timings = json.loads(output.strip().splitlines()[-1])
+            for phase in PHASES:
+                samples[phase].append(timings[phase])
+
+    results = {}
+    for phase in PHASES:
+        results[f'startup_{phase}'] = summarize(samples[phase][1:] or samples[phase])
+        results[f'startup_{phase}_cold'] = summarize(samples[phase][:1])
+    total = [sum(samples[phase][i] for phase in PHASES) for i in range(runs)]
+    results['startup_total'] = summarize(total[1:] or total)
+    return results
+
+
+if __name__ == '__main__':
+    _boot()
@@ -0,0 +1,82 @@
+# benchmarks/stats.py
+"""Latency summaries and run-to-run comparison."""
+import json
+import platform
+import subprocess
+from datetime import datetime
+
+
+def percentile(sorted_values, fraction):
+    # Linear interpolation between closest ranks
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(latencies, queries=None, elapsed=None, errors=0):
+    """Summarise per-request latencies (seconds) and SQL statement counts."""
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    summary = {
+        'requests': len(values),
+        'errors': errors,
+        'mean_ms': ms(sum(values) / len(values)) if values else None,
+        'p50_ms': ms(percentile(values, 0.50)),
+        'p95_ms': ms(percentile(values, 0.95)),
+        'p99_ms': ms(percentile(values, 0.99)),
+        'max_ms': ms(values[-1]) if values else None,
+    }
+    if queries:
+        summary['queries_per_request'] = round(sum(queries) / len(queries), 2)
+        summary['max_queries'] = max(queries)
+    if elapsed:
+        summary['requests_per_second'] = round(len(values) / elapsed, 1)
+    return summary
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, mode, parameters, results):
+    document = {
+        'mode': mode,
+        'commit': _git_commit(),
+        'recorded_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'python': platform.python_version(),
+        'parameters': parameters,
+        'results': results,
+    }
+    text = json.dumps(document, indent=2, sort_keys=True) + '\n'
+    if path in (None, '-'):
+        print(text, end='')
+    else:
+        with open(path, 'w') as f:
+            f.write(text)
+    return document
+
+
+def compare(base, head, threshold=0.10):
+    """Yield ``(scenario, metric, base, head, regressed)`` for every shared scenario.
+
+    Latency regresses when it grows by more than ``threshold``; query counts
+    regress on any increase, since those are deterministic.
+    """
+    for name in sorted(set(base['results']) & set(head['results'])):
+        before, after = base['results'][name], head['results'][name]
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request'):
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            if metric == 'queries_per_request':
+                regressed = new > old
+            else:
+                regressed = old > 0 and (new - old) / old > threshold
+            yield name, metric, old, new, regressed
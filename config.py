@@ -1,7 +1,227 @@
 # config.py
 import os
 
+
+def env_bool(name, default=False):
+    value = os.environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.lower() in ('1', 'true', 'yes')
+
+
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'you-will-never-guess'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///site.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool, turned into SQLALCHEMY_ENGINE_OPTIONS by app/database.py
+    # (in-memory SQLite keeps its single shared connection). Size the pool to
+    # the threads per worker so a request never waits on another's connection.
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 5)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 10)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+
+    # SQLite connection pragmas: WAL lets readers run alongside a writer,
+    # busy_timeout waits for the write lock instead of failing at once
+    SQLITE_WAL = env_bool('SQLITE_WAL', True)
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+
+    # Read replicas (see app/replicas.py), comma-separated URLs. GETs of these
+    # endpoints read from a healthy replica, unless the visitor wrote something
+    # in the last DB_REPLICA_STICKY_SECONDS.
+    DB_REPLICA_URLS = [url.strip() for url in (os.environ.get('DATABASE_REPLICA_URLS') or '').split(',')
+                       if url.strip()]
+    DB_REPLICA_ENDPOINTS = ('routes.index', 'routes.ticket', 'routes.ticket_comments', 'routes.admin_panel',
+                            'routes.dashboard', 'routes.search', 'routes.ticket_history')
+    DB_REPLICA_STICKY_SECONDS = int(os.environ.get('DB_REPLICA_STICKY_SECONDS') or 10)
+    DB_REPLICA_MAX_LAG_SECONDS = float(os.environ.get('DB_REPLICA_MAX_LAG_SECONDS') or 5)
+    DB_REPLICA_CHECK_SECONDS = 5
+    DB_REPLICA_LAG_QUERY = os.environ.get('DB_REPLICA_LAG_QUERY')
+
+    # Ticket list (index view) paging
+    TICKETS_PER_PAGE = int(os.environ.get('TICKETS_PER_PAGE') or 20)
+    TICKET_SUMMARY_LENGTH = 200
+
+    # Full-text search: 'auto' uses SQLite FTS5 when available, else the posting-list tables
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND') or 'auto'
+    SEARCH_RESULTS_PER_PAGE = 20
+
+    # Comments shown on the ticket page; older ones load a page at a time
+    COMMENTS_PER_PAGE = int(os.environ.get('COMMENTS_PER_PAGE') or 50)
+
+    # Near-duplicate suggestions (app/duplicates.py): MinHash signatures of
+    # BANDS * ROWS hashes over word shingles. Changing these three needs
+    # `flask duplicates rebuild`. Matches start at about (1 / BANDS) ** (1 / ROWS).
+    DUPLICATE_BANDS = 16
+    DUPLICATE_ROWS = 4
+    DUPLICATE_SHINGLE_SIZE = 2
+    DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD') or 0.5)
+    DUPLICATE_SUGGESTIONS = 5
+
+    # Rows per lazily loaded admin panel section
+    ADMIN_PAGE_SIZE = 50
+
+    # Opt-in request profiling: Server-Timing headers, a JSON log line per
+    # request and Prometheus metrics (see app/instrumentation.py)
+    PROFILING_ENABLED = env_bool('PROFILING_ENABLED')
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS') or 100)
+    PROFILING_TOP_STATEMENTS = 5
+    METRICS_PATH = '/metrics'
+
+    # Authentication: cached user identities and password hashing cost.
+    # PASSWORD_HASH_METHOD must spell out its parameters; stored hashes that
+    # differ are upgraded on the user's next successful login.
+    USER_CACHE_SIZE = 1024
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'scrypt:32768:8:1'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_TIMEOUT = 30
+
+    # JSON API (/api/v1, app/api.py). Bearer tokens map to their user through a
+    # cache, so a revoked token keeps working for up to API_TOKEN_CACHE_TTL seconds.
+    API_TOKEN_CACHE_SIZE = 1024
+    API_TOKEN_CACHE_TTL = int(os.environ.get('API_TOKEN_CACHE_TTL') or 60)
+    API_PAGE_SIZE = 50
+    API_MAX_PAGE_SIZE = 200
+    API_MAX_BATCH = 100  # records per batch create or batch get
+
+    # Rows per executemany/commit for bulk import and per fetch for export
+    BULK_BATCH_SIZE = int(os.environ.get('BULK_BATCH_SIZE') or 1000)
+
+    # Dashboard rollups: statuses that count as resolved, and the resolution
+    # target per priority in hours, both by app.enums key
+    RESOLVED_STATUSES = ('resolved', 'closed')
+    SLA_TARGET_HOURS = {'low': 120, 'medium': 72, 'high': 24, 'critical': 4}
+    DASHBOARD_DAYS = 14
+
+    # Ticket routing (see app/assignment.py). New tickets go to this queue and
+    # are auto-assigned there; unset leaves new tickets unassigned.
+    ASSIGNMENT_DEFAULT_QUEUE = os.environ.get('ASSIGNMENT_DEFAULT_QUEUE')
+    # How much one open ticket of each priority adds to an agent's load
+    ASSIGNMENT_PRIORITY_WEIGHTS = {'low': 1, 'medium': 2, 'high': 4, 'critical': 8}
+
+    # Server-Sent Events (see app/realtime.py). Each open stream holds a worker
+    # thread, so a stream ends once it has sent something or after
+    # REALTIME_STREAM_SECONDS, and the browser reconnects. At most
+    # REALTIME_MAX_STREAMS wait at once per process (0: no limit); the rest are
+    # told to come back, so page requests always find a free thread.
+    REALTIME_BACKEND = os.environ.get('REALTIME_BACKEND') or 'memory'
+    REALTIME_KEEPALIVE_SECONDS = 15
+    REALTIME_STREAM_SECONDS = int(os.environ.get('REALTIME_STREAM_SECONDS') or 10)
+    REALTIME_MAX_STREAMS = int(os.environ.get('REALTIME_MAX_STREAMS') or 0)
+    REALTIME_RETRY_MS = 3000
+    REALTIME_BUFFER_SIZE = 1000  # memory backend
+    REALTIME_POLL_INTERVAL = 1.0  # database backend
+    REALTIME_RETENTION_SECONDS = 3600  # database backend
+
+    # Reverse proxies in front of the app. With N set, the client address, scheme
+    # and host come from the X-Forwarded-* values added by the last N proxies, so
+    # 'ip' rate limits count clients rather than the proxy. Leave it at 0 when
+    # clients connect directly: they could otherwise forge those headers.
+    PROXY_COUNT = int(os.environ.get('PROXY_COUNT') or 0)
+
+    # Token-bucket rate limits on form and API submissions (see app/ratelimit.py):
+    # endpoint -> [(scope, requests, seconds)], scope 'ip' or 'user'. The memory
+    # store counts per process; 'sqlite' shares buckets between the workers of a
+    # host through RATELIMIT_SQLITE_PATH (default instance/ratelimit.db).
+    RATELIMIT_ENABLED = env_bool('RATELIMIT_ENABLED', True)
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'memory'
+    RATELIMIT_SQLITE_PATH = os.environ.get('RATELIMIT_SQLITE_PATH')
+    RATELIMIT_SQLITE_TIMEOUT = 1.0  # seconds to wait for the store's lock before letting a request through
+    RATELIMITS = {
+        'routes.login': [('ip', 20, 60), ('user', 5, 60)],
+        'routes.register': [('ip', 5, 3600)],
+        'routes.create_ticket': [('user', 30, 600)],
+        'routes.ticket': [('user', 60, 600)],
+        'api.create_tickets': [('user', 120, 60)],
+        'api.create_comments': [('user', 120, 60)],
+    }
+
+    # Rendered ticket-list cards kept in memory, keyed by ticket version.
+    # ETAG_SALT defaults to a hash of the templates, so a deploy resets ETags.
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE') or 2048)
+    ETAG_SALT = os.environ.get('ETAG_SALT')
+
+    # Static files (see app/assets.py): after `flask assets build`, url_for('static')
+    # points at content-hashed copies served precompressed and cached for a year
+    STATIC_FINGERPRINT = env_bool('STATIC_FINGERPRINT', True)
+    ASSETS_DIR = 'dist'  # under app/static
+    ASSETS_HASH_LENGTH = 12
+    ASSETS_MAX_AGE = 365 * 24 * 3600
+
+    # Boot time (see app/startup.py): compiled templates persist between processes,
+    # and STARTUP_REPORT logs how long create_app took. Flask-Migrate (and Alembic)
+    # is imported only when `flask db` runs, unless MIGRATE_EAGER is set.
+    JINJA_BYTECODE_CACHE = env_bool('JINJA_BYTECODE_CACHE', True)
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get('JINJA_BYTECODE_CACHE_DIR')
+    STARTUP_REPORT = env_bool('STARTUP_REPORT')
+    MIGRATE_EAGER = env_bool('MIGRATE_EAGER')
+
+    # Background jobs (see app/jobs.py), run by `flask worker`. JOBS_RUN_INLINE
+    # runs them inside the request instead, for a setup without a worker.
+    JOBS_RUN_INLINE = env_bool('JOBS_RUN_INLINE')
+    JOB_BATCH_SIZE = int(os.environ.get('JOB_BATCH_SIZE') or 20)
+    JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL') or 1.0)
+    JOB_MAX_ATTEMPTS = 5
+    JOB_RETRY_BASE_SECONDS = 10
+    JOB_RETRY_MAX_SECONDS = 3600
+    JOB_LOCK_TIMEOUT = 300
+    JOB_RETENTION_DAYS = 7
+
+    # Ticket history (app/audit.py). Events older than this many days move to the
+    # archive table when `flask audit archive` (or the audit.archive job) runs.
+    AUDIT_ARCHIVE_AFTER_DAYS = int(os.environ.get('AUDIT_ARCHIVE_AFTER_DAYS') or 180)
+    AUDIT_ARCHIVE_BATCH_SIZE = 1000
+    TIMELINE_PAGE_SIZE = 50
+
+    # Cold storage (app/archival.py): `flask tickets archive` moves tickets resolved
+    # this many days ago, and tickets deleted this many days ago, out of the hot tables
+    ARCHIVE_RESOLVED_AFTER_DAYS = int(os.environ.get('ARCHIVE_RESOLVED_AFTER_DAYS') or 365)
+    ARCHIVE_DELETED_AFTER_DAYS = int(os.environ.get('ARCHIVE_DELETED_AFTER_DAYS') or 30)
+    ARCHIVE_BATCH_SIZE = 500
+
+    # Status-change emails to the ticket's creator; logged when MAIL_SERVER is unset
+    NOTIFY_ON_STATUS_CHANGE = env_bool('NOTIFY_ON_STATUS_CHANGE', True)
+    MAIL_SERVER = os.environ.get('MAIL_SERVER')
+    MAIL_PORT = int(os.environ.get('MAIL_PORT') or 25)
+    MAIL_USE_TLS = env_bool('MAIL_USE_TLS')
+    MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
+    MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or 'helpdesk@localhost'
+
+
+class DevelopmentConfig(Config):
+    DEBUG = True
+    # `flask run` alone should still index and notify
+    JOBS_RUN_INLINE = env_bool('JOBS_RUN_INLINE', True)
+    # Edited files show up without a rebuild
+    STATIC_FINGERPRINT = env_bool('STATIC_FINGERPRINT')
+
+
+class ProductionConfig(Config):
+    DEBUG = False
+    SESSION_COOKIE_SECURE = env_bool('SESSION_COOKIE_SECURE', True)
+    REMEMBER_COOKIE_SECURE = SESSION_COOKIE_SECURE
+    # Several gunicorn workers: streams must see changes made by any of them
+    REALTIME_BACKEND = os.environ.get('REALTIME_BACKEND') or 'database'
+    # ... and a client must not get a fresh allowance from each of them
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'sqlite'
+    STARTUP_REPORT = env_bool('STARTUP_REPORT', True)
+
+
+# APP_CONFIG picks one of these; run.py and gunicorn.conf.py both go through it
+CONFIGS = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
+
+
+def config_from_env():
+    name = os.environ.get('APP_CONFIG') or 'development'
+    try:
+        return CONFIGS[name]
+    except KeyError:
+        raise ValueError(f"APP_CONFIG must be one of {', '.join(CONFIGS)}, not {name!r}")
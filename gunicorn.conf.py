@@ -0,0 +1,71 @@
+# gunicorn.conf.py
+# Production serving profile, picked up automatically by `gunicorn` run from
+# this directory. Every setting can be overridden from the environment.
+import multiprocessing
+import os
+
+os.environ.setdefault('APP_CONFIG', 'production')
+
+wsgi_app = 'run:app'
+bind = os.environ.get('GUNICORN_BIND') or f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+
+# Processes for CPU-bound work (templates, password hashing), threads to
+# overlap the time each request spends waiting on the database
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.environ.get('WEB_CONCURRENCY') or min(cpu_count * 2 + 1, 12))
+threads = int(os.environ.get('GUNICORN_THREADS') or 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Recycle each worker after a jittered number of requests so slow leaks are
+# shed without all workers restarting at once, and give in-flight requests
+# time to finish on restart or deploy
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS') or 1000)
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER') or max_requests // 10)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT') or 30)
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT') or 30)
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE') or 5)
+
+# Load the app once in the master and fork it (faster boots, shared memory)
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Each thread holds at most one connection; size the pool to match unless told otherwise
+os.environ.setdefault('DB_POOL_SIZE', str(threads))
+# Event streams may wait on at most half of each worker's threads; the rest serve pages
+os.environ.setdefault('REALTIME_MAX_STREAMS', str(max(threads // 2, 1)))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or '-'
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL') or 'info'
+
+
+def when_ready(server):
+    # Workers forked from a preloaded master inherit every template already compiled
+    if not server.cfg.preload_app:
+        return
+    import time
+    from app import startup
+    from run import app
+    started = time.perf_counter()
+    count = startup.compile_templates(app)
+    server.log.info('Compiled %d templates in %.0f ms before forking', count, (time.perf_counter() - started) * 1000)
+
+
+def post_fork(server, worker):
+    import time
+    worker.boot_started = time.perf_counter()
+    # Connections opened in the master before forking must not be shared between workers
+    if not server.cfg.preload_app:
+        return
+    from app import db
+    from run import app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+        for replica in app.extensions.get('replicas', ()):
+            replica.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Fork to ready to accept requests; compare across releases with the startup log lines
+    import time
+    worker.log.info('Worker %s booted in %.0f ms', worker.pid, (time.perf_counter() - worker.boot_started) * 1000)
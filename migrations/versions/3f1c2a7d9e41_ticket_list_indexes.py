@@ -0,0 +1,32 @@
+"""ticket list keyset indexes
+
+Revision ID: 3f1c2a7d9e41
+Revises: 96a95b488b0b
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a7d9e41'
+down_revision = '96a95b488b0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_created_id', ['created_date', 'id'], unique=False)
+        batch_op.create_index('ix_ticket_user_created_id', ['user_id', 'created_date', 'id'], unique=False)
+        batch_op.create_index('ix_ticket_status_created_id', ['status', 'created_date', 'id'], unique=False)
+        batch_op.create_index('ix_ticket_priority_created_id', ['priority', 'created_date', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_priority_created_id')
+        batch_op.drop_index('ix_ticket_status_created_id')
+        batch_op.drop_index('ix_ticket_user_created_id')
+        batch_op.drop_index('ix_ticket_created_id')
@@ -0,0 +1,36 @@
+"""realtime message outbox
+
+Revision ID: 4a7e2c9d1b60
+Revises: c5d1e9a4b7f3
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a7e2c9d1b60'
+down_revision = 'c5d1e9a4b7f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('realtime_message',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('channel', sa.String(length=40), nullable=False),
+    sa.Column('event', sa.String(length=20), nullable=False),
+    sa.Column('data', sa.Text(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('realtime_message', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_realtime_message_created'), ['created'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('realtime_message', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_realtime_message_created'))
+
+    op.drop_table('realtime_message')
@@ -0,0 +1,77 @@
+"""full-text search index
+
+Revision ID: 8b4e6d0c2f17
+Revises: 3f1c2a7d9e41
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4e6d0c2f17'
+down_revision = '3f1c2a7d9e41'
+branch_labels = None
+depends_on = None
+
+
+def _has_fts5(bind):
+    if bind.dialect.name != 'sqlite':
+        return False
+    options = {row[0] for row in bind.exec_driver_sql('PRAGMA compile_options')}
+    return 'ENABLE_FTS5' in options
+
+
+def upgrade():
+    op.create_table('search_document',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('ref_id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('length', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.create_index('ix_search_document_kind_ref', ['kind', 'ref_id'], unique=True)
+        batch_op.create_index(batch_op.f('ix_search_document_ticket_id'), ['ticket_id'], unique=False)
+
+    op.create_table('search_posting',
+    sa.Column('term', sa.String(length=64), nullable=False),
+    sa.Column('document_id', sa.Integer(), nullable=False),
+    sa.Column('title_tf', sa.Integer(), nullable=False),
+    sa.Column('body_tf', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['search_document.id'], ),
+    sa.PrimaryKeyConstraint('term', 'document_id')
+    )
+    with op.batch_alter_table('search_posting', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_search_posting_document_id'), ['document_id'], unique=False)
+
+    # On SQLite with FTS5 the virtual table is the live index, so fill it now.
+    # Other databases use the posting tables above: run `flask search rebuild`.
+    bind = op.get_bind()
+    if _has_fts5(bind):
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+            "title, body, ticket_id UNINDEXED, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        op.execute("INSERT INTO search_fts (rowid, title, body, ticket_id) "
+                   "SELECT id * 2, title, description, id FROM ticket")
+        op.execute("INSERT INTO search_fts (rowid, title, body, ticket_id) "
+                   "SELECT id * 2 + 1, '', COALESCE(content, ''), ticket_id FROM comment WHERE ticket_id IS NOT NULL")
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DROP TABLE IF EXISTS search_fts')
+
+    with op.batch_alter_table('search_posting', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_posting_document_id'))
+
+    op.drop_table('search_posting')
+    with op.batch_alter_table('search_document', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_search_document_ticket_id'))
+        batch_op.drop_index('ix_search_document_kind_ref')
+
+    op.drop_table('search_document')
@@ -0,0 +1,37 @@
+"""ticket comment_count and last_activity_at
+
+Revision ID: a4d9e2c7b815
+Revises: f3c6b1d8a274
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d9e2c7b815'
+down_revision = 'f3c6b1d8a274'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_activity_at', sa.DateTime(), nullable=True))
+
+    # Backfill from the visible comments, through ix_comment_ticket_timestamp
+    op.execute(
+        'UPDATE ticket SET '
+        'comment_count = (SELECT count(*) FROM comment '
+        'WHERE comment.ticket_id = ticket.id AND comment.deleted_at IS NULL), '
+        'last_activity_at = (SELECT max(comment.timestamp) FROM comment '
+        'WHERE comment.ticket_id = ticket.id AND comment.deleted_at IS NULL)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_column('last_activity_at')
+        batch_op.drop_column('comment_count')
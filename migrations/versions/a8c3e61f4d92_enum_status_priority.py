@@ -0,0 +1,85 @@
+"""store ticket status and priority as small integers
+
+Revision ID: a8c3e61f4d92
+Revises: d4f7a2c8e315
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8c3e61f4d92'
+down_revision = 'd4f7a2c8e315'
+branch_labels = None
+depends_on = None
+
+# Frozen copies of app.enums as of this revision
+STATUSES = {'open': 1, 'in_progress': 2, 'resolved': 3, 'closed': 4}
+PRIORITIES = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+# Values that match no key ('Pending', typos) become open / medium
+DEFAULTS = {'status': 1, 'priority': 2}
+MAPPINGS = {'status': STATUSES, 'priority': PRIORITIES}
+
+COUNTERS = ('created', 'entered', 'exited', 'resolved', 'resolution_seconds', 'sla_breached')
+
+ticket = sa.table('ticket', sa.column('status', sa.String), sa.column('priority', sa.String))
+rollup = sa.table('ticket_rollup', sa.column('granularity', sa.String), sa.column('bucket_start', sa.DateTime),
+                  sa.column('status', sa.String), sa.column('priority', sa.String),
+                  *(sa.column(name, sa.Integer) for name in COUNTERS))
+
+
+def _normalize(text):
+    return (text or '').strip().lower().replace(' ', '_').replace('-', '_')
+
+
+def _code_expression(column, name):
+    # 'In Progress', 'in-progress' and 'in_progress' all match the key
+    normalized = sa.func.lower(sa.func.replace(sa.func.replace(sa.func.trim(column), ' ', '_'), '-', '_'))
+    return sa.case({key: str(value) for key, value in MAPPINGS[name].items()},
+                   value=normalized, else_=str(DEFAULTS[name]))
+
+
+def _key_expression(column, name):
+    return sa.case({str(value): key for key, value in MAPPINGS[name].items()}, value=column, else_=column)
+
+
+def _retype(table_name, type_, using):
+    with op.batch_alter_table(table_name, schema=None) as batch_op:
+        for name in ('status', 'priority'):
+            batch_op.alter_column(name, type_=type_, existing_nullable=False,
+                                  postgresql_using=using.format(name=name))
+
+
+def upgrade():
+    op.execute(ticket.update().values(status=_code_expression(ticket.c.status, 'status'),
+                                      priority=_code_expression(ticket.c.priority, 'priority')))
+    _retype('ticket', sa.SmallInteger(), '{name}::smallint')
+
+    # 'Open' and 'open' rollup rows collapse into one, so their counters are summed
+    connection = op.get_bind()
+    merged = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for row in connection.execute(sa.select(rollup)).mappings():
+        key = (row['granularity'], row['bucket_start'],
+               STATUSES.get(_normalize(row['status']), DEFAULTS['status']),
+               PRIORITIES.get(_normalize(row['priority']), DEFAULTS['priority']))
+        for name in COUNTERS:
+            merged[key][name] += row[name] or 0
+    op.execute(rollup.delete())
+    _retype('ticket_rollup', sa.SmallInteger(), '{name}::smallint')
+    if merged:
+        connection.execute(
+            sa.table('ticket_rollup', *(sa.column(c) for c in ('granularity', 'bucket_start', 'status', 'priority')
+                                          + COUNTERS)).insert(),
+            [dict(zip(('granularity', 'bucket_start', 'status', 'priority'), key), **counters)
+             for key, counters in merged.items()])
+
+
+def downgrade():
+    for table_name, table in (('ticket', ticket), ('ticket_rollup', rollup)):
+        _retype(table_name, sa.String(length=20), '{name}::varchar')
+        op.execute(table.update().values(status=_key_expression(table.c.status, 'status'),
+                                         priority=_key_expression(table.c.priority, 'priority')))
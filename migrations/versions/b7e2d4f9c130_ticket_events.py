@@ -0,0 +1,61 @@
+"""ticket history: ticket_event, its archive and the comment timeline index
+
+Revision ID: b7e2d4f9c130
+Revises: a8c3e61f4d92
+Create Date: 2026-10-17 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d4f9c130'
+down_revision = 'a8c3e61f4d92'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # History starts here; existing tickets get no backdated 'created' events
+    op.create_table('ticket_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('changes', sa.Text(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ticket_event', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_event_ticket_created', ['ticket_id', 'created', 'id'], unique=False)
+        batch_op.create_index('ix_ticket_event_created', ['created'], unique=False)
+
+    op.create_table('ticket_event_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action', sa.String(length=20), nullable=False),
+    sa.Column('changes', sa.Text(), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ticket_event_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_ticket_event_archive_ticket_created', ['ticket_id', 'created', 'id'], unique=False)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_ticket_timestamp', ['ticket_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_ticket_timestamp')
+
+    with op.batch_alter_table('ticket_event_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_event_archive_ticket_created')
+    op.drop_table('ticket_event_archive')
+
+    with op.batch_alter_table('ticket_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_event_created')
+        batch_op.drop_index('ix_ticket_event_ticket_created')
+    op.drop_table('ticket_event')
@@ -0,0 +1,37 @@
+"""ticket dashboard rollups
+
+Revision ID: c5d1e9a4b7f3
+Revises: 8b4e6d0c2f17
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d1e9a4b7f3'
+down_revision = '8b4e6d0c2f17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_rollup',
+    sa.Column('granularity', sa.String(length=5), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('priority', sa.String(length=20), nullable=False),
+    sa.Column('created', sa.Integer(), nullable=False),
+    sa.Column('entered', sa.Integer(), nullable=False),
+    sa.Column('exited', sa.Integer(), nullable=False),
+    sa.Column('resolved', sa.Integer(), nullable=False),
+    sa.Column('resolution_seconds', sa.BigInteger(), nullable=False),
+    sa.Column('sla_breached', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('granularity', 'bucket_start', 'status', 'priority')
+    )
+    # Existing tickets are counted with `flask rollups backfill`
+
+
+def downgrade():
+    op.drop_table('ticket_rollup')
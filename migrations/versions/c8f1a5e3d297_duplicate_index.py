@@ -0,0 +1,48 @@
+"""near-duplicate index and ticket merged_into_id
+
+Revision ID: c8f1a5e3d297
+Revises: a4d9e2c7b815
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8f1a5e3d297'
+down_revision = 'a4d9e2c7b815'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('ticket_signature',
+    sa.Column('ticket_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('signature', sa.LargeBinary(), nullable=False),
+    sa.PrimaryKeyConstraint('ticket_id')
+    )
+    op.create_table('duplicate_bucket',
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.Integer(), nullable=False),
+    sa.Column('ticket_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('band', 'bucket', 'ticket_id')
+    )
+    with op.batch_alter_table('duplicate_bucket', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_duplicate_bucket_ticket_id'), ['ticket_id'], unique=False)
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('merged_into_id', sa.Integer(), nullable=True))
+
+    # Fill the index with `flask duplicates rebuild`
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_column('merged_into_id')
+
+    with op.batch_alter_table('duplicate_bucket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_duplicate_bucket_ticket_id'))
+
+    op.drop_table('duplicate_bucket')
+    op.drop_table('ticket_signature')
@@ -0,0 +1,74 @@
+"""ticket assignment, queues and agent loads
+
+Revision ID: d4f7a2c8e315
+Revises: 7c3d9b1e5a28
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f7a2c8e315'
+down_revision = '7c3d9b1e5a28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('queue',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('strategy', sa.String(length=20), nullable=False),
+    sa.Column('last_assignee_id', sa.Integer(), nullable=True),
+    sa.ForeignKeyConstraint(['last_assignee_id'], ['user.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name')
+    )
+    op.create_table('queue_member',
+    sa.Column('queue_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('active', sa.Boolean(), nullable=False),
+    sa.ForeignKeyConstraint(['queue_id'], ['queue.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('queue_id', 'user_id')
+    )
+    with op.batch_alter_table('queue_member', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_queue_member_user_id'), ['user_id'], unique=False)
+
+    op.create_table('agent_load',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('open_tickets', sa.Integer(), nullable=False),
+    sa.Column('weighted_load', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('assignee_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('queue_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('assigned_at', sa.DateTime(), nullable=True))
+        batch_op.create_foreign_key('fk_ticket_assignee_id_user', 'user', ['assignee_id'], ['id'])
+        batch_op.create_foreign_key('fk_ticket_queue_id_queue', 'queue', ['queue_id'], ['id'])
+        batch_op.create_index(batch_op.f('ix_ticket_queue_id'), ['queue_id'], unique=False)
+        batch_op.create_index('ix_ticket_assignee_status_priority_created',
+                              ['assignee_id', 'status', 'priority', 'created_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index('ix_ticket_assignee_status_priority_created')
+        batch_op.drop_index(batch_op.f('ix_ticket_queue_id'))
+        batch_op.drop_constraint('fk_ticket_queue_id_queue', type_='foreignkey')
+        batch_op.drop_constraint('fk_ticket_assignee_id_user', type_='foreignkey')
+        batch_op.drop_column('assigned_at')
+        batch_op.drop_column('queue_id')
+        batch_op.drop_column('assignee_id')
+
+    op.drop_table('agent_load')
+    with op.batch_alter_table('queue_member', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_queue_member_user_id'))
+
+    op.drop_table('queue_member')
+    op.drop_table('queue')
@@ -0,0 +1,78 @@
+"""soft deletes on ticket and comment, and the ticket/comment archive tables
+
+Revision ID: e9a1c7d3f562
+Revises: b7e2d4f9c130
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a1c7d3f562'
+down_revision = 'b7e2d4f9c130'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_ticket_deleted_at'), ['deleted_at'], unique=False)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    op.create_table('ticket_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('title', sa.String(length=100), nullable=False),
+    sa.Column('description', sa.Text(), nullable=False),
+    sa.Column('status', sa.SmallInteger(), nullable=False),
+    sa.Column('priority', sa.SmallInteger(), nullable=False),
+    sa.Column('created_date', sa.DateTime(), nullable=True),
+    sa.Column('resolved_date', sa.DateTime(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('assignee_id', sa.Integer(), nullable=True),
+    sa.Column('queue_id', sa.Integer(), nullable=True),
+    sa.Column('assigned_at', sa.DateTime(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('ticket_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_ticket_archive_user_id'), ['user_id'], unique=False)
+
+    op.create_table('comment_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.Column('ticket_id', sa.Integer(), nullable=True),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('comment_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_archive_ticket_timestamp', ['ticket_id', 'timestamp'], unique=False)
+
+
+def downgrade():
+    # Soft-deleted rows would reappear once the columns are gone, so they are dropped first
+    op.execute('DELETE FROM comment WHERE deleted_at IS NOT NULL')
+    op.execute('DELETE FROM comment WHERE ticket_id IN (SELECT id FROM ticket WHERE deleted_at IS NOT NULL)')
+    op.execute('DELETE FROM ticket WHERE deleted_at IS NOT NULL')
+
+    with op.batch_alter_table('comment_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_archive_ticket_timestamp')
+    op.drop_table('comment_archive')
+
+    with op.batch_alter_table('ticket_archive', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_archive_user_id'))
+    op.drop_table('ticket_archive')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_column('deleted_at')
+
+    with op.batch_alter_table('ticket', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_ticket_deleted_at'))
+        batch_op.drop_column('deleted_at')
@@ -1,7 +1,9 @@
 # run.py
+# Development server. In production run gunicorn, which reads gunicorn.conf.py:
+#   flask assets build && flask templates compile && APP_CONFIG=production gunicorn
 from app import create_app
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    app.run(debug=app.config['DEBUG'])